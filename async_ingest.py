@@ -0,0 +1,370 @@
+import asyncio
+import json
+
+import aiohttp
+
+from github_utils import (
+    DEFAULT_MIN_FILE_BYTES,
+    DOWNLOAD_CHUNK_BYTES,
+    RAW_MEDIA_TYPE,
+    RESULTS_DIR,
+    SEARCH_RESULT_LIMIT,
+    ResultFile,
+    is_downloadable,
+    results_tree_files,
+    search_query,
+)
+from rate_limit import is_secondary_limit, request_resource
+
+DEFAULT_API_URL = "https://api.github.com"
+DEFAULT_CONCURRENCY = 16
+# 5xx responses are retried this often, after 0.5s, 1s, 2s, ...
+SERVER_ERROR_RETRIES = 5
+
+
+class AsyncGitHub:
+    """Small asyncio GitHub REST client sharing one pooled keep-alive connection pool.
+
+    At most `concurrency` requests are in flight at any time. Server errors
+    (5xx) are retried with exponential backoff, like the PyGithub transport.
+
+    The requests go through the `scheduler` only: unlike the PyGithub and
+    GraphQL ingest, they bypass the rest of the `github_transport.Transport`,
+    so there is no HTTP cache, hedging or cassette recording.
+
+    Inputs:
+        token (str): The GitHub token.
+        api_url (str): The REST API root.
+        concurrency (int): Maximum number of concurrent requests.
+        scheduler: Optional `rate_limit.RateLimitScheduler` pacing the requests.
+    """
+
+    def __init__(
+        self,
+        token,
+        api_url=DEFAULT_API_URL,
+        concurrency=DEFAULT_CONCURRENCY,
+        scheduler=None,
+    ):
+        self.api_url = api_url.rstrip("/")
+        self.token = token
+        self.concurrency = concurrency
+        self.scheduler = scheduler
+        self.requests = 0
+
+    async def __aenter__(self):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.concurrency),
+            headers={
+                "Authorization": f"token {self.token}",
+                "Accept": "application/vnd.github+json",
+            },
+            timeout=aiohttp.ClientTimeout(total=60),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+
+    async def get(self, path, params=None, headers=None, consume=None):
+        """Sends a GET request and returns the response status, headers, links and body.
+
+        With `consume`, a successful response's body is not read into memory but
+        handed to `await consume(response.content)` (an `aiohttp.StreamReader`)
+        while the request slot is held, and the returned body is empty.
+        """
+        url = path if path.startswith("http") else self.api_url + path
+        resource = request_resource(url)
+        attempt = server_errors = 0
+        while True:
+            if self.scheduler is not None:
+                while wait := self.scheduler.try_acquire(resource):
+                    await asyncio.sleep(wait)
+
+            async with self._semaphore:
+                self.requests += 1
+                try:
+                    async with self.session.get(
+                        url, params=params, headers=headers
+                    ) as response:
+                        status, links = response.status, response.links
+                        if consume is not None and status == 200:
+                            await consume(response.content)
+                            body = b""
+                        else:
+                            body = await response.read()
+                        response_headers = response.headers
+                except Exception:
+                    if self.scheduler is not None:
+                        self.scheduler.release(None, {}, resource=resource)
+                    raise
+
+            retry = None
+            if self.scheduler is not None:
+                retry = self.scheduler.release(
+                    status,
+                    response_headers,
+                    attempt,
+                    secondary=status == 403
+                    and is_secondary_limit(status, body.decode("utf-8", errors="replace")),
+                    resource=resource,
+                )
+            if retry is None and status >= 500 and server_errors < SERVER_ERROR_RETRIES:
+                print(f"Server error {status} on {url}, retrying")
+                await asyncio.sleep(0.5 * 2**server_errors)
+                server_errors += 1
+                continue
+            if retry is None:
+                return status, response_headers, links, body
+
+            print(f"Rate limited on {url}, retrying in {retry:.1f}s")
+            attempt += 1
+
+    async def get_json(self, path, params=None):
+        """Returns the decoded JSON body of a GET request.
+
+        Returns None on 404, and on 409, which GitHub answers for the git data
+        of an empty repository.
+        """
+        status, _, _, body = await self.get(path, params)
+        if status in (404, 409):
+            return None
+        if status >= 400:
+            raise RuntimeError(f"GitHub request {path} failed with status {status}")
+        return json.loads(body)
+
+    async def get_pages(self, path, params=None):
+        """Returns the JSON pages of a paginated GET request, following `Link` headers."""
+        pages = []
+        url, params = path, {"per_page": 100, **(params or {})}
+        while url:
+            status, _, links, body = await self.get(url, params)
+            if status >= 400:
+                raise RuntimeError(f"GitHub request {path} failed with status {status}")
+            pages.append(json.loads(body))
+            url = str(links["next"]["url"]) if "next" in links else None
+            params = None
+        return pages
+
+    async def store_blob(self, org, name, sha, blob_cache):
+        """Streams the raw bytes of a git blob into `blob_cache`, chunk by chunk."""
+
+        async def consume(content):
+            with blob_cache.writer(sha) as f:
+                async for chunk in content.iter_chunked(DOWNLOAD_CHUNK_BYTES):
+                    # Compressing and writing would block the event loop
+                    await asyncio.to_thread(f.write, chunk)
+
+        status, _, _, _ = await self.get(
+            f"/repos/{org}/{name}/git/blobs/{sha}",
+            headers={"Accept": RAW_MEDIA_TYPE},
+            consume=consume,
+        )
+        if status >= 400:
+            raise RuntimeError(f"Downloading blob {sha} of {name} failed ({status})")
+
+
+async def list_repos_async(client, org, assignment_prefix):
+    """Async counterpart of `github_utils.list_assignment_repos`, returning repo JSON dicts."""
+    pages = await client.get_pages(
+        "/search/repositories", {"q": search_query(org, assignment_prefix)}
+    )
+    found = [item for page in pages for item in page["items"]]
+    total = pages[0]["total_count"] if pages else 0
+    repos = [
+        item
+        for item in found
+        if item["name"].startswith(assignment_prefix)
+        and item["owner"]["login"].lower() == org.lower()
+    ]
+    if repos and len(found) == total and total < SEARCH_RESULT_LIMIT:
+        return sorted(repos, key=lambda item: item["created_at"], reverse=True)
+
+    print(
+        f"Search returned {len(found)} of {total} repos; falling back to a full org scan."
+    )
+    pages = await client.get_pages(f"/orgs/{org}/repos")
+    return [
+        item
+        for page in pages
+        for item in page
+        if item["name"].startswith(assignment_prefix)
+    ]
+
+
+async def _list_results_files(client, org, item, results_files):
+    """Async counterpart of `github_utils.find_results_files`.
+
+    Returns None if the results folder is missing; any other failure raises.
+    """
+    name = item["name"]
+    tree = await client.get_json(
+        f"/repos/{org}/{name}/git/trees/{item['default_branch']}",
+        {"recursive": 1},
+    )
+    if tree is None:
+        return None
+    if tree.get("truncated"):
+        contents = await client.get_json(f"/repos/{org}/{name}/contents/{RESULTS_DIR}")
+        if contents is None:
+            return None
+        entries = [
+            (e["path"], "blob" if e["type"] == "file" else e["type"], e["sha"], e["size"])
+            for e in contents
+        ]
+    else:
+        entries = [
+            (e["path"], e["type"], e["sha"], e.get("size")) for e in tree["tree"]
+        ]
+    return results_tree_files(entries, results_files)
+
+
+async def _load_repo(client, org, item, *args):
+    """Builds the record of a repo, marked for retry if it cannot be loaded.
+
+    A failed request must not abort the whole ingest, so like
+    `run_leaderboard.list_files` the repo is scored as missing for now, keeps
+    its previous rows and is processed again next run.
+    """
+    repo = {
+        "name": item["name"],
+        "member": [],
+        "pushed_at": item.get("pushed_at") or "",
+        "files": {},
+    }
+    try:
+        await _fill_repo(client, org, item, repo, *args)
+    except Exception as e:
+        print(f"Issue: could not load {repo['name']}, retrying it next run: {e}")
+        repo["files"] = {}
+        repo["retry"] = True
+    return repo
+
+
+async def _fill_repo(
+    client,
+    org,
+    item,
+    repo,
+    staff,
+    roster,
+    results_files,
+    blob_cache,
+    downloads,
+    min_file_bytes,
+    max_file_bytes,
+):
+    name = item["name"]
+    member = roster.get(name) if roster is not None else None
+    if member is None:
+        collaborators, files = await asyncio.gather(
+            client.get_pages(f"/repos/{org}/{name}/collaborators"),
+            _list_results_files(client, org, item, results_files),
+        )
+        member = sorted(
+            user["login"]
+            for page in collaborators
+            for user in page
+            if user["login"] not in staff
+        )
+        if roster is not None:
+            roster.put(name, member)
+    else:
+        files = await _list_results_files(client, org, item, results_files)
+    repo["member"] = member
+    if files is None:
+        print(f"Issue: results folder not found for {name}")
+    repo["files"] = files or {}
+
+    async def download(sha):
+        await client.store_blob(org, name, sha, blob_cache)
+
+    async def prefetch(entry):
+        if entry.sha in blob_cache and entry.sha not in downloads:
+            return
+        # Blobs shared by several repos (e.g. starter files) are downloaded once
+        if entry.sha not in downloads:
+            downloads[entry.sha] = asyncio.ensure_future(download(entry.sha))
+        await downloads[entry.sha]
+
+    await asyncio.gather(
+        *(
+            prefetch(entry)
+            for entry in repo["files"].values()
+            if is_downloadable(entry, min_file_bytes, max_file_bytes)
+        )
+    )
+
+
+async def load_repos_async(
+    token,
+    org,
+    assignment_prefix,
+    staff,
+    results_files,
+    blob_cache,
+    api_url=DEFAULT_API_URL,
+    concurrency=DEFAULT_CONCURRENCY,
+    select=None,
+    scheduler=None,
+    min_file_bytes=DEFAULT_MIN_FILE_BYTES,
+    max_file_bytes=None,
+    roster=None,
+):
+    """Lists repos, members and results files and downloads the blobs concurrently.
+
+    Downloaded blobs are stored in `blob_cache`, so the scoring loop reads them
+    without further requests.
+
+    Inputs:
+        token (str): The GitHub token.
+        org (str): The GitHub organization login.
+        assignment_prefix (str): Only repos whose name starts with this are kept.
+        staff (set): Logins to exclude from member lists and repo names.
+        results_files (list): Suffixes of the results files to keep.
+        blob_cache (BlobCache): Where downloaded blobs are stored.
+        api_url (str): The REST API root.
+        concurrency (int): Maximum number of concurrent requests.
+        select: Optional `select(name, pushed_at)` predicate; repos for which it
+            returns False are listed but not fetched.
+        scheduler: Optional `rate_limit.RateLimitScheduler` pacing the requests.
+        min_file_bytes (int): Results files below this size are not downloaded.
+        max_file_bytes (int): Results files above this size are not downloaded.
+        roster (RosterCache): Optional cache of member lists; collaborators are
+            only fetched for repos it has no valid entry for.
+
+    Returns:
+        tuple: The `{"name", "member", "pushed_at", "files"}` repo records and
+            the names of all listed repos. Repos that could not be loaded are
+            marked with `"retry": True`.
+    """
+    async with AsyncGitHub(token, api_url, concurrency, scheduler) as client:
+        items = await list_repos_async(client, org, assignment_prefix)
+        repo_names = [item["name"] for item in items]
+        items = [
+            item
+            for item in items
+            if not any(login in item["name"] for login in staff)
+            and (select is None or select(item["name"], item.get("pushed_at") or ""))
+        ]
+        downloads = {}
+        repos = await asyncio.gather(
+            *(
+                _load_repo(
+                    client,
+                    org,
+                    item,
+                    staff,
+                    roster,
+                    results_files,
+                    blob_cache,
+                    downloads,
+                    min_file_bytes,
+                    max_file_bytes,
+                )
+                for item in items
+            )
+        )
+        print(f"Async ingest: {client.requests} requests")
+    return list(repos), repo_names
@@ -0,0 +1,506 @@
+"""Local stand-in for the parts of the GitHub API the leaderboard runner uses.
+
+Serves an org's repo listing and search, repos, collaborators, recursive git
+trees, blobs (JSON and raw), directory contents, branches and commits, and
+contents writes to the leaderboard repo (any repo named `*leaderboard`).
+The GraphQL endpoint answers the queries of `github_graphql` (repo search,
+org repo listing and collaborator pages), telling them apart by their root
+field rather than parsing them. Responses carry ETags and the rate limit
+headers of their resource (`core`, `search` or `graphql`, with GitHub's limits
+and windows). Repos without files answer git reads with a 409, like empty
+repos on GitHub. A configurable latency, error rate and secondary rate limit
+rate are injected, so the runner's caches, scheduler and retries are exercised
+as against the real API.
+"""
+
+import base64
+import hashlib
+import json
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlencode, urlparse
+
+from rate_limit import request_resource
+
+DEFAULT_RATE_LIMIT = 5000
+DEFAULT_SEARCH_RATE_LIMIT = 30
+# Seconds until a resource's rate limit resets
+RATE_LIMIT_WINDOWS = {"core": 3600, "search": 60, "graphql": 3600}
+DEFAULT_PUSHED_AT = "2025-01-01T00:00:00Z"
+# Returns the API calls served so far, by `endpoint_kind`
+STATS_PATH = "/_benchmark/calls"
+GRAPHQL_PATH = "/graphql"
+
+
+def blob_sha(data):
+    """Returns the git blob SHA of some bytes."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def endpoint_kind(method, path):
+    """Groups a request path by what the runner uses it for, e.g. `collaborators`."""
+    if method == "PUT":
+        return "write"
+    if path == GRAPHQL_PATH:
+        return "graphql"
+    if path.startswith("/search/") or re.fullmatch(r"/orgs/[^/]+/repos", path):
+        return "listing"
+    for kind in ("collaborators", "git/trees", "git/blobs", "contents"):
+        if f"/{kind}" in path:
+            return kind.split("/")[-1]
+    return "other"
+
+
+class FakeOrg:
+    """The repos of a fake org and the files in them.
+
+    File contents are stored on disk by their blob SHA, so large orgs do not
+    have to be held in memory and serving a blob costs no more than reading it.
+
+    Inputs:
+        name (str): The org login.
+        directory (Path): Where the blobs are stored.
+    """
+
+    def __init__(self, name, directory):
+        self.name = name
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.repos = {}
+        self.written = {}
+
+    def add_repo(self, name, members, files, pushed_at=DEFAULT_PUSHED_AT):
+        """Adds a repo with its collaborators and files, given as `{path: bytes}`."""
+        listing = {}
+        for path, data in files.items():
+            sha = blob_sha(data)
+            listing[path] = (sha, len(data))
+            blob_path = self.directory / sha
+            if not blob_path.exists():
+                blob_path.write_bytes(data)
+        head = hashlib.sha1(json.dumps(sorted(listing.items())).encode()).hexdigest()
+        self.repos[name] = {
+            "members": list(members),
+            "files": listing,
+            "pushed_at": pushed_at,
+            "head": head,
+        }
+
+    def blob(self, sha):
+        """Returns the bytes of a blob, or None if no repo has it."""
+        try:
+            return (self.directory / sha).read_bytes()
+        except FileNotFoundError:
+            return None
+
+
+class FakeGitHub(ThreadingHTTPServer):
+    """HTTP server answering GitHub REST requests for a `FakeOrg`.
+
+    Inputs:
+        org (FakeOrg): The org to serve.
+        address (tuple): `(host, port)` to listen on; port 0 picks a free one.
+        latency (float): Seconds added to every response.
+        error_rate (float): Share of requests answered with a 502.
+        secondary_rate (float): Share of requests answered with a secondary
+            rate limit 403.
+        rate_limit (int): The `core` (and `graphql`) `X-RateLimit-Limit` of
+            the fake token. Requests over the limit get a 403 until the reset.
+        search_rate_limit (int): The `search` `X-RateLimit-Limit`.
+        seed (int): Seed of the error injection.
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        org,
+        address=("127.0.0.1", 0),
+        latency=0.0,
+        error_rate=0.0,
+        secondary_rate=0.0,
+        rate_limit=DEFAULT_RATE_LIMIT,
+        search_rate_limit=DEFAULT_SEARCH_RATE_LIMIT,
+        seed=0,
+    ):
+        super().__init__(address, _Handler)
+        self.org = org
+        self.latency = latency
+        self.error_rate = error_rate
+        self.secondary_rate = secondary_rate
+        self.limits = {
+            "core": rate_limit,
+            "search": search_rate_limit,
+            "graphql": rate_limit,
+        }
+        self.used = Counter()
+        self.resets = {}
+        self.calls = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def handle_error(self, request, client_address):
+        # Clients giving up on a response (e.g. a hedged request) are expected
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count(self, method, path):
+        with self._lock:
+            self.calls[endpoint_kind(method, path)] += 1
+            return sum(self.calls.values())
+
+    def spend(self, path):
+        """Counts a request against its resource's rate limit.
+
+        Returns:
+            tuple: The rate limit headers of the response, and whether the
+                request is over the limit.
+        """
+        resource = request_resource(path)
+        with self._lock:
+            now = time.time()
+            if now >= self.resets.get(resource, 0):
+                self.resets[resource] = int(now) + RATE_LIMIT_WINDOWS[resource]
+                self.used[resource] = 0
+            self.used[resource] += 1
+            limit = self.limits[resource]
+            return {
+                "X-RateLimit-Limit": str(limit),
+                "X-RateLimit-Remaining": str(max(0, limit - self.used[resource])),
+                "X-RateLimit-Reset": str(self.resets[resource]),
+                "X-RateLimit-Resource": resource,
+                "X-RateLimit-Used": str(min(limit, self.used[resource])),
+            }, self.used[resource] > limit
+
+    def injected_failure(self):
+        """Returns the status of an injected failure for the next request, if any."""
+        with self._lock:
+            draw = self._random.random()
+        if draw < self.error_rate:
+            return 502
+        if draw < self.error_rate + self.secondary_rate:
+            return 403
+        return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    rate_limit_headers = {}
+
+    def log_message(self, *args):
+        pass
+
+    @property
+    def org(self):
+        return self.server.org
+
+    def _base(self):
+        return f"http://{self.headers['Host']}"
+
+    def _send(self, status, payload, headers=None):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        headers = dict(headers or {})
+        if status == 200 and self.command == "GET":
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            headers["ETag"] = etag
+            if self.headers.get("If-None-Match") == etag:
+                status, body = 304, b""
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in {**self.rate_limit_headers, **headers}.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def _page(self, items, query):
+        per_page = int(query.get("per_page", ["30"])[0])
+        page = int(query.get("page", ["1"])[0])
+        headers = {}
+        if page * per_page < len(items):
+            params = {name: values[0] for name, values in query.items()}
+            params["page"] = str(page + 1)
+            path = urlparse(self.path).path
+            headers["Link"] = f'<{self._base()}{path}?{urlencode(params)}>; rel="next"'
+        return items[(page - 1) * per_page : page * per_page], headers
+
+    def _repo_json(self, name):
+        repo = self.org.repos.get(name, {"pushed_at": DEFAULT_PUSHED_AT})
+        return {
+            "id": int(hashlib.sha1(name.encode()).hexdigest()[:8], 16),
+            "name": name,
+            "full_name": f"{self.org.name}/{name}",
+            "owner": {"login": self.org.name, "type": "Organization"},
+            "url": f"{self._base()}/repos/{self.org.name}/{name}",
+            "created_at": DEFAULT_PUSHED_AT,
+            "pushed_at": repo["pushed_at"],
+            "default_branch": "main",
+        }
+
+    def _file_json(self, name, path, sha, size):
+        return {
+            "type": "file",
+            "name": path.split("/")[-1],
+            "path": path,
+            "sha": sha,
+            "size": size,
+            "url": f"{self._base()}/repos/{self.org.name}/{name}/contents/{path}",
+        }
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query, path = parse_qs(url.query), url.path
+        if path == STATS_PATH:
+            # Not an API call, so not counted
+            return self._send(200, dict(self.server.calls))
+        self.server.count("GET", path)
+        self.rate_limit_headers, exceeded = self.server.spend(path)
+        if exceeded:
+            return self._send(403, {"message": "API rate limit exceeded."})
+
+        failure = self.server.injected_failure()
+        if failure == 502:
+            return self._send(502, {"message": "Server Error"})
+        if failure == 403:
+            return self._send(
+                403,
+                {"message": "You have exceeded a secondary rate limit."},
+                {"Retry-After": "1"},
+            )
+
+        org = self.org.name
+        if path == f"/orgs/{org}":
+            return self._send(200, {"login": org, "url": f"{self._base()}/orgs/{org}"})
+        if path == f"/orgs/{org}/repos":
+            items = [self._repo_json(name) for name in self.org.repos]
+            return self._send(200, *self._page(items, query))
+        if path == "/search/repositories":
+            term = query["q"][0].split()[0]
+            items = [self._repo_json(name) for name in self.org.repos if term in name]
+            page, headers = self._page(items, query)
+            result = {"total_count": len(items), "incomplete_results": False}
+            return self._send(200, {**result, "items": page}, headers)
+
+        match = re.fullmatch(rf"/repos/{org}/([^/]+)(/.*)?", path)
+        if match is None:
+            return self._send(404, {"message": "Not Found"})
+        name, rest = match.group(1), match.group(2) or ""
+        if name not in self.org.repos:
+            if not name.endswith("leaderboard"):
+                return self._send(404, {"message": "Not Found"})
+            if rest == "":
+                # The leaderboard repo
+                return self._send(200, self._repo_json(name))
+            if rest.startswith("/contents/"):
+                return self._leaderboard_contents(name, rest[len("/contents/") :])
+            return self._send(404, {"message": "Not Found"})
+
+        repo = self.org.repos[name]
+        if rest == "":
+            return self._send(200, self._repo_json(name))
+        if not repo["files"] and rest.startswith(
+            ("/git/", "/contents/", "/commits/", "/branches/")
+        ):
+            # A repo without files has no commits yet
+            return self._send(409, {"message": "Git Repository is empty."})
+        if rest == "/collaborators":
+            users = [
+                {"login": login, "url": f"{self._base()}/users/{login}"}
+                for login in repo["members"]
+            ]
+            return self._send(200, *self._page(users, query))
+        if rest.startswith("/git/trees/"):
+            tree = [
+                {"path": file_path, "mode": "100644", "type": "blob", "sha": sha}
+                | {"size": size}
+                for file_path, (sha, size) in repo["files"].items()
+            ]
+            directories = {p.rsplit("/", 1)[0] for p in repo["files"] if "/" in p}
+            tree += [
+                {"path": d, "mode": "040000", "type": "tree"}
+                | {"sha": blob_sha(d.encode())}
+                for d in directories
+            ]
+            tree = {"sha": repo["head"], "truncated": False, "tree": tree}
+            return self._send(200, tree)
+        if rest.startswith("/git/blobs/"):
+            sha = rest[len("/git/blobs/") :]
+            data = self.org.blob(sha)
+            if data is None:
+                return self._send(404, {"message": "Not Found"})
+            if "raw" in self.headers.get("Accept", ""):
+                return self._send(200, data)
+            blob = {"sha": sha, "size": len(data), "encoding": "base64"}
+            return self._send(200, {**blob, "content": base64.b64encode(data).decode()})
+        if rest.startswith("/contents/"):
+            directory = rest[len("/contents/") :]
+            files = [
+                self._file_json(name, file_path, sha, size)
+                for file_path, (sha, size) in repo["files"].items()
+                if file_path.startswith(directory + "/")
+            ]
+            if not files:
+                return self._send(404, {"message": "Not Found"})
+            return self._send(200, files)
+        if rest.startswith("/commits/") or rest.startswith("/branches/"):
+            commit = {"sha": repo["head"], "commit": {"sha": repo["head"]}}
+            return self._send(200, {**commit, "name": "main"})
+        return self._send(404, {"message": "Not Found"})
+
+    def _leaderboard_contents(self, name, path):
+        written = self.org.written
+        if path in written:
+            data = written[path]
+            file_json = self._file_json(name, path, blob_sha(data), len(data))
+            content = {"encoding": "base64", "content": base64.b64encode(data).decode()}
+            return self._send(200, {**file_json, **content})
+        files = [
+            self._file_json(name, file_path, blob_sha(data), len(data))
+            for file_path, data in written.items()
+            if file_path.startswith(path + "/")
+        ]
+        if files:
+            return self._send(200, files)
+        return self._send(404, {"message": "Not Found"})
+
+    def _graphql_page(self, items, first, after):
+        start = int(after or 0)
+        end = start + first
+        page_info = {"hasNextPage": end < len(items), "endCursor": str(end)}
+        return items[start:end], page_info
+
+    def _graphql_collaborators(self, name, first, after=None):
+        logins = self.org.repos[name]["members"]
+        nodes, page_info = self._graphql_page(logins, first, after)
+        return {"pageInfo": page_info, "nodes": [{"login": login} for login in nodes]}
+
+    def _graphql_repo(self, name, collaborators):
+        repo = self.org.repos[name]
+        prefix = "results/"
+        entries = [
+            {
+                "name": path[len(prefix) :],
+                "oid": sha,
+                "type": "blob",
+                "object": {"byteSize": size},
+            }
+            for path, (sha, size) in repo["files"].items()
+            if path.startswith(prefix) and "/" not in path[len(prefix) :]
+        ]
+        folders = {
+            path[len(prefix) :].split("/")[0]
+            for path in repo["files"]
+            if path.startswith(prefix) and "/" in path[len(prefix) :]
+        }
+        entries += [
+            {
+                "name": folder,
+                "oid": blob_sha(folder.encode()),
+                "type": "tree",
+                "object": {},
+            }
+            for folder in folders
+        ]
+        has_results = any(path.startswith(prefix) for path in repo["files"])
+        return {
+            "name": name,
+            "pushedAt": repo["pushed_at"],
+            "defaultBranchRef": {"target": {"oid": repo["head"]}},
+            "collaborators": self._graphql_collaborators(name, collaborators),
+            "results": {"entries": entries} if has_results else None,
+        }
+
+    def _graphql(self, query, variables):
+        # The nested collaborators connection asks for this many logins
+        match = re.search(r"collaborators\(first: (\d+)", query)
+        collaborators = int(match.group(1)) if match else 100
+        if "search(" in query:
+            term = variables["query"].split()[0]
+            names = [name for name in self.org.repos if term in name]
+            page, page_info = self._graphql_page(
+                names, variables["pageSize"], variables.get("cursor")
+            )
+            nodes = [self._graphql_repo(name, collaborators) for name in page]
+            search = {"repositoryCount": len(names), "pageInfo": page_info}
+            return {"search": {**search, "nodes": nodes}}
+        if "organization(" in query:
+            names = sorted(self.org.repos)
+            page, page_info = self._graphql_page(
+                names, variables["pageSize"], variables.get("cursor")
+            )
+            nodes = [self._graphql_repo(name, collaborators) for name in page]
+            repositories = {"pageInfo": page_info, "nodes": nodes}
+            return {"organization": {"repositories": repositories}}
+        if "repository(" in query:
+            name = variables["name"]
+            if name not in self.org.repos:
+                return None
+            connection = self._graphql_collaborators(
+                name, collaborators, variables.get("cursor")
+            )
+            return {"repository": {"collaborators": connection}}
+        return None
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        self.server.count("POST", path)
+        self.rate_limit_headers, exceeded = self.server.spend(path)
+        if exceeded:
+            return self._send(403, {"message": "API rate limit exceeded."})
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if path != GRAPHQL_PATH:
+            return self._send(404, {"message": "Not Found"})
+
+        failure = self.server.injected_failure()
+        if failure == 502:
+            return self._send(502, {"message": "Server Error"})
+        if failure == 403:
+            return self._send(
+                403,
+                {"message": "You have exceeded a secondary rate limit."},
+                {"Retry-After": "1"},
+            )
+
+        data = self._graphql(body["query"], body.get("variables") or {})
+        if data is None:
+            error = {"type": "NOT_FOUND", "message": "Could not resolve the query"}
+            return self._send(200, {"data": None, "errors": [error]})
+        return self._send(200, {"data": data})
+
+    def do_PUT(self):
+        path = urlparse(self.path).path
+        self.server.count("PUT", path)
+        self.rate_limit_headers, exceeded = self.server.spend(path)
+        if exceeded:
+            return self._send(403, {"message": "API rate limit exceeded."})
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        match = re.fullmatch(rf"/repos/{self.org.name}/([^/]+)/contents/(.+)", path)
+        if match is None:
+            return self._send(404, {"message": "Not Found"})
+        name, file_path = match.groups()
+        data = base64.b64decode(body["content"])
+        self.org.written[file_path] = data
+        file_json = self._file_json(name, file_path, blob_sha(data), len(data))
+        return self._send(201, {"content": file_json, "commit": {"sha": "0" * 40}})
+
+
+def serve(org, **kwargs):
+    """Starts a `FakeGitHub` server for `org` in a background thread and returns it."""
+    server = FakeGitHub(org, **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
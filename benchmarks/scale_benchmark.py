@@ -0,0 +1,514 @@
+"""End-to-end benchmark of the leaderboard runner against a synthetic org.
+
+For each assignment, generates an org of student repos (see `synthetic_org`),
+serves it from a local fake GitHub (see `fake_github`) and runs the real
+update against it, with the repo's `config_aN.yaml` pointed at the fake API
+(A3 runs through `run_a3_leaderboard.py`, set up from the same config).
+Reports the wall time, API calls and peak RSS of every stage:
+
+    python -m benchmarks.scale_benchmark --repos 500 --latency 0.05
+
+Each run happens in a fresh process with empty caches, so the numbers are
+those of a cold run; `--runs 2` adds warm runs reusing the caches.
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from urllib.request import urlopen
+
+import yaml
+
+from benchmarks.fake_github import GRAPHQL_PATH, STATS_PATH, serve
+from benchmarks.synthetic_org import (
+    ASSIGNMENTS,
+    DEFAULT_BROKEN_SHARE,
+    EMBEDDING_DIM,
+    STAFF_LOGIN,
+    TRANSCRIPT_WORDS,
+    generate_org,
+)
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+CONFIGS = {
+    "assignment-1": REPO_DIR / "config_a1.yaml",
+    "assignment-2": REPO_DIR / "config_a2.yaml",
+    "assignment-3": REPO_DIR / "config_a3.yaml",
+}
+SAMPLE_SECONDS = 0.01
+
+# Pipeline stages and the API calls they make, by `fake_github.endpoint_kind`
+STAGE_CALLS = {
+    "discover": ("collaborators",),
+    "list": ("trees", "contents"),
+    "download": ("blobs",),
+}
+PHASES = ("load_context", "listing", "pipeline", "publish")
+
+
+def current_rss():
+    """Returns the resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # No procfs (e.g. macOS): fall back to the peak so far
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class StageProfiler:
+    """Records the wall time, busy time and peak RSS of overlapping stages.
+
+    A background thread samples the RSS; every sample counts towards the peak
+    of all stages active at that moment.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self._active = Counter()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+
+    def _stage(self, name):
+        return self.stages.setdefault(
+            name,
+            {"start": None, "end": None, "busy": 0.0, "items": 0, "peak_rss": 0},
+        )
+
+    def _sample(self):
+        while not self._stopped.wait(SAMPLE_SECONDS):
+            self._record_rss()
+
+    def _record_rss(self):
+        rss = current_rss()
+        with self._lock:
+            for name, active in self._active.items():
+                if active:
+                    stage = self.stages[name]
+                    stage["peak_rss"] = max(stage["peak_rss"], rss)
+
+    @contextmanager
+    def measure(self, name):
+        started = time.monotonic()
+        with self._lock:
+            stage = self._stage(name)
+            if stage["start"] is None:
+                stage["start"] = started
+            self._active[name] += 1
+        self._record_rss()
+        try:
+            yield
+        finally:
+            self._record_rss()
+            ended = time.monotonic()
+            with self._lock:
+                self._active[name] -= 1
+                stage["end"] = max(stage["end"] or ended, ended)
+                stage["busy"] += ended - started
+                stage["items"] += 1
+
+    def wrap(self, name, function):
+        def measured(item):
+            with self.measure(name):
+                return function(item)
+
+        return measured
+
+    def stop(self):
+        self._stopped.set()
+        self._sampler.join()
+
+
+def api_calls(api_url):
+    with urlopen(api_url + STATS_PATH) as response:
+        return Counter(json.load(response))
+
+
+def run_config(config_path, api_url):
+    """Runs one leaderboard update with every stage profiled.
+
+    Runs in a process of its own, so the RSS is the runner's alone.
+
+    Returns:
+        dict: Per stage, the wall and busy seconds, items, API calls by
+            endpoint and peak RSS; and the totals of the run.
+    """
+    import run_leaderboard
+
+    profiler = StageProfiler()
+    calls = {}
+
+    @contextmanager
+    def phase(name):
+        before = api_calls(api_url)
+        with profiler.measure(name):
+            yield
+        calls[name] = api_calls(api_url) - before
+
+    def run_pipeline(source, stages, **kwargs):
+        stages = [
+            (name, profiler.wrap(name, function), workers)
+            for name, function, workers in stages
+        ]
+        with phase("pipeline"):
+            return pipeline(source, stages, **kwargs)
+
+    pipeline = run_leaderboard.run_pipeline
+    # The runner's own code paths, measured from the outside
+    run_leaderboard.run_pipeline = run_pipeline
+
+    started = time.monotonic()
+    with phase("load_context"):
+        ctx = run_leaderboard.load_context(config_path)
+        ctx["test_data"].result()
+    list_repos = run_leaderboard.list_repos
+
+    def listing(ctx, listed=None):
+        with phase("listing"):
+            return list_repos(ctx, listed)
+
+    run_leaderboard.list_repos = listing
+    repos, carried, repo_names = run_leaderboard.score_assignment(ctx)
+    with phase("publish"):
+        run_leaderboard.publish_assignment(ctx, repos, carried, repo_names)
+    wall = time.monotonic() - started
+    profiler.stop()
+
+    # Attribute the pipeline's calls to the stages making them
+    pipeline_calls = calls.pop("pipeline", Counter())
+    stages = {}
+    for name, stage in profiler.stages.items():
+        if name in PHASES:
+            stage_calls = calls.get(name, pipeline_calls)
+        else:
+            kinds = STAGE_CALLS.get(name, ())
+            stage_calls = Counter(
+                {kind: pipeline_calls.pop(kind, 0) for kind in kinds}
+            )
+        stages[name] = {
+            "wall_seconds": stage["end"] - stage["start"],
+            "busy_seconds": stage["busy"],
+            "items": stage["items"],
+            "api_calls": sum(stage_calls.values()),
+            "api_calls_by_endpoint": dict(+stage_calls),
+            "peak_rss_mb": stage["peak_rss"] / 1024 / 1024,
+        }
+    # Blobs the download stage left to the score stage, and anything else
+    stages["pipeline"]["api_calls"] = sum(pipeline_calls.values())
+    stages["pipeline"]["api_calls_by_endpoint"] = dict(+pipeline_calls)
+
+    return {
+        "wall_seconds": wall,
+        "api_calls": sum(stage["api_calls"] for stage in stages.values()),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "repos": len(repos),
+        "rows": sum(len(repo["rows"]) for repo in repos),
+        "stages": stages,
+    }
+
+
+def a3_settings(config_path):
+    """Returns the module settings of `run_a3_leaderboard` matching a written config.
+
+    The A3 runner reads no config; its settings are module constants.
+    """
+    with open(config_path, "r") as config_file:
+        config = yaml.safe_load(config_file)
+    test_data = config["test_data"]
+    return {
+        "CLASS": config["github"]["organization"],
+        "LEADERBOARD_REPO_NAME": config["github"]["leaderboard_repo"],
+        "REPO_ASSIGNMENT_PREFIX": config["github"]["assignment_prefix"],
+        "API_URL": config["github"]["api_url"],
+        "STAFF": set(config["staff"]),
+        "TEST_DATA_DIR": (
+            Path(test_data["directory"]) / test_data["assignment_test_data"]
+        ),
+        "BLOB_CACHE_DIR": Path(config["blob_cache"]["directory"]),
+        "HTTP_CACHE_DIR": Path(config["http_cache"]["directory"]),
+        "SCORE_CACHE_PATH": (
+            Path(config["score_cache"]["directory"]) / "run_a3_leaderboard.json"
+        ),
+        "ROSTER_PATH": Path(config["roster"]["directory"]) / "assignment-3.json",
+    }
+
+
+def run_a3_config(config_path, api_url):
+    """Runs one `run_a3_leaderboard.py` update with its phases profiled.
+
+    The runner's settings are pointed at the paths of `config_path` (see
+    `a3_settings`). It is not pipelined: the update stage covers the whole
+    run, and listing, discovering, downloading and parsing are measured
+    around the functions it calls.
+
+    Returns:
+        dict: Like `run_config`.
+    """
+    import run_a3_leaderboard as runner
+
+    for name, value in a3_settings(config_path).items():
+        setattr(runner, name, value)
+
+    profiler = StageProfiler()
+    calls = {}
+    repos = []
+
+    @contextmanager
+    def phase(name):
+        before = api_calls(api_url)
+        with profiler.measure(name):
+            yield
+        calls[name] = api_calls(api_url) - before
+
+    list_assignment_repos = runner.list_assignment_repos
+    discover_repos = runner.discover_repos
+
+    def listing(*args):
+        with phase("listing"):
+            return list_assignment_repos(*args)
+
+    def discover(*args, **kwargs):
+        with phase("discover"):
+            repos.extend(discover_repos(*args, **kwargs))
+            return repos
+
+    class ProfiledBlobCache(runner.BlobCache):
+        def open_or_fetch(self, sha, fetch):
+            with profiler.measure("download"):
+                return super().open_or_fetch(sha, fetch)
+
+    runner.list_assignment_repos = listing
+    runner.discover_repos = discover
+    runner.BlobCache = ProfiledBlobCache
+    runner.read_embedding = profiler.wrap("parse", runner.read_embedding)
+
+    started = time.monotonic()
+    with phase("update"):
+        runner.main(None)
+    wall = time.monotonic() - started
+    profiler.stop()
+
+    # The update's own calls are those outside the listing and discovery
+    update_calls = calls["update"] - calls["listing"] - calls["discover"]
+    calls["download"] = Counter({"blobs": update_calls.pop("blobs", 0)})
+    calls["update"] = update_calls
+    stages = {}
+    for name, stage in profiler.stages.items():
+        stage_calls = calls.get(name, Counter())
+        stages[name] = {
+            "wall_seconds": stage["end"] - stage["start"],
+            "busy_seconds": stage["busy"],
+            "items": stage["items"],
+            "api_calls": sum(stage_calls.values()),
+            "api_calls_by_endpoint": dict(+stage_calls),
+            "peak_rss_mb": stage["peak_rss"] / 1024 / 1024,
+        }
+
+    return {
+        "wall_seconds": wall,
+        "api_calls": sum(stage["api_calls"] for stage in stages.values()),
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "repos": len(repos),
+        "stages": stages,
+    }
+
+
+def write_config(assignment, directory, api_url, options):
+    """Writes the repo's config of `assignment`, pointed at the fake API and `directory`."""
+    with open(CONFIGS[assignment.assignment], "r") as config_file:
+        config = yaml.safe_load(config_file)
+
+    config["dry_run"] = False
+    config["github"]["api_url"] = api_url
+    config["github"]["graphql_url"] = api_url + GRAPHQL_PATH
+    config["github"]["assignment_name"] = assignment.assignment
+    config["test_data"] = {
+        "directory": str(directory / "test-data"),
+        "assignment_test_data": assignment.assignment,
+    }
+    config["staff"] = [STAFF_LOGIN]
+    config["ingest"] = options.ingest
+    cache_dir = directory / ".cache"
+    config["blob_cache"] = {"directory": str(cache_dir / "blobs")}
+    config["score_cache"] = {"directory": str(cache_dir / "scores")}
+    config["state"] = {"directory": str(cache_dir / "state")}
+    config["http_cache"] = {"directory": str(cache_dir / "http")}
+    config["roster"] = {"directory": str(cache_dir / "rosters")}
+    assignment.write_test_data(directory / "test-data" / assignment.assignment)
+
+    config_path = directory / f"{assignment.assignment}.yaml"
+    with open(config_path, "w") as config_file:
+        yaml.safe_dump(config, config_file)
+    return config_path
+
+
+def benchmark_assignment(name, options, directory):
+    """Generates and serves the org of one assignment and runs the updates against it."""
+    if name == "assignment-2":
+        assignment = ASSIGNMENTS[name](
+            seed=options.seed, scale=options.scale, transcript_words=options.words
+        )
+    elif name == "assignment-3":
+        assignment = ASSIGNMENTS[name](
+            seed=options.seed, scale=options.scale, dim=options.dim
+        )
+    else:
+        assignment = ASSIGNMENTS[name](seed=options.seed, scale=options.scale)
+
+    directory.mkdir(parents=True)
+    with open(CONFIGS[name], "r") as config_file:
+        prefix = yaml.safe_load(config_file)["github"]["assignment_prefix"]
+    started = time.monotonic()
+    org = generate_org(
+        assignment,
+        options.repos,
+        prefix,
+        directory / "blobs",
+        seed=options.seed,
+        broken_share=options.broken_share,
+    )
+    setup = time.monotonic() - started
+    print(f"Generated {options.repos} repos for {name} in {setup:.1f}s")
+
+    server = serve(
+        org,
+        latency=options.latency,
+        error_rate=options.error_rate,
+        secondary_rate=options.secondary_rate,
+    )
+    config_path = write_config(assignment, directory, server.url, options)
+    # A3 is still scored by its own runner
+    runner = run_a3_config if name == "assignment-3" else run_config
+    runs = []
+    try:
+        for run in range(options.runs):
+            # Spawned, so every run starts from a clean interpreter
+            with ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn")
+            ) as executor:
+                future = executor.submit(runner, str(config_path), server.url)
+                try:
+                    runs.append(future.result())
+                except Exception as e:
+                    print(f"Issue: {name} run {run + 1} failed: {e}")
+                    runs.append({"error": str(e)})
+    finally:
+        server.shutdown()
+    return {"assignment": name, "setup_seconds": setup, "runs": runs}
+
+
+def print_report(result):
+    for index, run in enumerate(result["runs"]):
+        label = "cold" if index == 0 else "warm"
+        print(f"\n{result['assignment']}, run {index + 1} ({label}):")
+        if "error" in run:
+            print(f"  failed: {run['error']}")
+            continue
+        print(
+            f"  {'stage':<14}{'wall s':>9}{'busy s':>9}{'items':>8}"
+            f"{'API calls':>11}{'peak RSS MB':>13}"
+        )
+        for name, stage in run["stages"].items():
+            print(
+                f"  {name:<14}{stage['wall_seconds']:>9.2f}"
+                f"{stage['busy_seconds']:>9.2f}{stage['items']:>8}"
+                f"{stage['api_calls']:>11}{stage['peak_rss_mb']:>13.1f}"
+            )
+        print(
+            f"  {'total':<14}{run['wall_seconds']:>9.2f}{'':>9}{run['repos']:>8}"
+            f"{run['api_calls']:>11}{run['peak_rss_mb']:>13.1f}"
+        )
+
+
+def main(options):
+    # The runner reads its credentials from the environment; any will do here
+    os.environ.setdefault("GITHUB_USERNAME", "benchmark")
+    os.environ.setdefault("GITHUB_TOKEN", "benchmark-token")
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="leaderboard-benchmark-") as tmp:
+        for name in options.assignments:
+            result = benchmark_assignment(name, options, Path(tmp) / name)
+            print_report(result)
+            results.append(result)
+
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump({"options": vars(options), "results": results}, f, indent=2)
+        print(f"\nResults written to {options.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the leaderboard runner against a synthetic org"
+    )
+    parser.add_argument(
+        "--assignments",
+        nargs="+",
+        choices=sorted(ASSIGNMENTS),
+        default=sorted(ASSIGNMENTS),
+        help="Assignments to benchmark, each with its own org and config.",
+    )
+    parser.add_argument("--repos", type=int, default=100, help="Student repos.")
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=1,
+        help="Runs per assignment; runs after the first reuse the caches.",
+    )
+    parser.add_argument(
+        "--ingest",
+        choices=["pygithub", "async", "graphql"],
+        default="pygithub",
+        help="Ingest mode of the runner. Git mirrors are not served.",
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds added to every response."
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Share of requests failing with 502.",
+    )
+    parser.add_argument(
+        "--secondary-rate",
+        type=float,
+        default=0.0,
+        help="Share of requests hitting a secondary rate limit.",
+    )
+    parser.add_argument(
+        "--broken-share",
+        type=float,
+        default=DEFAULT_BROKEN_SHARE,
+        help="Share of repos with a broken submission.",
+    )
+    parser.add_argument(
+        "--scale", type=float, default=1.0, help="Multiplier of the test set sizes."
+    )
+    parser.add_argument(
+        "--dim",
+        type=int,
+        default=EMBEDDING_DIM,
+        help="Embedding dimension of A3 submissions.",
+    )
+    parser.add_argument(
+        "--words",
+        type=int,
+        default=TRANSCRIPT_WORDS,
+        help="Average words of an A2 transcript.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, help="Write the results as JSON here.")
+    main(parser.parse_args())
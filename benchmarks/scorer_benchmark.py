@@ -0,0 +1,356 @@
+"""Micro-benchmarks of the scoring functions of every assignment.
+
+Times `assignment_1_utils.compute_scores`, `assignment_2_utils.compute_scores`
+(WER through `evaluate`), `assignment_3_utils.read_embedding`,
+`get_similarity_scores` and `compute_spearman_correlation` on synthetic
+predictions (see `synthetic_org`), from test set size up to 100 times that,
+with A3 embeddings of 300 to 1024 dimensions and long A2 transcripts:
+
+    python -m benchmarks.scorer_benchmark --output scorers.json
+    python -m benchmarks.scorer_benchmark --compare scorers.json
+
+Reports the time per call, throughput and peak memory of every case. With
+`--compare`, cases slower or hungrier than in the baseline by more than
+`--threshold` are flagged and the exit status is 1.
+"""
+
+import argparse
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic_org import (
+    Assignment1,
+    Assignment2,
+    Assignment3,
+    CONTEXTUAL_TEST_SIZE,
+    NEWSGROUPS_TEST_SIZE,
+    TRANSCRIPTS_TEST_SIZE,
+)
+
+DEFAULT_MULTIPLIERS = (1.0, 10.0, 100.0)
+DEFAULT_DIMS = (300, 768, 1024)
+DEFAULT_WORDS = (20, 200)
+DEFAULT_MIN_SECONDS = 1.0
+DEFAULT_MAX_REPEATS = 10
+DEFAULT_MAX_MEMORY_MB = 2048
+DEFAULT_THRESHOLD = 0.2
+
+# Rough bytes per embedding value once parsed into Python lists of floats
+EMBEDDING_VALUE_BYTES = 32
+REPO = {"name": "benchmark", "member": ["student"]}
+
+
+def case_key(result):
+    """Identifies a case across runs by its function and parameters."""
+    return (result["case"], json.dumps(result["params"], sort_keys=True))
+
+
+def measure(function, min_seconds, max_repeats):
+    """Times `function()` and records its peak memory.
+
+    Calls it until `min_seconds` have passed or `max_repeats` calls were made,
+    then once more under `tracemalloc`, which slows calls down too much to
+    time them at the same time.
+
+    Returns:
+        dict: Median and fastest seconds per call, the number of timed calls
+            and the peak of the memory allocated during a call, in MB.
+    """
+    timings = []
+    started = time.perf_counter()
+    while not timings or (
+        time.perf_counter() - started < min_seconds and len(timings) < max_repeats
+    ):
+        gc.collect()
+        call_started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - call_started)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "seconds": float(np.median(timings)),
+        "min_seconds": min(timings),
+        "repeats": len(timings),
+        "peak_mb": peak / 1024 / 1024,
+    }
+
+
+def assignment_1_cases(options):
+    import assignment_1_utils as utils
+
+    for multiplier in options.multipliers:
+        assignment = Assignment1(seed=options.seed, scale=multiplier)
+        test_data = {
+            "newsgroups": assignment.test_files["newsgroups_test_labels.csv"],
+            "sst2": assignment.test_files["sst2_test_labels.csv"],
+        }
+        file_name = "mlp_newsgroups_test_predictions.csv"
+        pred = pd.read_csv(
+            BytesIO(assignment.results_file(np.random.default_rng(0), file_name))
+        )
+        yield (
+            "a1_compute_scores",
+            {"multiplier": multiplier},
+            len(pred),
+            lambda: utils.compute_scores(file_name, pred, REPO, test_data),
+        )
+
+
+def assignment_2_cases(options):
+    # Loading the WER metric needs `evaluate` and, once, network access
+    import assignment_2_utils as utils
+
+    for words in options.words:
+        for multiplier in options.multipliers:
+            assignment = Assignment2(
+                seed=options.seed, scale=multiplier, transcript_words=words
+            )
+            truths = assignment.test_files["test_ground_truths.csv"]
+            test_data = truths.set_index("id")
+            file_name = "transformer_test_wer_predictions.csv"
+            pred = pd.read_csv(
+                BytesIO(assignment.results_file(np.random.default_rng(0), file_name))
+            )
+            yield (
+                "a2_compute_scores",
+                {"multiplier": multiplier, "words": words},
+                len(pred),
+                lambda: utils.compute_scores(file_name, pred, REPO, test_data),
+            )
+
+
+def assignment_3_cases(options):
+    import assignment_3_utils as utils
+
+    for dim in options.dims:
+        for multiplier in options.multipliers:
+            params = {"multiplier": multiplier, "dim": dim}
+            rows = int(CONTEXTUAL_TEST_SIZE * multiplier)
+            needed_mb = 2 * rows * dim * EMBEDDING_VALUE_BYTES / 1024 / 1024
+            if needed_mb > options.max_memory_mb:
+                reason = f"needs about {needed_mb:.0f} MB, over --max-memory-mb"
+                for case in ("read_embedding", "similarity_scores", "spearman"):
+                    yield f"a3_{case}", params, rows, reason
+                continue
+
+            assignment = Assignment3(seed=options.seed, scale=multiplier, dim=dim)
+            human = assignment.test_files["contextual_test_y.csv"]["similarity"]
+            embeddings = []
+            for seed, words in enumerate(("words1", "words2")):
+                file_name = f"bert_cont_test_{words}_embeddings.txt"
+                rng = np.random.default_rng(seed)
+                content = assignment.results_file(rng, file_name)
+                lines = content.decode().splitlines()
+                embeddings.append(utils.read_embedding(lines)[0])
+            yield (
+                "a3_read_embedding",
+                params,
+                len(lines),
+                lambda: utils.read_embedding(lines),
+            )
+            del lines, content
+
+            E1, E2 = embeddings
+            yield (
+                "a3_similarity_scores",
+                params,
+                len(E1),
+                lambda: utils.get_similarity_scores(E1, E2),
+            )
+            similarity = utils.get_similarity_scores(E1, E2)
+            yield (
+                "a3_spearman",
+                params,
+                len(similarity),
+                lambda: utils.compute_spearman_correlation(similarity, human),
+            )
+            del embeddings, E1, E2
+
+
+SUITES = {
+    "a1": assignment_1_cases,
+    "a2": assignment_2_cases,
+    "a3": assignment_3_cases,
+}
+
+
+def run_suite(name, options):
+    """Runs the cases of one suite and returns their results.
+
+    A case whose inputs cannot be built (e.g. a scorer that fails to import)
+    is recorded as skipped, with the reason.
+    """
+    results = []
+    cases = SUITES[name](options)
+    while True:
+        try:
+            case, params, rows, function = next(cases)
+        except StopIteration:
+            break
+        except Exception as e:
+            print(f"Issue: skipping the {name} suite: {e}")
+            results.append({"case": name, "params": {}, "skipped": str(e)})
+            break
+
+        result = {"case": case, "params": params, "rows": rows}
+        if isinstance(function, str):
+            result["skipped"] = function
+        else:
+            result.update(measure(function, options.min_seconds, options.max_repeats))
+            result["rows_per_second"] = rows / result["seconds"]
+        print_result(result)
+        results.append(result)
+    return results
+
+
+def print_result(result):
+    params = " ".join(f"{name}={value}" for name, value in result["params"].items())
+    label = f"{result['case']:<22}{params:<26}"
+    if "skipped" in result:
+        print(f"{label}skipped: {result['skipped']}")
+        return
+    print(
+        f"{label}{result['seconds'] * 1000:>11.1f} ms"
+        f"{result['rows_per_second']:>14,.0f} rows/s"
+        f"{result['peak_mb']:>10.1f} MB  ({result['repeats']} calls)"
+    )
+
+
+def compare(results, baseline, threshold):
+    """Flags the cases that got slower or use more memory than in the baseline.
+
+    Inputs:
+        results (list): This run's results.
+        baseline (list): The results of the baseline run.
+        threshold (float): Tolerated relative increase, e.g. 0.2 for 20%.
+
+    Returns:
+        list: Descriptions of the regressions.
+    """
+    previous = {case_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        old = previous.get(case_key(result))
+        if old is None or "skipped" in result or "skipped" in old:
+            continue
+        for metric, unit in (("seconds", "s"), ("peak_mb", "MB")):
+            if result[metric] > old[metric] * (1 + threshold):
+                regressions.append(
+                    f"{result['case']} {json.dumps(result['params'])}: {metric} "
+                    f"{old[metric]:.4g}{unit} -> {result[metric]:.4g}{unit} "
+                    f"(+{result[metric] / old[metric] - 1:.0%})"
+                )
+    return regressions
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
+
+
+def main(options):
+    results = []
+    for name in options.suites:
+        results.extend(run_suite(name, options))
+
+    if options.output:
+        with open(options.output, "w") as f:
+            run = {"environment": environment(), "options": vars(options)}
+            json.dump({**run, "results": results}, f, indent=2)
+        print(f"Results written to {options.output}")
+
+    if options.compare:
+        with open(options.compare, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline["results"], options.threshold)
+        if baseline["environment"] != environment():
+            print("Issue: the baseline was recorded in another environment")
+        if regressions:
+            print(f"{len(regressions)} regressions against {options.compare}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"No regressions against {options.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the scoring functions")
+    parser.add_argument(
+        "--suites",
+        nargs="+",
+        choices=sorted(SUITES),
+        default=sorted(SUITES),
+        help="Assignments whose scorers to benchmark.",
+    )
+    parser.add_argument(
+        "--multipliers",
+        type=float,
+        nargs="+",
+        default=DEFAULT_MULTIPLIERS,
+        help="Sizes of the predictions, as multiples of the real test set sizes "
+        f"({NEWSGROUPS_TEST_SIZE} A1 newsgroups, {TRANSCRIPTS_TEST_SIZE} A2 "
+        f"transcripts, {CONTEXTUAL_TEST_SIZE} A3 word pairs).",
+    )
+    parser.add_argument(
+        "--dims",
+        type=int,
+        nargs="+",
+        default=DEFAULT_DIMS,
+        help="Embedding dimensions of the A3 cases.",
+    )
+    parser.add_argument(
+        "--words",
+        type=int,
+        nargs="+",
+        default=DEFAULT_WORDS,
+        help="Average words per transcript of the A2 cases.",
+    )
+    parser.add_argument(
+        "--min-seconds",
+        type=float,
+        default=DEFAULT_MIN_SECONDS,
+        help="Keep calling a function until this much time has passed...",
+    )
+    parser.add_argument(
+        "--max-repeats",
+        type=int,
+        default=DEFAULT_MAX_REPEATS,
+        help="...or it was called this many times.",
+    )
+    parser.add_argument(
+        "--max-memory-mb",
+        type=float,
+        default=DEFAULT_MAX_MEMORY_MB,
+        help="Skip A3 cases whose parsed embeddings would need more memory.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=str, help="Write the results as JSON here.")
+    parser.add_argument(
+        "--compare", type=str, help="Baseline results JSON to check for regressions."
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Relative slowdown or memory growth counted as a regression.",
+    )
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,301 @@
+"""Generates synthetic classroom orgs with realistic A1/A2/A3 submissions.
+
+Every student repo holds the results files of its assignment, scored against
+test data generated alongside, plus a few files the runner should ignore. A
+configurable share of the repos is broken the ways real submissions break:
+no results folder, git-lfs pointers, empty, truncated or malformed files and
+wrong columns. Some repos belong to teams, and a staff member is a
+collaborator of every repo.
+
+Everything is derived from a seed, so an org can be regenerated exactly.
+"""
+
+import hashlib
+import string
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.fake_github import FakeOrg
+
+DEFAULT_ORG = "UChi-CI"
+DEFAULT_BROKEN_SHARE = 0.1
+DEFAULT_TEAM_SHARE = 0.1
+STAFF_LOGIN = "ta-bench"
+
+# Test set sizes of the real assignments
+NEWSGROUPS_TEST_SIZE = 7532
+SST2_TEST_SIZE = 1821
+TRANSCRIPTS_TEST_SIZE = 1000
+TRANSCRIPT_WORDS = 20
+CONTEXTUAL_TEST_SIZE = 2003
+ISOLATED_TEST_SIZE = 999
+EMBEDDING_DIM = 300
+
+BROKEN_KINDS = ("missing", "lfs", "empty", "truncated", "malformed", "columns")
+
+LFS_POINTER = (
+    "version https://git-lfs.github.com/spec/v1\n"
+    "oid sha256:4d7a214614ab2935c943f9e0ff69d22eadbb8f32b1258daaa5e2ca24d17e2393\n"
+    "size 132054\n"
+)
+
+OTHER_FILES = ("README.md", "requirements.txt", "src/model.py", "src/train.py")
+
+VOCABULARY = [
+    "".join(letters)
+    for letters in np.random.default_rng(0).choice(
+        list(string.ascii_lowercase), (2000, 5)
+    )
+]
+
+
+def _seed(*parts):
+    digest = hashlib.sha256("/".join(map(str, parts)).encode()).digest()
+    return int.from_bytes(digest[:8], "little")
+
+
+class SyntheticAssignment:
+    """Test data of one assignment and the results files of its student repos.
+
+    Subclasses set the `assignment` name, `utils_module` and `results_files`,
+    and implement `make_test_files` and `results_file`.
+
+    Inputs:
+        seed (int): Seed of the test data and predictions.
+        scale (float): Multiplier of the real test set sizes.
+    """
+
+    assignment = None
+    utils_module = None
+    results_files = ()
+
+    def __init__(self, seed=0, scale=1.0):
+        self.seed = seed
+        self.scale = scale
+        self.test_files = self.make_test_files()
+
+    def size(self, real_size):
+        return max(1, int(real_size * self.scale))
+
+    def make_test_files(self):
+        """Returns the test data files as `{file name: DataFrame}`."""
+        raise NotImplementedError
+
+    def results_file(self, rng, file_name):
+        """Returns the bytes of a correct results file with some prediction quality."""
+        raise NotImplementedError
+
+    def write_test_data(self, directory):
+        """Writes the test data files to `directory`."""
+        directory.mkdir(parents=True, exist_ok=True)
+        for file_name, data in self.test_files.items():
+            data.to_csv(directory / file_name, index=False)
+
+    def broken_file(self, rng, file_name, kind):
+        """Returns the bytes of a results file broken in one of `BROKEN_KINDS`."""
+        if kind == "lfs":
+            return LFS_POINTER.encode()
+        if kind == "empty":
+            return b""
+        content = self.results_file(rng, file_name)
+        if kind == "truncated":
+            return content[: len(content) // 3]
+        if kind == "malformed":
+            return rng.bytes(min(len(content), 4096))
+        if kind == "columns":
+            header, _, rest = content.partition(b"\n")
+            return b"prediction," + header.split(b",", 1)[-1] + b"\n" + rest
+        raise ValueError(f"Unknown broken kind: {kind}")
+
+
+class Assignment1(SyntheticAssignment):
+    assignment = "assignment-1"
+    utils_module = "assignment_1_utils"
+    results_files = tuple(
+        f"{method}_{dataset}_test_predictions.csv"
+        for method in ("mlp", "perceptron")
+        for dataset in ("newsgroups", "sst2")
+    )
+
+    def make_test_files(self):
+        rng = np.random.default_rng(self.seed)
+        newsgroups = self.size(NEWSGROUPS_TEST_SIZE)
+        sst2 = self.size(SST2_TEST_SIZE)
+        return {
+            "newsgroups_test_labels.csv": pd.DataFrame(
+                {"id": range(newsgroups), "newsgroup": rng.integers(0, 20, newsgroups)}
+            ),
+            "sst2_test_labels.csv": pd.DataFrame(
+                {"id": range(sst2), "label": rng.integers(0, 2, sst2)}
+            ),
+        }
+
+    def results_file(self, rng, file_name):
+        dataset = file_name.split("_")[1]
+        labels = self.test_files[f"{dataset}_test_labels.csv"].copy()
+        column = labels.columns[1]
+        wrong = rng.random(len(labels)) > rng.uniform(0.5, 0.95)
+        labels.loc[wrong, column] = rng.integers(
+            0, labels[column].max() + 1, wrong.sum()
+        )
+        return labels.to_csv(index=False).encode()
+
+
+class Assignment2(SyntheticAssignment):
+    """Speech transcripts scored by WER.
+
+    Inputs:
+        transcript_words (int): Average number of words of a transcript.
+    """
+
+    assignment = "assignment-2"
+    utils_module = "assignment_2_utils"
+    results_files = tuple(
+        f"{model}_test_wer_predictions.csv"
+        for model in ("character_n_gram", "subword_n_gram", "transformer")
+    )
+
+    def __init__(self, seed=0, scale=1.0, transcript_words=TRANSCRIPT_WORDS):
+        self.transcript_words = transcript_words
+        super().__init__(seed, scale)
+
+    def make_test_files(self):
+        rng = np.random.default_rng(self.seed)
+        lengths = rng.poisson(self.transcript_words, self.size(TRANSCRIPTS_TEST_SIZE))
+        sentences = [" ".join(rng.choice(VOCABULARY, max(1, n))) for n in lengths]
+        return {
+            "test_ground_truths.csv": pd.DataFrame(
+                {"id": range(len(sentences)), "sentences": sentences}
+            )
+        }
+
+    def results_file(self, rng, file_name):
+        truths = self.test_files["test_ground_truths.csv"]
+        error_rate = rng.uniform(0.05, 0.6)
+        predictions = []
+        for sentence in truths["sentences"]:
+            words = sentence.split()
+            wrong = rng.random(len(words)) < error_rate
+            replaced = rng.choice(VOCABULARY, len(words))
+            predictions.append(
+                " ".join(np.where(wrong, replaced, np.array(words, dtype=object)))
+            )
+        return pd.DataFrame(
+            {"id": truths["id"], "transcript": predictions}
+        ).to_csv(index=False).encode()
+
+
+class Assignment3(SyntheticAssignment):
+    """Word embeddings scored by the Spearman correlation of their similarities.
+
+    Inputs:
+        dim (int): Dimension of the embeddings.
+    """
+
+    assignment = "assignment-3"
+    utils_module = "assignment_3_utils"
+    results_files = tuple(
+        f"{model}_{task}_test_{words}_embeddings.txt"
+        for model in ("bert", "gpt2", "word2vec")
+        for task in ("cont", "isol")
+        for words in ("words1", "words2")
+    )
+
+    def __init__(self, seed=0, scale=1.0, dim=EMBEDDING_DIM):
+        self.dim = dim
+        super().__init__(seed, scale)
+
+    def make_test_files(self):
+        rng = np.random.default_rng(self.seed)
+        return {
+            f"{name}_test_y.csv": pd.DataFrame(
+                {
+                    "id": range(self.size(size)),
+                    "similarity": rng.uniform(0, 10, self.size(size)).round(2),
+                }
+            )
+            for name, size in (
+                ("contextual", CONTEXTUAL_TEST_SIZE),
+                ("isolated", ISOLATED_TEST_SIZE),
+            )
+        }
+
+    def results_file(self, rng, file_name):
+        task = file_name.split("_")[1]
+        name = "contextual" if task == "cont" else "isolated"
+        rows = len(self.test_files[f"{name}_test_y.csv"])
+        words = rng.choice(VOCABULARY, rows)
+        vectors = rng.standard_normal((rows, self.dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        row = " ".join(["%.6f"] * self.dim)
+        lines = (
+            word + " " + row % tuple(vector)
+            for word, vector in zip(words, vectors.tolist())
+        )
+        return ("\n".join(lines) + "\n").encode()
+
+
+ASSIGNMENTS = {
+    cls.assignment: cls for cls in (Assignment1, Assignment2, Assignment3)
+}
+
+
+def repo_plan(index, seed, broken_share, team_share):
+    """Returns the members and the broken kind (or None) of the repo `index`."""
+    rng = np.random.default_rng(_seed(seed, "plan", index))
+    members = [f"student-{index:05d}"]
+    if rng.random() < team_share:
+        members.append(f"student-{index:05d}-partner")
+    broken = None
+    if rng.random() < broken_share:
+        broken = BROKEN_KINDS[rng.integers(len(BROKEN_KINDS))]
+    return members, broken
+
+
+def generate_org(
+    assignment,
+    repos,
+    prefix,
+    directory,
+    org=DEFAULT_ORG,
+    seed=0,
+    broken_share=DEFAULT_BROKEN_SHARE,
+    team_share=DEFAULT_TEAM_SHARE,
+):
+    """Builds a fake org with `repos` student repos of a synthetic assignment.
+
+    Inputs:
+        assignment (SyntheticAssignment): The assignment the repos submit to.
+        repos (int): Number of student repos.
+        prefix (str): The assignment prefix of the repo names.
+        directory (Path): Where the file contents are stored.
+        org (str): The org login.
+        seed (int): Seed of the repo plans and file contents.
+        broken_share (float): Share of repos with a broken submission.
+        team_share (float): Share of repos with two members.
+
+    Returns:
+        FakeOrg: The org, ready to be served by `fake_github.serve`.
+    """
+    fake = FakeOrg(org, directory)
+    for index in range(repos):
+        members, broken = repo_plan(index, seed, broken_share, team_share)
+        name = f"{prefix}{members[0]}"
+        files = {path: f"# {name}\n".encode() * 20 for path in OTHER_FILES}
+        if broken != "missing":
+            for file_name in assignment.results_files:
+                rng = np.random.default_rng(_seed(seed, name, file_name))
+                files[f"results/{file_name}"] = (
+                    assignment.broken_file(rng, file_name, broken)
+                    if broken is not None
+                    else assignment.results_file(rng, file_name)
+                )
+        day = 1 + index % 28
+        fake.add_repo(
+            name,
+            members + [STAFF_LOGIN],
+            files,
+            pushed_at=f"2025-02-{day:02d}T{index % 24:02d}:00:00Z",
+        )
+    return fake
@@ -0,0 +1,267 @@
+import gzip
+import io
+import itertools
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+DEFAULT_MAX_MB = 2048
+
+
+class BlobCache:
+    """Persistent, content-addressed cache of git blobs keyed by blob SHA.
+
+    A blob SHA is the hash of its content, so a cached entry never goes stale.
+    Payloads are stored gzip-compressed, one file per blob. Reads refresh the
+    file's modification time, and once the cache grows past `max_bytes` the
+    least recently used blobs are evicted. A blob that alone is larger than
+    `max_bytes` compressed is never stored, since it would evict every other
+    blob and then itself; it is handed to the caller without being cached.
+
+    Concurrent requests for the same SHA within a run (e.g. untouched starter
+    files shared by many repos) are collapsed into a single download.
+
+    Inputs:
+        directory (Path): Where the cached blobs are stored.
+        max_bytes (int): Size cap for the compressed payloads on disk.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Per-SHA locks of the downloads in progress, with their waiter counts
+        self._fetch_locks = {}
+        # SHAs of this run found too large to cache
+        self._oversized = set()
+        self._tmp_ids = itertools.count()
+        self._size = sum(path.stat().st_size for path in self._entries())
+
+    def _entries(self):
+        return self.directory.glob("*/*.gz")
+
+    def _path(self, sha):
+        return self.directory / sha[:2] / f"{sha}.gz"
+
+    def __contains__(self, sha):
+        return self._path(sha).exists()
+
+    def open(self, sha):
+        """Opens a cached blob for reading, or returns None if the SHA is not cached.
+
+        Returns:
+            A binary file object decompressing the blob as it is read.
+        """
+        path = self._path(sha)
+        try:
+            f = gzip.open(path, "rb")
+        except FileNotFoundError:
+            return None
+        os.utime(path)
+        return f
+
+    def get(self, sha):
+        """Returns the cached blob content, or None if the SHA is not cached."""
+        f = self.open(sha)
+        if f is None:
+            return None
+        try:
+            with f:
+                return f.read()
+        except (OSError, EOFError):
+            return None
+
+    def put(self, sha, data):
+        """Stores a blob and evicts the least recently used blobs if over the size cap."""
+        self.put_stream(sha, [data])
+
+    def put_stream(self, sha, chunks):
+        """Stores a blob from an iterable of byte chunks without holding it in memory.
+
+        Nothing is stored if iterating `chunks` raises.
+        """
+        with self.writer(sha) as f:
+            for chunk in chunks:
+                f.write(chunk)
+
+    @contextmanager
+    def writer(self, sha):
+        """Opens a blob for writing; it is stored once the `with` block exits.
+
+        For producers that cannot hand `put_stream` an iterable, e.g. an asyncio
+        download. Nothing is stored if the block raises.
+
+        Yields:
+            A binary file object compressing what is written to it.
+        """
+        tmp_path = self._tmp_path(sha)
+        try:
+            with gzip.open(tmp_path, "wb") as f:
+                yield f
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        if not self._commit(sha, tmp_path):
+            tmp_path.unlink()
+
+    def _tmp_path(self, sha):
+        path = self._path(sha)
+        path.parent.mkdir(exist_ok=True)
+        return path.with_suffix(f".{os.getpid()}.{next(self._tmp_ids)}.tmp")
+
+    def _commit(self, sha, tmp_path):
+        """Moves a written blob into the cache, evicting others if over the size cap.
+
+        Returns:
+            bool: False, leaving `tmp_path` in place, if the blob alone is
+                larger than `max_bytes`.
+        """
+        size = tmp_path.stat().st_size
+        if size > self.max_bytes:
+            with self._lock:
+                self._oversized.add(sha)
+            return False
+
+        path = self._path(sha)
+        with self._lock:
+            old_size = path.stat().st_size if path.exists() else 0
+            os.replace(tmp_path, path)
+            self._size += size - old_size
+            if self._size > self.max_bytes:
+                self._evict()
+        return True
+
+    def _evict(self):
+        entries = []
+        for path in self._entries():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if self._size <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            self._size -= size
+
+    @contextmanager
+    def _fetching(self, sha):
+        """Holds the download lock of `sha`, dropping it once nobody waits on it."""
+        with self._lock:
+            lock, waiters = self._fetch_locks.get(sha, (threading.Lock(), 0))
+            self._fetch_locks[sha] = (lock, waiters + 1)
+        try:
+            with lock:
+                yield
+        finally:
+            with self._lock:
+                lock, waiters = self._fetch_locks[sha]
+                if waiters == 1:
+                    del self._fetch_locks[sha]
+                else:
+                    self._fetch_locks[sha] = (lock, waiters - 1)
+
+    def open_or_fetch(self, sha, fetch):
+        """Opens the blob for `sha`, streaming it into the cache first on a miss.
+
+        The download is written to disk chunk by chunk and read back through
+        gzip, so memory use does not grow with the blob size. A blob too large
+        to cache is read back from its temporary file, which is removed right
+        away; once known to be too large, it is streamed straight from `fetch`.
+
+        Inputs:
+            sha (str): The git blob SHA.
+            fetch: Callable returning an iterable of the raw blob's byte chunks.
+
+        Returns:
+            A binary file object with the blob content.
+        """
+        with self._fetching(sha):
+            f = self.open(sha)
+            if f is not None:
+                self.hits += 1
+                return f
+
+            self.misses += 1
+            if sha in self._oversized:
+                return io.BufferedReader(ChunkReader(fetch(sha)))
+
+            tmp_path = self._tmp_path(sha)
+            try:
+                with gzip.open(tmp_path, "wb") as f:
+                    for chunk in fetch(sha):
+                        f.write(chunk)
+            except BaseException:
+                tmp_path.unlink(missing_ok=True)
+                raise
+            if self._commit(sha, tmp_path):
+                return self.open(sha)
+            # The open file stays readable after the unlink
+            f = gzip.open(tmp_path, "rb")
+            tmp_path.unlink()
+            return f
+
+    def prefetch(self, sha, fetch):
+        """Streams the blob for `sha` into the cache unless it is already cached.
+
+        Blobs found too large to cache are not downloaded again.
+
+        Inputs:
+            sha (str): The git blob SHA.
+            fetch: Callable returning an iterable of the raw blob's byte chunks.
+        """
+        with self._fetching(sha):
+            if sha in self._oversized:
+                return
+            if sha in self:
+                self.hits += 1
+                return
+            self.misses += 1
+            self.put_stream(sha, fetch(sha))
+
+    def summary(self):
+        """Returns a one-line description of this run's cache usage."""
+        return (
+            f"Blob cache: {self.hits} hits, {self.misses} downloads, "
+            f"{self._size / 1024 / 1024:.1f} MB on disk, "
+            f"{len(self._oversized)} blobs too large to cache"
+        )
+
+
+class ChunkReader(io.RawIOBase):
+    """Read-only binary file object over an iterable of byte chunks.
+
+    Closing it closes the iterable, e.g. ending the download of `stream_blob`.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._pending = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._pending:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._pending = chunk
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+    def close(self):
+        if not self.closed:
+            close = getattr(self._chunks, "close", None)
+            if close is not None:
+                close()
+        super().close()
@@ -0,0 +1,172 @@
+import base64
+import hashlib
+import json
+import re
+import threading
+import time
+from pathlib import Path
+
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from http_cache import DROPPED_HEADERS
+
+RECORDED_LATENCY = "recorded"
+
+# Git blobs are content-addressed; which repo one was downloaded from depends
+# on the order the pipeline happened to run in.
+BLOB_PATTERN = re.compile(r"/git/blobs/([0-9a-f]{40})")
+
+
+def _body_hash(request):
+    body = request.body or b""
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    return hashlib.sha256(body).hexdigest()
+
+
+class Cassette:
+    """Transport layer recording GitHub traffic to a file, or replaying it from one.
+
+    In `record` mode every request is sent as usual and its response is
+    appended to the cassette as one JSON line. In `replay` mode nothing leaves
+    the machine: requests are answered from the cassette, matched on method,
+    URL and body (blobs on their SHA). A request recorded several times gets the recorded responses
+    in order, then the last one again. Conditional requests whose validator
+    matches the recorded `ETag` / `Last-Modified` get a `304`, as GitHub would.
+    Request headers, and with them the token, are never recorded.
+
+    Place it innermost, so the caches, the scheduler and hedging above it work
+    on replayed traffic exactly as on live traffic.
+
+    Inputs:
+        path (Path): The cassette file.
+        mode (str): `record` or `replay`.
+        latency: For replays, None to answer at once, `"recorded"` to wait as
+            long as the recorded request took, or a number of seconds to wait
+            per request.
+
+    Raises:
+        ValueError: If the mode is unknown.
+    """
+
+    def __init__(self, path, mode, latency=None):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency = latency
+        self.requests = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._played = {}
+        self._interactions = {}
+
+        if mode == "record":
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text("")
+            return
+        with open(self.path, "r") as f:
+            for line in f:
+                interaction = json.loads(line)
+                self._interactions.setdefault(
+                    self._key(*interaction["request"]), []
+                ).append(interaction)
+
+    def _key(self, method, url, body_hash):
+        blob = BLOB_PATTERN.search(url)
+        if blob is not None:
+            return f"{method} blob {blob.group(1)}"
+        return f"{method} {url} {body_hash}"
+
+    def send(self, request, send):
+        with self._lock:
+            self.requests += 1
+        if self.mode == "record":
+            return self._record(request, send)
+        return self._replay(request)
+
+    def _record(self, request, send):
+        started = time.monotonic()
+        response = send(request)
+        # Reading the body here keeps it available to streaming callers
+        content = response.content
+        interaction = {
+            "request": [request.method, request.url, _body_hash(request)],
+            "status": response.status_code,
+            "reason": response.reason,
+            "headers": {
+                name: value
+                for name, value in response.headers.items()
+                if name.lower() not in DROPPED_HEADERS
+            },
+            "body": base64.b64encode(content).decode("ascii"),
+            "elapsed": time.monotonic() - started,
+        }
+        line = json.dumps(interaction) + "\n"
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line)
+        return response
+
+    def _replay(self, request):
+        key = self._key(request.method, request.url, _body_hash(request))
+        with self._lock:
+            interactions = self._interactions.get(key)
+            if not interactions:
+                self.misses += 1
+                raise LookupError(
+                    f"{request.method} {request.url} is not in the cassette"
+                )
+            index = self._played.get(key, 0)
+            self._played[key] = index + 1
+            interaction = interactions[min(index, len(interactions) - 1)]
+
+        if self.latency == RECORDED_LATENCY:
+            time.sleep(interaction["elapsed"])
+        elif self.latency:
+            time.sleep(self.latency)
+
+        headers = CaseInsensitiveDict(interaction["headers"])
+        response = Response()
+        response.status_code = interaction["status"]
+        response.reason = interaction["reason"]
+        response._content = base64.b64decode(interaction["body"])
+        if response.status_code == 200 and _not_modified(request, headers):
+            response.status_code = 304
+            response.reason = "Not Modified"
+            response._content = b""
+        elif response.status_code == 304 and not _is_conditional(request):
+            raise LookupError(
+                f"The cassette only holds a 304 for {request.url}; record it "
+                "with an empty HTTP cache"
+            )
+        response._content_consumed = True
+        response.headers = headers
+        response.encoding = get_encoding_from_headers(headers)
+        response.url = request.url
+        response.request = request
+        response.connection = None
+        return response
+
+    def summary(self):
+        """Returns a one-line description of this run's recording or replay."""
+        if self.mode == "record":
+            return f"Cassette: recorded {self.requests} requests to {self.path}"
+        return (
+            f"Cassette: replayed {self.requests - self.misses} requests from "
+            f"{self.path}, {self.misses} missing"
+        )
+
+
+def _is_conditional(request):
+    return "If-None-Match" in request.headers or "If-Modified-Since" in request.headers
+
+
+def _not_modified(request, headers):
+    etag = request.headers.get("If-None-Match")
+    if etag is not None and etag == headers.get("ETag"):
+        return True
+    modified = request.headers.get("If-Modified-Since")
+    return modified is not None and modified == headers.get("Last-Modified")
@@ -0,0 +1,217 @@
+import base64
+import os
+import shutil
+import signal
+import subprocess
+from contextlib import contextmanager
+from pathlib import Path
+
+from github_utils import RESULTS_DIR, results_tree_files
+
+DEFAULT_GIT_URL = "https://github.com"
+
+
+class GitMirror:
+    """Local bare mirrors of the assignment repos, read straight from the object store.
+
+    Mirrors are shallow, blobless partial clones: a fetch transfers the head
+    commit and its trees, and only the blobs under `results/` are fetched
+    afterwards, in one batch per repo. Later syncs are incremental fetches of
+    the default branch.
+
+    The token is passed to git through the environment for every call and is
+    never written to a mirror's config.
+
+    Inputs:
+        directory (Path): Where the mirrors are kept, one `<org>/<name>.git` per repo.
+        remote_url (str): Root of the git remotes, e.g. `https://github.com` or a
+            `file://` directory holding `<org>/<name>.git` repos.
+        token (str): Optional GitHub token for HTTPS remotes.
+    """
+
+    def __init__(self, directory, remote_url=DEFAULT_GIT_URL, token=None):
+        self.directory = Path(directory)
+        self.remote_url = remote_url.rstrip("/")
+        self.env = {**os.environ, "GIT_TERMINAL_PROMPT": "0"}
+        if token:
+            credentials = base64.b64encode(f"x-access-token:{token}".encode()).decode()
+            self.env.update(
+                {
+                    "GIT_CONFIG_COUNT": "1",
+                    "GIT_CONFIG_KEY_0": "http.extraHeader",
+                    "GIT_CONFIG_VALUE_0": f"Authorization: Basic {credentials}",
+                }
+            )
+
+    def path(self, org, name):
+        return self.directory / org / f"{name}.git"
+
+    def _git(self, path, *args, input=None):
+        return subprocess.run(
+            ["git", "-C", str(path), *args],
+            input=input,
+            capture_output=True,
+            check=True,
+            env=self.env,
+        ).stdout
+
+    def sync(self, org, name):
+        """Clones the mirror of a repo, or fetches its default branch if it exists.
+
+        Returns:
+            str: The head commit SHA of the default branch.
+        """
+        path = self.path(org, name)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            self._git(
+                path.parent,
+                "clone",
+                "--quiet",
+                "--bare",
+                "--depth=1",
+                "--filter=blob:none",
+                f"{self.remote_url}/{org}/{name}.git",
+                str(tmp_path),
+            )
+            tmp_path.replace(path)
+        else:
+            branch = self._git(path, "symbolic-ref", "HEAD").decode().strip()
+            self._git(
+                path,
+                "fetch",
+                "--quiet",
+                "--depth=1",
+                "--filter=blob:none",
+                "--no-tags",
+                "origin",
+                f"+{branch}:{branch}",
+            )
+        return self._git(path, "rev-parse", "HEAD").decode().strip()
+
+    def results_files(self, org, name, results_files):
+        """Syncs a mirror and fetches the blobs of its results files.
+
+        Inputs:
+            org (str): The GitHub organization login.
+            name (str): The repository name.
+            results_files (list): Suffixes of the results files to keep.
+
+        Returns:
+            tuple: The head commit SHA (None if the repo could not be synced or
+                its results blobs not fetched) and a dict mapping file names to
+                `ResultFile` entries, or None if the repo has no results folder.
+        """
+        path = self.path(org, name)
+        try:
+            head = self.sync(org, name)
+            listing = self._git(path, "ls-tree", "HEAD", RESULTS_DIR + "/")
+        except subprocess.CalledProcessError as e:
+            print(f"Issue: could not mirror {name}: {e.stderr.decode().strip()}")
+            return None, None
+
+        entries = []
+        for line in listing.decode().splitlines():
+            meta, entry_path = line.split("\t", 1)
+            _, entry_type, sha = meta.split()
+            entries.append((entry_path, entry_type, sha, None))
+        files = results_tree_files(entries, results_files)
+        if not files:
+            return head, files
+
+        try:
+            sizes = self._fetch_blobs(path, files)
+        except subprocess.CalledProcessError as e:
+            print(
+                f"Issue: could not fetch the results files of {name}: "
+                f"{e.stderr.decode().strip()}"
+            )
+            return None, None
+        return head, {
+            file_name: entry._replace(size=sizes.get(entry.sha))
+            for file_name, entry in files.items()
+        }
+
+    def _fetch_blobs(self, path, files):
+        """Fetches the missing blobs of `files` into a mirror and returns all sizes.
+
+        Returns:
+            dict: Maps blob SHAs to their sizes in bytes. Blobs the remote did
+                not send are left out.
+
+        Raises:
+            subprocess.CalledProcessError: If a git command fails.
+        """
+        # Reading the size of a missing blob would fetch it on its own, so all
+        # missing results blobs are fetched in one round trip first
+        present = set(
+            self._git(
+                path,
+                "cat-file",
+                "--batch-check=%(objectname)",
+                "--batch-all-objects",
+            )
+            .decode()
+            .split()
+        )
+        missing = sorted({e.sha for e in files.values()} - present)
+        if missing:
+            self._git(
+                path,
+                "-c",
+                "fetch.negotiationAlgorithm=noop",
+                "fetch",
+                "--quiet",
+                "--no-tags",
+                "--no-write-fetch-head",
+                "--filter=blob:none",
+                "origin",
+                *missing,
+            )
+
+        shas = "".join(f"{entry.sha}\n" for entry in files.values())
+        sizes = {}
+        for line in (
+            self._git(
+                path,
+                "cat-file",
+                "--batch-check=%(objectname) %(objectsize)",
+                input=shas.encode(),
+            )
+            .decode()
+            .splitlines()
+        ):
+            sha, size = line.split()
+            # A blob still missing is reported as `<sha> missing`
+            if size.isdigit():
+                sizes[sha] = int(size)
+        return sizes
+
+    @contextmanager
+    def open_blob(self, org, name, sha):
+        """Streams a blob out of a mirror's object store.
+
+        Yields:
+            A binary file object with the blob content.
+
+        Raises:
+            RuntimeError: If the blob could not be read.
+        """
+        process = subprocess.Popen(
+            ["git", "-C", str(self.path(org, name)), "cat-file", "blob", sha],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            env=self.env,
+        )
+        try:
+            yield process.stdout
+        finally:
+            process.stdout.close()
+            # Killed by SIGPIPE if the reader stopped early, e.g. on a parse error
+            if process.wait() not in (0, -signal.SIGPIPE):
+                # Replaces any error of the reader, which only saw a partial blob
+                raise RuntimeError(
+                    f"Could not read blob {sha} of {name} from the mirror"
+                )
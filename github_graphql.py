@@ -0,0 +1,220 @@
+import requests
+
+from github_transport import mount
+from github_utils import SEARCH_RESULT_LIMIT, ResultFile, search_query
+
+DEFAULT_GRAPHQL_URL = "https://api.github.com/graphql"
+DEFAULT_PAGE_SIZE = 50
+
+REPO_FIELDS = """
+fragment RepoFields on Repository {
+  name
+  pushedAt
+  defaultBranchRef { target { oid } }
+  collaborators(first: 100) {
+    pageInfo { hasNextPage endCursor }
+    nodes { login }
+  }
+  results: object(expression: "HEAD:results") {
+    ... on Tree {
+      entries {
+        name
+        oid
+        type
+        object { ... on Blob { byteSize } }
+      }
+    }
+  }
+}
+"""
+
+SEARCH_QUERY = (
+    """
+query($query: String!, $pageSize: Int!, $cursor: String) {
+  search(query: $query, type: REPOSITORY, first: $pageSize, after: $cursor) {
+    repositoryCount
+    pageInfo { hasNextPage endCursor }
+    nodes { ...RepoFields }
+  }
+}
+"""
+    + REPO_FIELDS
+)
+
+REPOS_QUERY = (
+    """
+query($org: String!, $pageSize: Int!, $cursor: String) {
+  organization(login: $org) {
+    repositories(first: $pageSize, after: $cursor, orderBy: {field: NAME, direction: ASC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes { ...RepoFields }
+    }
+  }
+}
+"""
+    + REPO_FIELDS
+)
+
+COLLABORATORS_QUERY = """
+query($org: String!, $name: String!, $cursor: String) {
+  repository(owner: $org, name: $name) {
+    collaborators(first: 100, after: $cursor) {
+      pageInfo { hasNextPage endCursor }
+      nodes { login }
+    }
+  }
+}
+"""
+
+
+class GraphQLClient:
+    """Minimal GitHub GraphQL client on top of a `requests` session.
+
+    Inputs:
+        token: The GitHub token used for the `Authorization` header.
+        url: The GraphQL endpoint. Point this at a local stub server to replay
+            recorded responses.
+        transport: Optional `github_transport.Transport` the requests go through.
+    """
+
+    def __init__(self, token, url=DEFAULT_GRAPHQL_URL, timeout=30, transport=None):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+        if transport is not None:
+            mount(self.session, transport)
+        self.session.headers["Authorization"] = f"bearer {token}"
+
+    def execute(self, query, variables):
+        """Runs a query and returns its `data` payload.
+
+        Raises:
+            RuntimeError: If the response contains GraphQL errors.
+        """
+        response = self.session.post(
+            self.url,
+            json={"query": query, "variables": variables},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        payload = response.json()
+        if payload.get("errors"):
+            messages = "; ".join(e.get("message", str(e)) for e in payload["errors"])
+            raise RuntimeError(f"GraphQL query failed: {messages}")
+        return payload["data"]
+
+
+def _paginate_collaborators(client, org, name, connection):
+    logins = [node["login"] for node in connection["nodes"]]
+    page_info = connection["pageInfo"]
+    while page_info["hasNextPage"]:
+        data = client.execute(
+            COLLABORATORS_QUERY,
+            {"org": org, "name": name, "cursor": page_info["endCursor"]},
+        )
+        connection = data["repository"]["collaborators"]
+        logins.extend(node["login"] for node in connection["nodes"])
+        page_info = connection["pageInfo"]
+    return logins
+
+
+def _paginate(client, query, variables, get_connection):
+    """Yields every page of a connection, following `endCursor` until the last page."""
+    cursor = None
+    while True:
+        connection = get_connection(
+            client.execute(query, {**variables, "cursor": cursor})
+        )
+        yield connection
+        if not connection["pageInfo"]["hasNextPage"]:
+            return
+        cursor = connection["pageInfo"]["endCursor"]
+
+
+def _list_repo_nodes(client, org, assignment_prefix, page_size):
+    """Lists repo nodes with a name-qualified search, falling back to a full org scan.
+
+    The search result is only trusted if it returned every hit it reported, the
+    hit count is below the search API cap and at least one name matches the prefix.
+    """
+    nodes = []
+    total = 0
+    for connection in _paginate(
+        client,
+        SEARCH_QUERY,
+        {"query": search_query(org, assignment_prefix), "pageSize": page_size},
+        lambda data: data["search"],
+    ):
+        total = connection["repositoryCount"]
+        nodes.extend(node for node in connection["nodes"] if node)
+
+    matched = [node for node in nodes if node["name"].startswith(assignment_prefix)]
+    if matched and len(nodes) == total and total < SEARCH_RESULT_LIMIT:
+        return matched
+
+    print(
+        f"Search returned {len(nodes)} of {total} repos; falling back to a full org scan."
+    )
+    return [
+        node
+        for connection in _paginate(
+            client,
+            REPOS_QUERY,
+            {"org": org, "pageSize": page_size},
+            lambda data: data["organization"]["repositories"],
+        )
+        for node in connection["nodes"]
+        if node["name"].startswith(assignment_prefix)
+    ]
+
+
+def load_repos_graphql(
+    client, org, assignment_prefix, staff, results_files, page_size=DEFAULT_PAGE_SIZE
+):
+    """Lists assignment repos, their members and results files with paginated GraphQL queries.
+
+    Inputs:
+        client (GraphQLClient): The client used to run the queries.
+        org (str): The GitHub organization login.
+        assignment_prefix (str): Only repos whose name starts with this are kept.
+        staff (set): Logins to exclude from member lists and repo names.
+        results_files (list): Suffixes of the results files to keep.
+        page_size (int): Number of repositories requested per page.
+
+    Returns:
+        list: A list of `{"name", "member", "pushed_at", "head", "files"}` dicts,
+            where `files` maps file names to `ResultFile` entries.
+    """
+    repos = []
+    for node in _list_repo_nodes(client, org, assignment_prefix, page_size):
+        name = node["name"]
+        if any(login in name for login in staff):
+            continue
+
+        logins = _paginate_collaborators(client, org, name, node["collaborators"])
+        if node["results"] is None:
+            print(f"Issue: results folder not found for {name}")
+            entries = []
+        else:
+            entries = node["results"]["entries"]
+
+        repos.append(
+            {
+                "name": name,
+                "member": sorted(login for login in logins if login not in staff),
+                "pushed_at": node["pushedAt"] or "",
+                "head": (node["defaultBranchRef"] or {}).get("target", {}).get("oid"),
+                "files": {
+                    entry["name"]: ResultFile(
+                        entry["name"],
+                        entry["oid"],
+                        (entry.get("object") or {}).get("byteSize"),
+                    )
+                    for entry in entries
+                    if entry["type"] == "blob"
+                    and any(entry["name"].endswith(s) for s in results_files)
+                },
+            }
+        )
+
+    return repos
@@ -0,0 +1,97 @@
+from github import Github
+from github.Requester import (
+    HTTPRequestsConnectionClass,
+    HTTPSRequestsConnectionClass,
+    Requester,
+)
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry
+
+# Below a `RateLimitScheduler`: retries network errors and 5xx responses with
+# backoff, like PyGithub's default policy, but leaves 403 / 429 to the scheduler.
+# GraphQL queries are POSTs, and safe to repeat.
+SERVER_ERROR_RETRY = Retry(
+    total=5,
+    status_forcelist=range(500, 600),
+    allowed_methods=Retry.DEFAULT_ALLOWED_METHODS | {"POST"},
+    backoff_factor=0.5,
+    raise_on_status=False,
+)
+
+
+class Transport(HTTPAdapter):
+    """`requests` adapter that passes every GitHub request through a stack of layers.
+
+    A layer is an object with a `send(request, send)` method, where `send` hands
+    the request to the next layer (or the network) and returns its response.
+    Layers are applied in order, so the first layer sees the request first.
+
+    One transport is shared by every session of a run, so its urllib3 pool
+    keeps connections alive across requests.
+
+    Inputs:
+        layers (list): The layers, outermost first.
+        pool_size (int): Maximum number of pooled connections per host.
+        max_retries: urllib3 retry policy for the network calls. Defaults to
+            PyGithub's own policy.
+    """
+
+    def __init__(self, layers=(), pool_size=10, max_retries=Github.default_retry):
+        super().__init__(
+            pool_connections=pool_size,
+            pool_maxsize=pool_size,
+            max_retries=max_retries,
+        )
+        self.layers = list(layers)
+
+    def send(self, request, **kwargs):
+        def call(index, request):
+            if index == len(self.layers):
+                return super(Transport, self).send(request, **kwargs)
+            return self.layers[index].send(
+                request, lambda request: call(index + 1, request)
+            )
+
+        return call(0, request)
+
+    def close(self):
+        # Sessions close their adapters when they are done; the shared
+        # transport must outlive them.
+        pass
+
+    def summary(self):
+        """Returns the summaries of all layers that report one."""
+        return [layer.summary() for layer in self.layers if hasattr(layer, "summary")]
+
+
+def mount(session, transport):
+    """Routes all requests of a `requests` session through `transport`."""
+    session.mount("https://", transport)
+    session.mount("http://", transport)
+    return session
+
+
+def install_transport(transport):
+    """Routes every PyGithub request through `transport`.
+
+    PyGithub creates a fresh connection object per request once custom
+    connection classes are injected, so concurrent threads never share one.
+    """
+
+    class HTTPSConnection(HTTPSRequestsConnectionClass):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            mount(self.session, transport)
+
+        def close(self):
+            pass
+
+    class HTTPConnection(HTTPRequestsConnectionClass):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            mount(self.session, transport)
+
+        def close(self):
+            pass
+
+    Requester.injectConnectionClasses(HTTPConnection, HTTPSConnection)
@@ -0,0 +1,286 @@
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from github import GithubException
+
+from github_transport import mount
+
+DEFAULT_DISCOVERY_WORKERS = 8
+
+# GitHub search never returns more than this many results for a single query.
+SEARCH_RESULT_LIMIT = 1000
+
+# Folder of the student repos holding the results files.
+RESULTS_DIR = "results"
+
+# Results files smaller than this are most likely git-lfs pointer files (~130 bytes).
+DEFAULT_MIN_FILE_BYTES = 150
+
+# Media type returning a blob's raw bytes instead of base64 JSON.
+RAW_MEDIA_TYPE = "application/vnd.github.raw"
+DOWNLOAD_CHUNK_BYTES = 64 * 1024
+
+# A results file in a student repo: its name, git blob SHA and size in bytes (if known).
+ResultFile = namedtuple("ResultFile", ["name", "sha", "size"])
+
+
+def format_timestamp(timestamp):
+    """Formats a PyGithub datetime the way the GitHub API does, e.g. `2025-01-31T23:59:59Z`."""
+    return timestamp.strftime("%Y-%m-%dT%H:%M:%SZ") if timestamp else ""
+
+
+def search_query(org, assignment_prefix):
+    """Returns the repository search query restricting results to `org` and the prefix."""
+    return f"{assignment_prefix} org:{org} in:name fork:true"
+
+
+def list_assignment_repos(git, org, assignment_prefix):
+    """Lists the org's repos whose name starts with `assignment_prefix`.
+
+    Uses a name-qualified repository search so only matching repos are paged
+    through. Falls back to scanning every repo in the org if the search result
+    looks wrong: no matches, a hit count at the search cap, or fewer results
+    than the reported hit count.
+
+    Inputs:
+        git: The authenticated PyGithub client.
+        org (str): The GitHub organization login.
+        assignment_prefix (str): The GitHub Classroom prefix of the assignment repos.
+
+    Returns:
+        list: PyGithub repository objects, newest first like `Organization.get_repos`.
+    """
+    results = git.search_repositories(search_query(org, assignment_prefix))
+    total = results.totalCount
+    found = list(results)
+    repos = [
+        repo
+        for repo in found
+        if repo.name.startswith(assignment_prefix)
+        and repo.owner.login.lower() == org.lower()
+    ]
+
+    if repos and len(found) == total and total < SEARCH_RESULT_LIMIT:
+        return sorted(repos, key=lambda repo: repo.created_at, reverse=True)
+
+    print(
+        f"Search returned {len(found)} of {total} repos; falling back to a full org scan."
+    )
+    return [
+        repo
+        for repo in git.get_organization(org).get_repos()
+        if repo.name.startswith(assignment_prefix)
+    ]
+
+
+def list_repos_by_prefix(git, org, prefixes):
+    """Lists the repos of several assignments with a single org listing.
+
+    The listing uses the longest prefix shared by all assignments, so one
+    search (or one full org scan) serves all of them. Without a shared prefix
+    the org is scanned once.
+
+    Inputs:
+        git: The authenticated PyGithub client.
+        org (str): The GitHub organization login.
+        prefixes (list): The assignment prefixes.
+
+    Returns:
+        dict: Maps each prefix to its PyGithub repository objects, in listing order.
+    """
+    common_prefix = os.path.commonprefix(list(prefixes))
+    if common_prefix:
+        repos = list_assignment_repos(git, org, common_prefix)
+    else:
+        repos = list(git.get_organization(org).get_repos())
+    return {
+        prefix: [repo for repo in repos if repo.name.startswith(prefix)]
+        for prefix in prefixes
+    }
+
+
+def get_members(repo, staff):
+    """Returns the sorted, non-staff collaborator logins of a repo.
+
+    Inputs:
+        repo: The PyGithub repository object.
+        staff (set): Logins to exclude from the member list.
+
+    Returns:
+        list: Sorted collaborator logins.
+    """
+    return sorted([c.login for c in repo.get_collaborators() if c.login not in staff])
+
+
+def discover_repos(
+    repos, staff, max_workers=DEFAULT_DISCOVERY_WORKERS, roster=None
+):
+    """Builds the repo records used by the leaderboard, fetching collaborators in parallel.
+
+    Collaborator lists are fetched by a bounded pool of worker threads. Records
+    are returned in the same order as `repos`, and repos whose name contains a
+    staff login are dropped.
+
+    Inputs:
+        repos: Iterable of PyGithub repository objects (already filtered by prefix).
+        staff (set): Logins to exclude from member lists and repo names.
+        max_workers (int): Maximum number of concurrent collaborator requests.
+        roster (RosterCache): Optional cache of member lists, see `repo_record`.
+
+    Returns:
+        list: A list of `{"git", "name", "member", "pushed_at"}` dicts.
+    """
+    repos = [repo for repo in repos if not is_staff_repo(repo.name, staff)]
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        return list(
+            executor.map(lambda repo: repo_record(repo, staff, roster), repos)
+        )
+
+
+def is_staff_repo(name, staff):
+    """Returns True if a repo name contains a staff login."""
+    return any(login in name for login in staff)
+
+
+def repo_record(repo, staff, roster=None):
+    """Builds the `{"git", "name", "member", "pushed_at"}` record of a PyGithub repository.
+
+    Collaborators are only fetched if `roster` (a `roster_cache.RosterCache`)
+    has no valid member list for the repo; fetched lists are added to it.
+    """
+    member = roster.get(repo.name) if roster is not None else None
+    if member is None:
+        member = get_members(repo, staff)
+        if roster is not None:
+            roster.put(repo.name, member)
+    return {
+        "git": repo,
+        "name": repo.name,
+        "member": member,
+        "pushed_at": format_timestamp(repo.pushed_at),
+    }
+
+
+def results_tree_files(tree_entries, results_files):
+    """Picks the results files out of a recursive git tree listing.
+
+    Inputs:
+        tree_entries: Iterable of `(path, type, sha, size)` tuples.
+        results_files (list): Suffixes of the results files to keep.
+
+    Returns:
+        dict: Maps file names to `ResultFile` entries for the blobs directly
+            inside the `results` folder, or None if there is no such folder.
+    """
+    prefix = RESULTS_DIR + "/"
+    found_folder = False
+    files = {}
+    for path, entry_type, sha, size in tree_entries:
+        if not path.startswith(prefix) or "/" in path[len(prefix) :]:
+            continue
+        found_folder = True
+        name = path[len(prefix) :]
+        if entry_type == "blob" and any(name.endswith(s) for s in results_files):
+            files[name] = ResultFile(name, sha, size)
+    return files if found_folder else None
+
+
+def find_results_files(repo, results_files):
+    """Lists the results files of a repo record with one recursive tree listing.
+
+    The listing of the default branch head includes blob sizes, so oversized or
+    pointer files can be rejected before downloading (see `is_downloadable`).
+    Falls back to listing the `results` folder if the tree is truncated.
+
+    Inputs:
+        repo (dict): A repo record with a PyGithub repository under `"git"`.
+        results_files (list): Suffixes of the results files to keep.
+
+    Returns:
+        dict: Maps file names to `ResultFile` entries. Empty if the folder is
+            missing, None if the repo could not be listed (e.g. a server error),
+            so the caller can retry it later.
+    """
+    git_repo = repo["git"]
+    try:
+        tree = git_repo.get_git_tree(git_repo.default_branch, recursive=True)
+        if tree.truncated:
+            contents = git_repo.get_contents(RESULTS_DIR)
+            entries = [
+                (c.path, "blob" if c.type == "file" else c.type, c.sha, c.size)
+                for c in contents
+            ]
+        else:
+            entries = [(e.path, e.type, e.sha, e.size) for e in tree.tree]
+        files = results_tree_files(entries, results_files)
+    except GithubException as e:
+        # 404: no such branch or folder, 409: an empty repository
+        if e.status not in (404, 409):
+            print(f"Issue: could not list the files of {repo['name']}: {e}")
+            return None
+        files = None
+    except Exception as e:
+        print(f"Issue: could not list the files of {repo['name']}: {e}")
+        return None
+
+    if files is None:
+        print(f"Issue: results folder not found for {repo['name']}")
+        return {}
+    return files
+
+
+def is_downloadable(entry, min_bytes=DEFAULT_MIN_FILE_BYTES, max_bytes=None):
+    """Returns False for results files whose size rules them out before downloading.
+
+    Files below `min_bytes` are most likely git-lfs pointers, files above
+    `max_bytes` would be rejected by the scorer anyway. Files of unknown size
+    are always downloaded.
+    """
+    if entry.size is None:
+        return True
+    if entry.size < min_bytes:
+        return False
+    return max_bytes is None or entry.size <= max_bytes
+
+
+def raw_session(token, transport=None):
+    """Returns a `requests` session authenticated for raw content downloads.
+
+    Inputs:
+        token (str): The GitHub token.
+        transport: Optional `github_transport.Transport` the requests go through.
+    """
+    session = requests.Session()
+    if transport is not None:
+        mount(session, transport)
+    session.headers["Authorization"] = f"token {token}"
+    return session
+
+
+def stream_blob(session, api_url, full_name, sha, chunk_size=DOWNLOAD_CHUNK_BYTES):
+    """Downloads a git blob as its raw media type, yielding it in chunks.
+
+    Unlike the JSON blob endpoint, the content is neither base64-encoded nor
+    held in memory as a whole.
+
+    Inputs:
+        session: A session from `raw_session`.
+        api_url (str): The REST API root.
+        full_name (str): The repository's `owner/name`.
+        sha (str): The git blob SHA.
+        chunk_size (int): Bytes per yielded chunk.
+
+    Raises:
+        requests.HTTPError: If the download fails.
+    """
+    with session.get(
+        f"{api_url.rstrip('/')}/repos/{full_name}/git/blobs/{sha}",
+        headers={"Accept": RAW_MEDIA_TYPE},
+        stream=True,
+        timeout=60,
+    ) as response:
+        response.raise_for_status()
+        yield from response.iter_content(chunk_size)
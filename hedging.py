@@ -0,0 +1,225 @@
+import math
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from urllib.parse import urlsplit
+
+from requests.exceptions import Timeout
+
+# PyGithub's default timeout
+DEFAULT_DEADLINE_SECONDS = 15
+DEFAULT_BODY_DEADLINE_SECONDS = 60
+DEFAULT_HEDGE_PERCENTILE = 95
+# Latency samples of an endpoint needed before its requests are hedged
+DEFAULT_MIN_SAMPLES = 20
+# Upper bound for the share of requests that get a duplicate
+DEFAULT_MAX_HEDGE_RATIO = 0.1
+
+# Path segments replaced by a placeholder when grouping requests by endpoint
+_ENDPOINT_PATTERNS = [
+    (re.compile(r"^/repos/[^/]+/[^/]+"), "/repos/:owner/:repo"),
+    (re.compile(r"^/orgs/[^/]+"), "/orgs/:org"),
+    (re.compile(r"^/users/[^/]+"), "/users/:user"),
+    (re.compile(r"/git/trees/[^/]+"), "/git/trees/:ref"),
+    (re.compile(r"/[0-9a-f]{40}(?=/|$)"), "/:sha"),
+    (re.compile(r"/\d+(?=/|$)"), "/:id"),
+]
+
+
+def endpoint(method, url):
+    """Returns the endpoint of a request, e.g. `GET /repos/:owner/:repo/commits`."""
+    path = urlsplit(url).path
+    for pattern, placeholder in _ENDPOINT_PATTERNS:
+        path = pattern.sub(placeholder, path, count=1)
+    return f"{method} {path}"
+
+
+def percentile(samples, q):
+    """Returns the `q`-th percentile (nearest rank) of a sorted list."""
+    index = math.ceil(q / 100 * len(samples)) - 1
+    return samples[max(0, min(len(samples) - 1, index))]
+
+
+class HedgedRequests:
+    """Transport layer bounding GET latency with deadlines and hedged duplicates.
+
+    - Records the latency of every request per endpoint, reported as
+      p50/p95/p99 at the end of a run.
+    - Reading the body of a GET response (including `stream=True` downloads)
+      fails with a `requests.Timeout` once it takes longer than
+      `body_deadline` seconds, instead of stalling its caller for as long as
+      the connection trickles. Other methods are never abandoned.
+    - With `hedge` enabled, each GET runs in a worker thread. It fails with a
+      `requests.Timeout` if no response headers arrived within `deadline`
+      seconds. If it is still running after the endpoint's `hedge_percentile`
+      latency, it is sent a second time, and whichever response arrives first
+      is used; the other one is closed. At most `max_ratio` of all requests
+      are hedged. Without hedging, requests are sent on the caller's thread
+      and their own timeout bounds the wait for the headers.
+
+    Place it below the rate limit scheduler, so it times network calls only.
+
+    Inputs:
+        deadline (float): Seconds a hedged GET may wait for its response
+            headers. None disables it.
+        body_deadline (float): Seconds reading a GET response body may take.
+            None disables it.
+        hedge (bool): Whether slow GETs are duplicated.
+        hedge_percentile (float): Latency percentile after which a GET is hedged.
+        min_samples (int): Samples an endpoint needs before it is hedged.
+        max_ratio (float): Maximum share of hedged requests.
+    """
+
+    def __init__(
+        self,
+        deadline=DEFAULT_DEADLINE_SECONDS,
+        body_deadline=DEFAULT_BODY_DEADLINE_SECONDS,
+        hedge=False,
+        hedge_percentile=DEFAULT_HEDGE_PERCENTILE,
+        min_samples=DEFAULT_MIN_SAMPLES,
+        max_ratio=DEFAULT_MAX_HEDGE_RATIO,
+    ):
+        self.deadline = deadline
+        self.body_deadline = body_deadline
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.min_samples = min_samples
+        self.max_ratio = max_ratio
+        self.latencies = {}
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.deadline_misses = 0
+        self._lock = threading.Lock()
+
+    def _record(self, name, seconds):
+        with self._lock:
+            self.latencies.setdefault(name, []).append(seconds)
+
+    def _hedge_delay(self, name):
+        with self._lock:
+            samples = self.latencies.get(name, [])
+            if len(samples) < self.min_samples:
+                return None
+            if self.hedges >= self.max_ratio * self.requests:
+                return None
+            return percentile(sorted(samples), self.hedge_percentile)
+
+    def _start(self, send, request, name):
+        future = Future()
+
+        def attempt():
+            started = time.monotonic()
+            try:
+                response = send(request)
+            except BaseException as e:
+                future.set_exception(e)
+                return
+            self._record(name, time.monotonic() - started)
+            future.set_result(response)
+
+        threading.Thread(target=attempt, daemon=True).start()
+        return future
+
+    def send(self, request, send):
+        name = endpoint(request.method, request.url)
+        with self._lock:
+            self.requests += 1
+
+        if request.method != "GET" or not self.hedge:
+            started = time.monotonic()
+            response = send(request)
+            self._record(name, time.monotonic() - started)
+            if request.method == "GET":
+                self._bound_body(response, name)
+            return response
+
+        started = time.monotonic()
+
+        def time_left():
+            if self.deadline is None:
+                return None
+            return max(0.0, self.deadline - (time.monotonic() - started))
+
+        attempts = [self._start(send, request, name)]
+        delay = self._hedge_delay(name) if self.hedge else None
+        if delay is not None and self.deadline is not None and delay >= self.deadline:
+            delay = None
+
+        done, _ = wait(attempts, timeout=delay if delay is not None else time_left())
+        if not done and delay is not None:
+            with self._lock:
+                self.hedges += 1
+            attempts.append(self._start(send, request.copy(), name))
+            done, _ = wait(attempts, timeout=time_left(), return_when=FIRST_COMPLETED)
+        if done and all(attempt.exception() is not None for attempt in done):
+            # The first attempt to finish failed; give the other one its chance
+            done, _ = wait(attempts, timeout=time_left())
+
+        if not done:
+            with self._lock:
+                self.deadline_misses += 1
+            for attempt in attempts:
+                attempt.add_done_callback(_close_response)
+            raise Timeout(f"{name} did not answer within {self.deadline}s")
+
+        finished = [attempt for attempt in attempts if attempt in done]
+        winner = next(
+            (attempt for attempt in finished if attempt.exception() is None),
+            finished[0],
+        )
+        for attempt in attempts:
+            if attempt is not winner:
+                attempt.add_done_callback(_close_response)
+        if winner is not attempts[0]:
+            with self._lock:
+                self.hedge_wins += 1
+        response = winner.result()
+        self._bound_body(response, name)
+        return response
+
+    def _bound_body(self, response, name):
+        """Makes reading the body of `response` fail after `body_deadline` seconds."""
+        raw = response.raw
+        if self.body_deadline is None or not hasattr(raw, "stream"):
+            # e.g. a replayed response, whose body is already in memory
+            return
+        stream = raw.stream
+        started = time.monotonic()
+
+        def bounded_stream(*args, **kwargs):
+            for chunk in stream(*args, **kwargs):
+                if time.monotonic() - started > self.body_deadline:
+                    with self._lock:
+                        self.deadline_misses += 1
+                    response.close()
+                    raise Timeout(
+                        f"{name} body not read within {self.body_deadline}s"
+                    )
+                yield chunk
+
+        raw.stream = bounded_stream
+
+    def summary(self):
+        """Returns the latency percentiles per endpoint and the hedging stats."""
+        lines = [
+            f"Latency: {self.requests} requests, {self.hedges} hedged "
+            f"({self.hedge_wins} won), {self.deadline_misses} missed the deadline"
+        ]
+        with self._lock:
+            latencies = {
+                name: sorted(samples) for name, samples in self.latencies.items()
+            }
+        for name, samples in sorted(latencies.items()):
+            p50, p95, p99 = (percentile(samples, q) * 1000 for q in (50, 95, 99))
+            lines.append(
+                f"  {name}: p50 {p50:.0f} ms, p95 {p95:.0f} ms, p99 {p99:.0f} ms "
+                f"({len(samples)} calls)"
+            )
+        return "\n".join(lines)
+
+
+def _close_response(future):
+    if future.exception() is None:
+        future.result().close()
@@ -0,0 +1,165 @@
+import base64
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+
+from requests import Response
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# Blob downloads are content-addressed and already cached by `BlobCache`.
+UNCACHED_PATHS = ("/git/blobs/",)
+
+# The stored body is already decoded, so these no longer describe it.
+DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+DEFAULT_MAX_MB = 512
+
+
+class ConditionalCache:
+    """Transport layer caching GET responses and revalidating them with conditional requests.
+
+    Responses carrying an `ETag` or `Last-Modified` header are stored on disk.
+    The next GET of the same URL sends `If-None-Match` / `If-Modified-Since`, and
+    a `304 Not Modified` answer is replaced by the stored response. GitHub does
+    not count 304s against the rate limit.
+
+    Entries are keyed by URL, `Accept` header and a hash of the credentials, so
+    different tokens never share entries. Revalidated entries have their
+    modification time refreshed, and once the cache grows past `max_bytes` the
+    least recently used entries are evicted.
+
+    Inputs:
+        directory (Path): Where the cached responses are stored.
+        max_bytes (int): Size cap for the stored responses on disk.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size = sum(path.stat().st_size for path in self._entries())
+
+    def _entries(self):
+        return self.directory.glob("*.json")
+
+    def _path(self, request):
+        key = json.dumps(
+            [
+                request.url,
+                request.headers.get("Accept", ""),
+                hashlib.sha256(
+                    request.headers.get("Authorization", "").encode("utf-8")
+                ).hexdigest(),
+            ]
+        )
+        return self.directory / f"{hashlib.sha256(key.encode('utf-8')).hexdigest()}.json"
+
+    def send(self, request, send):
+        if request.method != "GET" or any(p in request.url for p in UNCACHED_PATHS):
+            return send(request)
+
+        path = self._path(request)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            entry = None
+
+        if entry is not None:
+            if entry.get("etag"):
+                request.headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                request.headers["If-Modified-Since"] = entry["last_modified"]
+
+        response = send(request)
+
+        if response.status_code == 304 and entry is not None:
+            with self._lock:
+                self.hits += 1
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                # Evicted in the meantime
+                pass
+            return self._cached_response(request, response, entry)
+
+        with self._lock:
+            self.misses += 1
+        if response.status_code == 200 and (
+            "ETag" in response.headers or "Last-Modified" in response.headers
+        ):
+            self._store(path, response)
+        return response
+
+    def _store(self, path, response):
+        entry = {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "headers": {
+                name: value
+                for name, value in response.headers.items()
+                if name.lower() not in DROPPED_HEADERS
+            },
+            "body": base64.b64encode(response.content).decode("ascii"),
+        }
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        size = tmp_path.stat().st_size
+        if size > self.max_bytes:
+            tmp_path.unlink()
+            return
+
+        with self._lock:
+            old_size = path.stat().st_size if path.exists() else 0
+            tmp_path.replace(path)
+            self._size += size - old_size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        entries = []
+        for path in self._entries():
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if self._size <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            self._size -= size
+
+    def _cached_response(self, request, not_modified, entry):
+        response = Response()
+        response.status_code = 200
+        response.reason = "OK"
+        response.headers = CaseInsensitiveDict(entry["headers"])
+        # Fresh rate limit headers of the 304 take precedence
+        for name, value in not_modified.headers.items():
+            if name.lower().startswith("x-ratelimit"):
+                response.headers[name] = value
+        response._content = base64.b64decode(entry["body"])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.connection = not_modified.connection
+        return response
+
+    def summary(self):
+        """Returns a one-line description of this run's hit ratio."""
+        total = self.hits + self.misses
+        ratio = self.hits / total if total else 0.0
+        return (
+            f"HTTP cache: {self.hits}/{total} conditional hits ({ratio:.0%}), "
+            f"{self._size / 1024 / 1024:.1f} MB on disk"
+        )
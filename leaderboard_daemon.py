@@ -0,0 +1,160 @@
+"""Keeps the leaderboards up to date from one long-lived process.
+
+Test data, scorers, the GitHub session and all caches are loaded once and
+stay warm between refreshes. Refreshes run more often close to an
+assignment's `deadline` and while students are pushing, and back off when
+nothing changes:
+
+    python run_leaderboard.py --config config_a1.yaml config_a2.yaml --daemon
+
+Send `SIGHUP` to the process to trigger a refresh right away.
+"""
+
+import signal
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta, timezone
+
+DEFAULT_MIN_INTERVAL_SECONDS = 60
+DEFAULT_MAX_INTERVAL_SECONDS = 1800
+DEFAULT_DEADLINE_WINDOW_HOURS = 24
+# Late submissions keep coming in for a while after a deadline
+DEFAULT_GRACE_HOURS = 6
+
+
+def parse_deadline(value):
+    """Returns a config deadline as an aware datetime, or None if not set.
+
+    Accepts ISO 8601 strings and the datetimes YAML parses unquoted timestamps
+    into. Deadlines without a timezone are taken as local time.
+    """
+    if value is None:
+        return None
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value))
+    return value if value.tzinfo is not None else value.astimezone()
+
+
+class RefreshPolicy:
+    """Decides how long the daemon sleeps between two refreshes.
+
+    The interval halves after every refresh that found changed repos and
+    doubles after every refresh that found none, within
+    `[min_interval, max_interval]`. From `window` before a deadline until
+    `grace` after it, refreshes run every `min_interval` regardless, and a
+    long sleep is cut short when a deadline window opens.
+
+    Inputs:
+        deadlines (list): Aware datetimes of the assignment deadlines.
+        min_interval (float): Shortest sleep in seconds.
+        max_interval (float): Longest sleep in seconds.
+        window (timedelta): How long before a deadline refreshes speed up.
+        grace (timedelta): How long after a deadline they stay fast.
+    """
+
+    def __init__(
+        self,
+        deadlines=(),
+        min_interval=DEFAULT_MIN_INTERVAL_SECONDS,
+        max_interval=DEFAULT_MAX_INTERVAL_SECONDS,
+        window=timedelta(hours=DEFAULT_DEADLINE_WINDOW_HOURS),
+        grace=timedelta(hours=DEFAULT_GRACE_HOURS),
+    ):
+        self.deadlines = [deadline for deadline in deadlines if deadline is not None]
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.window = window
+        self.grace = grace
+        self.interval = min_interval
+
+    def next_interval(self, changed, now=None):
+        """Returns the seconds to sleep after a refresh that found `changed` repos."""
+        now = now or datetime.now(timezone.utc)
+        if changed:
+            self.interval = max(self.min_interval, self.interval / 2)
+        else:
+            self.interval = min(self.max_interval, self.interval * 2)
+
+        interval = self.interval
+        for deadline in self.deadlines:
+            opens = deadline - self.window
+            if opens <= now <= deadline + self.grace:
+                return self.min_interval
+            if now < opens:
+                interval = min(interval, (opens - now).total_seconds())
+        return max(self.min_interval, interval)
+
+
+class LeaderboardDaemon:
+    """Runs `refresh` on a schedule and on demand, never twice at the same time.
+
+    Triggers that arrive while a refresh is running are coalesced into a
+    single follow-up refresh.
+
+    Inputs:
+        refresh: Callable running one refresh and returning the number of
+            changed repos it processed.
+        policy (RefreshPolicy): Decides the sleep between refreshes.
+    """
+
+    def __init__(self, refresh, policy):
+        self.refresh = refresh
+        self.policy = policy
+        self._trigger = threading.Event()
+        self._stop = threading.Event()
+
+    def trigger(self):
+        """Requests a refresh as soon as the current one (if any) is done."""
+        self._trigger.set()
+
+    def stop(self):
+        self._stop.set()
+        self._trigger.set()
+
+    def run_forever(self):
+        while not self._stop.is_set():
+            self._trigger.clear()
+            started = time.monotonic()
+            try:
+                changed = self.refresh()
+            except Exception:
+                traceback.print_exc()
+                changed = 0
+            interval = self.policy.next_interval(changed)
+            print(
+                f"Refresh took {time.monotonic() - started:.0f}s, {changed} changed "
+                f"repos; next refresh in {interval:.0f}s"
+            )
+            self._trigger.wait(interval)
+
+
+def serve(ctxs, run_all):
+    """Runs the daemon for already loaded run contexts until interrupted.
+
+    Inputs:
+        ctxs (list): Run contexts from `run_leaderboard.load_context`. Their
+            `daemon` and `deadline` config keys set up the `RefreshPolicy`.
+        run_all: `run_leaderboard.run_all`.
+    """
+    config = ctxs[0]["config"].get("daemon", {})
+    policy = RefreshPolicy(
+        deadlines=[parse_deadline(ctx["config"].get("deadline")) for ctx in ctxs],
+        min_interval=config.get("min_interval_seconds", DEFAULT_MIN_INTERVAL_SECONDS),
+        max_interval=config.get("max_interval_seconds", DEFAULT_MAX_INTERVAL_SECONDS),
+        window=timedelta(
+            hours=config.get("deadline_window_hours", DEFAULT_DEADLINE_WINDOW_HOURS)
+        ),
+        grace=timedelta(hours=config.get("grace_hours", DEFAULT_GRACE_HOURS)),
+    )
+
+    # Only changed repos are fetched on each refresh
+    for ctx in ctxs:
+        ctx["incremental"] = True
+
+    daemon = LeaderboardDaemon(lambda: run_all(ctxs), policy)
+    signal.signal(signal.SIGHUP, lambda *_: daemon.trigger())
+    try:
+        daemon.run_forever()
+    except KeyboardInterrupt:
+        daemon.stop()
@@ -0,0 +1,100 @@
+import queue
+import threading
+
+from tqdm import tqdm
+
+DEFAULT_QUEUE_SIZE = 16
+
+# Marks the end of a stage's input.
+_DONE = object()
+
+
+def run_pipeline(source, stages, queue_size=DEFAULT_QUEUE_SIZE, desc="Pipeline"):
+    """Streams items through a chain of stages, each with its own worker threads.
+
+    Stages are connected by bounded queues, so every item moves on as soon as
+    its previous stage is done with it, and a slow stage holds back its
+    upstream instead of letting work pile up in memory. The source is consumed
+    in its own thread.
+
+    Inputs:
+        source: Iterable of the items to process.
+        stages (list): `(name, function, workers)` tuples. `function(item)`
+            returns the item to hand to the next stage, or None to drop it.
+        queue_size (int): Capacity of each queue between two stages.
+        desc (str): Label of the progress bar.
+
+    Returns:
+        list: The items that came out of the last stage, in completion order.
+
+    Raises:
+        Exception: The first exception raised by the source or a stage. The
+            remaining items are drained without being processed.
+    """
+    queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+    errors = []
+    failed = threading.Event()
+
+    def feed():
+        try:
+            for item in source:
+                if failed.is_set():
+                    break
+                queues[0].put(item)
+        except BaseException as e:
+            errors.append(e)
+            failed.set()
+        finally:
+            queues[0].put(_DONE)
+
+    def work(index, function, remaining, lock):
+        inbox, outbox = queues[index], queues[index + 1]
+        while True:
+            item = inbox.get()
+            if item is _DONE:
+                # Let the other workers of this stage see the end as well
+                inbox.put(_DONE)
+                break
+            if failed.is_set():
+                continue
+            try:
+                result = function(item)
+            except BaseException as e:
+                errors.append(e)
+                failed.set()
+                continue
+            if result is not None:
+                outbox.put(result)
+
+        with lock:
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                outbox.put(_DONE)
+
+    threads = [threading.Thread(target=feed, daemon=True)]
+    for index, (name, function, workers) in enumerate(stages):
+        workers = max(1, workers)
+        remaining, lock = [workers], threading.Lock()
+        threads.extend(
+            threading.Thread(
+                target=work,
+                args=(index, function, remaining, lock),
+                name=f"{name}-{worker}",
+                daemon=True,
+            )
+            for worker in range(workers)
+        )
+    for thread in threads:
+        thread.start()
+
+    results = []
+    with tqdm(desc=desc) as progress:
+        while (item := queues[-1].get()) is not _DONE:
+            results.append(item)
+            progress.update()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        raise errors[0]
+    return results
@@ -0,0 +1,266 @@
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_MAX_RETRIES = 5
+# Below this many remaining requests, the rest of the budget is spread evenly until reset
+DEFAULT_RESERVE = 100
+MAX_BACKOFF_SECONDS = 120
+
+# GitHub keeps a separate primary rate limit per resource, e.g. 5000 `core`
+# requests an hour but only 30 `search` requests a minute.
+CORE, SEARCH, GRAPHQL = "core", "search", "graphql"
+
+
+def is_secondary_limit(status, body):
+    """Returns True if a 403 response body reports a secondary rate limit."""
+    return status == 403 and "secondary rate limit" in body.lower()
+
+
+def request_resource(url):
+    """Returns the rate limit resource (`core`, `search` or `graphql`) a request counts against."""
+    path = urlparse(url).path
+    if path.rstrip("/").endswith("/graphql"):
+        return GRAPHQL
+    if "/search/" in path:
+        return SEARCH
+    return CORE
+
+
+class RateLimitBucket:
+    """The primary rate limit state of one resource, from its `X-RateLimit-*` headers."""
+
+    def __init__(self):
+        self.remaining = None
+        self.reset_at = None
+        self.rate_limit = None
+        self.in_flight = 0
+        # Requests sent in the current rate limit window
+        self.window_requests = 0
+        self.paused_until = 0.0
+        self.next_start = 0.0
+
+    def update(self, headers):
+        if "X-RateLimit-Remaining" in headers:
+            self.remaining = int(headers["X-RateLimit-Remaining"])
+        if "X-RateLimit-Limit" in headers:
+            self.rate_limit = int(headers["X-RateLimit-Limit"])
+        if "X-RateLimit-Reset" in headers:
+            reset_at = int(headers["X-RateLimit-Reset"])
+            if self.reset_at is not None and reset_at > self.reset_at:
+                # A new rate limit window started
+                self.window_requests = self.in_flight
+            self.reset_at = reset_at
+
+    def spacing(self, reserve):
+        if self.remaining is None or self.reset_at is None:
+            return 0.0
+        if self.remaining > reserve:
+            return 0.0
+        seconds_to_reset = max(self.reset_at - time.time(), 0.0)
+        return seconds_to_reset / max(self.remaining, 1)
+
+
+class RateLimitScheduler:
+    """Transport layer keeping GitHub calls within the primary and secondary rate limits.
+
+    - Caps the number of requests in flight. The cap grows by one after a full
+      window of successful requests and is halved on every secondary rate limit
+      hit (additive increase, multiplicative decrease).
+    - Reads `X-RateLimit-Remaining` / `X-RateLimit-Reset` from every response,
+      separately for each `X-RateLimit-Resource` (`core`, `search`,
+      `graphql`), so a nearly used up search limit does not slow down core
+      requests. While plenty of a resource's budget remains its requests are
+      not delayed; once fewer than `reserve` remain they are spaced evenly
+      until the reset, and at zero they wait for the reset.
+    - Retries requests rejected by a rate limit after `Retry-After`, or after an
+      exponential backoff with jitter if the header is missing.
+    - With a `share` below 1, the token's budget is shared with other processes:
+      once this scheduler has sent `share` of a resource's `X-RateLimit-Limit`
+      in the current window, that resource's requests wait for the reset.
+
+    Inputs:
+        max_concurrency (int): Upper bound for the number of requests in flight.
+        max_retries (int): How often a rate-limited request is retried.
+        reserve (int): Remaining-budget threshold below which requests are paced.
+        share (float): Fraction of the token's rate limits this scheduler may use.
+    """
+
+    def __init__(
+        self,
+        max_concurrency=DEFAULT_MAX_CONCURRENCY,
+        max_retries=DEFAULT_MAX_RETRIES,
+        reserve=DEFAULT_RESERVE,
+        share=1.0,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.reserve = reserve
+        self.share = share
+        self.limit = max_concurrency
+        self.in_flight = 0
+        self.buckets = {}
+        self.requests = 0
+        self.throttled = 0
+        self.share_waits = 0
+        self._successes = 0
+        self._paused_until = 0.0
+        self._cond = threading.Condition()
+
+    def bucket(self, resource=CORE):
+        """Returns the rate limit state of a resource."""
+        if resource not in self.buckets:
+            self.buckets[resource] = RateLimitBucket()
+        return self.buckets[resource]
+
+    def try_acquire(self, resource=CORE):
+        """Takes a request slot if one is free.
+
+        Inputs:
+            resource (str): The rate limit resource of the request, see
+                `request_resource`.
+
+        Returns:
+            float: 0 if a slot was taken, otherwise the number of seconds to wait
+                before trying again.
+        """
+        with self._cond:
+            bucket = self.bucket(resource)
+            now = time.monotonic()
+            wait = (
+                max(self._paused_until, bucket.paused_until, bucket.next_start) - now
+            )
+            if wait > 0:
+                return wait
+            if self.in_flight >= self.limit:
+                return 0.05
+            wait = self._share_wait(bucket, resource)
+            if wait > 0:
+                return wait
+            self.in_flight += 1
+            bucket.in_flight += 1
+            self.requests += 1
+            bucket.window_requests += 1
+            bucket.next_start = now + bucket.spacing(self.reserve)
+            return 0
+
+    def acquire(self, resource=CORE):
+        """Blocks until a request slot is free."""
+        while True:
+            wait = self.try_acquire(resource)
+            if wait == 0:
+                return
+            with self._cond:
+                self._cond.wait(timeout=wait)
+
+    def _share_wait(self, bucket, resource):
+        if self.share >= 1 or bucket.rate_limit is None or bucket.reset_at is None:
+            return 0.0
+        if bucket.window_requests < self.share * bucket.rate_limit:
+            return 0.0
+        wait = bucket.reset_at - time.time()
+        if wait <= 0:
+            # The window has reset; the next response confirms the new one
+            bucket.window_requests = 0
+            return 0.0
+        self.share_waits += 1
+        bucket.paused_until = time.monotonic() + wait + 1.0
+        print(
+            f"Rate limit share of {resource} used up, waiting {wait:.0f}s for the reset"
+        )
+        return wait + 1.0
+
+    def release(self, status, headers, attempt=0, secondary=False, resource=CORE):
+        """Frees a request slot and updates the limits from a response.
+
+        Inputs:
+            status (int): The response status code, or None if the request failed.
+            headers: The response headers.
+            attempt (int): How many times this request was already retried.
+            secondary (bool): Whether the response body reports a secondary rate limit.
+            resource (str): The rate limit resource the slot was taken for.
+
+        Returns:
+            float: Seconds to wait before retrying the request, or None if the
+                response should be returned as is.
+        """
+        with self._cond:
+            self.in_flight -= 1
+            self.bucket(resource).in_flight -= 1
+            # The response names the resource it was counted against
+            bucket = self.bucket(headers.get("X-RateLimit-Resource", resource))
+            bucket.update(headers)
+
+            retry = None
+            if status in (403, 429) and attempt < self.max_retries:
+                if bucket.remaining == 0 and bucket.reset_at is not None:
+                    # Primary limit exhausted: wait for the reset
+                    retry = max(bucket.reset_at - time.time(), 0.0) + 1.0
+                    bucket.paused_until = max(
+                        bucket.paused_until, time.monotonic() + retry
+                    )
+                elif "Retry-After" in headers or status == 429 or secondary:
+                    # Secondary limit: back off and halve the concurrency
+                    self.limit = max(1, self.limit // 2)
+                    self._successes = 0
+                    retry = float(headers.get("Retry-After", 2**attempt))
+                    retry = min(retry, MAX_BACKOFF_SECONDS) + random.uniform(0, 1)
+                    self._paused_until = max(
+                        self._paused_until, time.monotonic() + retry
+                    )
+
+            if retry is not None:
+                self.throttled += 1
+            elif status is not None and status < 400:
+                self._successes += 1
+                if self._successes >= self.limit and self.limit < self.max_concurrency:
+                    self.limit += 1
+                    self._successes = 0
+
+            self._cond.notify_all()
+            return retry
+
+    def send(self, request, send):
+        resource = request_resource(request.url)
+        attempt = 0
+        while True:
+            self.acquire(resource)
+            try:
+                response = send(request)
+            except Exception:
+                self.release(None, {}, resource=resource)
+                raise
+
+            status = response.status_code
+            retry = self.release(
+                status,
+                response.headers,
+                attempt,
+                secondary=status == 403 and is_secondary_limit(status, response.text),
+                resource=resource,
+            )
+            if retry is None:
+                return response
+
+            # Hands a streamed response's connection back to the pool
+            response.close()
+            print(f"Rate limited on {request.url}, retrying in {retry:.1f}s")
+            attempt += 1
+
+    def summary(self):
+        """Returns a one-line description of this run's throttling."""
+        remaining = ", ".join(
+            f"{bucket.remaining if bucket.remaining is not None else '?'} "
+            f"{resource} remaining"
+            for resource, bucket in sorted(self.buckets.items())
+        )
+        summary = (
+            f"Rate limit: {self.requests} requests, {self.throttled} throttled, "
+            f"concurrency {self.limit}/{self.max_concurrency}, "
+            f"{remaining or '? remaining'}"
+        )
+        if self.share < 1:
+            summary += f", {self.share_waits} waits for a {self.share:.0%} share"
+        return summary
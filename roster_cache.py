@@ -0,0 +1,113 @@
+import csv
+import json
+import threading
+import time
+from pathlib import Path
+
+DEFAULT_TTL_HOURS = 24
+
+
+class RosterCache:
+    """Persistent cache of the members of each repo, with a time to live.
+
+    Collaborators rarely change after the first days of an assignment, so a
+    cached member list is reused until it is `ttl` seconds old or until the
+    repo is invalidated, e.g. by a `member` webhook event. Repos found in a
+    classroom roster export (see `load_classroom_roster`) never need a lookup.
+
+    Inputs:
+        path (Path): JSON file the rosters are loaded from and saved to.
+        ttl (float): Seconds a member list stays valid.
+        classroom (dict): Optional repo name to members mapping taking
+            precedence over the cached and fetched member lists.
+    """
+
+    def __init__(self, path, ttl=DEFAULT_TTL_HOURS * 3600, classroom=None):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.classroom = classroom or {}
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, "r") as f:
+                self._rosters = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._rosters = {}
+
+    def get(self, name):
+        """Returns the cached members of a repo, or None if missing or expired."""
+        with self._lock:
+            if name in self.classroom:
+                self.hits += 1
+                return self.classroom[name]
+            entry = self._rosters.get(name)
+            if entry is None or time.time() - entry["fetched_at"] > self.ttl:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry["member"]
+
+    def put(self, name, member):
+        """Caches the freshly fetched members of a repo."""
+        with self._lock:
+            self._rosters[name] = {"member": member, "fetched_at": time.time()}
+
+    def invalidate(self, name):
+        """Drops the cached members of a repo, so they are fetched again.
+
+        The repo's classroom roster entry is dropped as well, since the export
+        predates the membership change.
+        """
+        with self._lock:
+            self.classroom.pop(name, None)
+            self._rosters.pop(name, None)
+
+    def save(self):
+        """Writes the rosters back to disk."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with self._lock:
+            with open(tmp_path, "w") as f:
+                json.dump(self._rosters, f)
+            tmp_path.replace(self.path)
+
+    def summary(self):
+        """Returns a one-line description of this run's cache usage."""
+        return f"Roster cache: {self.hits} hits, {self.misses} collaborator lookups"
+
+
+def load_classroom_roster(path, staff=()):
+    """Loads the repo to members mapping from a GitHub Classroom roster export.
+
+    The CSV needs a `github_username` and a `student_repository_name` column;
+    group assignments have one row per student, sharing the repository name.
+
+    Inputs:
+        path (Path): The exported CSV file.
+        staff (set): Logins to exclude from the member lists.
+
+    Returns:
+        dict: Maps repo names to sorted member logins.
+
+    Raises:
+        ValueError: If a required column is missing.
+    """
+    rosters = {}
+    with open(path, "r", newline="") as f:
+        reader = csv.DictReader(f)
+        missing = {"github_username", "student_repository_name"} - set(
+            reader.fieldnames or []
+        )
+        if missing:
+            columns = ", ".join(sorted(missing))
+            raise ValueError(f"Classroom roster {path} is missing columns: {columns}")
+        for row in reader:
+            name = row["student_repository_name"].strip()
+            login = row["github_username"].strip()
+            if not name:
+                continue
+            members = rosters.setdefault(name, set())
+            if login and login not in staff:
+                members.add(login)
+    return {name: sorted(members) for name, members in rosters.items()}
@@ -1,10 +1,10 @@
 """Note: This is a mess since I didn't take the time to extract a generalizable way of doing this from the chaos"""
 
 import argparse
-import base64
+import json
 import os
 from datetime import datetime
-from io import StringIO
+from io import StringIO, TextIOWrapper
 from pathlib import Path
 from sys import argv
 
@@ -14,6 +14,19 @@ from dotenv import load_dotenv
 from github import Github, GithubException
 from tqdm import tqdm
 
+from blob_cache import BlobCache
+from github_transport import SERVER_ERROR_RETRY, Transport, install_transport
+from github_utils import (
+    discover_repos,
+    list_assignment_repos,
+    raw_session,
+    stream_blob,
+)
+from http_cache import ConditionalCache
+from rate_limit import RateLimitScheduler
+from roster_cache import RosterCache, load_classroom_roster
+from score_cache import ScoreCache, hash_directory, hash_module_source
+
 load_dotenv()
 
 ################################################################################
@@ -88,6 +101,44 @@ def read_embedding(rows):
 
 TEST_DATA_DIR = Path(__file__).parent / "held-out-test-data" / "a3-test-data"
 
+# Downloaded results files, keyed by git blob SHA (shared with run_leaderboard.py).
+BLOB_CACHE_DIR = Path(__file__).parent / ".cache" / "blobs"
+
+# REST API root.
+API_URL = "https://api.github.com"
+
+# Conditional-request cache for GitHub API reads (shared with run_leaderboard.py).
+HTTP_CACHE_DIR = Path(__file__).parent / ".cache" / "http"
+
+# Memo of the scores of each model's results files (same layout as run_leaderboard.py).
+SCORE_CACHE_PATH = Path(__file__).parent / ".cache" / "scores" / "run_a3_leaderboard.json"
+
+# Cached collaborator lists (same layout as run_leaderboard.py).
+ROSTER_PATH = Path(__file__).parent / ".cache" / "rosters" / "assignment-3.json"
+
+# Optional GitHub Classroom roster export; repos listed in it need no
+# collaborator requests at all.
+CLASSROOM_ROSTER_CSV = None
+
+
+MODELS = ["word2vec", "bert", "gpt2"]
+
+
+def file_model(file_name):
+    for model in MODELS:
+        if model in file_name:
+            return model
+
+
+def model_score_key(score_cache, model, files, member):
+    """Returns the score cache key of a model, whose scores depend on all of its files."""
+    shas = sorted(
+        (file_name, path.sha)
+        for file_name, path in files.items()
+        if file_model(file_name) == model
+    )
+    return score_cache.key(model, json.dumps(shas), member)
+
 
 def main(config):
     isol_test = pd.read_csv(TEST_DATA_DIR / "isolated_test_y.csv", index_col="id")
@@ -200,7 +251,15 @@ def main(config):
     # API authentication, find organization and leaderboard repo.
     ################################################################################
 
-    git = Github(*GITHUB_TOKEN)
+    scheduler = RateLimitScheduler()
+    transport = Transport(
+        [ConditionalCache(HTTP_CACHE_DIR), scheduler],
+        max_retries=SERVER_ERROR_RETRY,
+    )
+    install_transport(transport)
+
+    git = Github(*GITHUB_TOKEN, base_url=API_URL, per_page=100)
+    session = raw_session(GITHUB_TOKEN[1], transport)
     org = git.get_organization(CLASS)
     leaderboard_repo = org.get_repo(LEADERBOARD_REPO_NAME)
 
@@ -222,22 +281,20 @@ def main(config):
     #     if repo.name.startswith(REPO_ASSIGNMENT_PREFIX)
     # ]
 
-    repos = [
-        {
-            "git": repo,
-            "name": repo.name,
-            "member": sorted(
-                [c.login for c in repo.get_collaborators() if c.login not in STAFF]
-            ),
-        }
-        for repo in org.get_repos()
-        if repo.name.startswith(REPO_ASSIGNMENT_PREFIX)
-    ]
-
-    # Remove all staff member teams.
-    repos = [
-        repo for repo in repos if not any(staff in repo["name"] for staff in STAFF)
-    ]
+    roster = RosterCache(
+        ROSTER_PATH,
+        classroom=load_classroom_roster(CLASSROOM_ROSTER_CSV, STAFF)
+        if CLASSROOM_ROSTER_CSV
+        else None,
+    )
+    # Staff member teams are dropped here as well.
+    repos = discover_repos(
+        list_assignment_repos(git, CLASS, REPO_ASSIGNMENT_PREFIX),
+        STAFF,
+        roster=roster,
+    )
+    print(roster.summary())
+    roster.save()
 
     ################################################################################
     # Extract repo files.
@@ -259,15 +316,29 @@ def main(config):
     ]
 
     for repo in tqdm(repos, desc="Finding files"):
+        try:
+            contents = repo["git"].get_contents("results")
+        except GithubException as e:
+            if e.status != 404:
+                raise
+            print(f"Issue: results folder not found for {repo['name']}")
+            contents = []
         repo["files"] = {
             result_file.name: result_file
-            for result_file in repo["git"].get_contents("results")
+            for result_file in contents
             if result_file.name.endswith(".txt") and result_file.name in possible_files
         }
     ################################################################################
     # Download files and load CSVs.
     ################################################################################
 
+    # Unchanged submissions are neither downloaded nor scored again
+    score_cache = ScoreCache(
+        SCORE_CACHE_PATH,
+        hash_directory(TEST_DATA_DIR),
+        hash_module_source(Path(__file__).stem),
+    )
+    blob_cache = BlobCache(BLOB_CACHE_DIR)
     for repo in tqdm(repos, desc="Downloading files"):
         print(repo["name"])
 
@@ -276,22 +347,32 @@ def main(config):
             "bert": {},
             "gpt2": {},
         }
+        repo["score_keys"] = {
+            model: model_score_key(score_cache, model, repo["files"], repo["member"])
+            for model in repo["results"]
+        }
 
         for file_name, path in repo["files"].items():
-            content_encoded = repo["git"].get_git_blob(path.sha).content
-            content = base64.b64decode(content_encoded).decode("utf-8")
+            if score_cache.has(repo["score_keys"][file_model(file_name)]):
+                continue
+            content = blob_cache.open_or_fetch(
+                path.sha,
+                lambda sha: stream_blob(session, API_URL, repo["git"].full_name, sha),
+            )
             try:
-                content_list = [x for x in content.split("\n") if x != ""]
-                data, dim = read_embedding(content_list)
-            except:
+                with TextIOWrapper(content, encoding="utf-8") as lines:
+                    data, dim = read_embedding(
+                        line for line in lines if line not in ("", "\n")
+                    )
+            except OSError:
+                # A failed download says nothing about the file: never score it
+                raise
+            except Exception:
                 print("Except", file_name)
                 data = None
-            if "word2vec" in file_name:
-                repo["results"]["word2vec"][file_name] = data
-            elif "bert" in file_name:
-                repo["results"]["bert"][file_name] = data
-            elif "gpt2" in file_name:
-                repo["results"]["gpt2"][file_name] = data
+            repo["results"][file_model(file_name)][file_name] = data
+
+    print(blob_cache.summary())
 
     ################################################################################
     # Compute scores and create assignment-level master leaderboard.
@@ -304,18 +385,26 @@ def main(config):
             print(model)
             if model not in ["word2vec", "bert", "gpt2"]:
                 continue
-            result_names = file_names.keys()
-            results = file_names.values()
-            try:
-                score_isol, score_cont = compute_scores(file_names, repo)
-            except:
-                print("model", model)
+            score_key = repo["score_keys"][model]
+            if score_key in score_cache:
+                scores = score_cache[score_key]
+            else:
+                try:
+                    scores = compute_scores(file_names, repo)
+                except:
+                    print("model", model)
+                    scores = None
+                score_cache[score_key] = scores
+            if scores is None:
                 continue
 
+            score_isol, score_cont = scores
             if score_isol is not None:
                 leaderboards.append(score_isol)
             if score_cont is not None:
                 leaderboards.append(score_cont)
+    print(score_cache.summary())
+    score_cache.save()
     leaderboards = sort_scores(pd.DataFrame(leaderboards))
 
     ################################################################################
@@ -370,6 +459,8 @@ def main(config):
                     else:
                         raise
 
+    for summary in transport.summary():
+        print(summary)
     print("Done!")
 
     ################################################################################
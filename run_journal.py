@@ -0,0 +1,116 @@
+import json
+import threading
+from pathlib import Path
+
+from github_utils import ResultFile
+
+
+class RunJournal:
+    """Append-only journal of the units of work a run has completed.
+
+    Every completed unit is appended as one JSON line as soon as it is done:
+    the members of a repo, the results files of a repo and the score of a
+    results file. If a run dies before publishing, the next run replays the
+    journal and only redoes the units that are missing. The journal starts over
+    once a run has published.
+
+    Member and file units are only reused while the repo's `pushed_at` time is
+    unchanged, and the whole journal is dropped if it was written with another
+    test data or scorer version (see `ScoreCache.version`).
+
+    Inputs:
+        path (Path): The journal file.
+        version (str): Version of the scores being journaled.
+    """
+
+    def __init__(self, path, version):
+        self.path = Path(path)
+        self.version = version
+        self.scores = {}
+        self._members = {}
+        self._files = {}
+        self._lock = threading.Lock()
+
+        units = []
+        try:
+            with open(self.path, "r") as f:
+                for line in f:
+                    try:
+                        units.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        # A torn line from an interrupted write
+                        continue
+        except FileNotFoundError:
+            pass
+
+        if units and units[0].get("version") == version:
+            for unit in units[1:]:
+                self._replay(unit)
+        else:
+            self._reset()
+        self.resumed = bool(self.scores or self._members or self._files)
+
+    def _replay(self, unit):
+        if unit["unit"] == "members":
+            self._members[unit["repo"]] = (unit["pushed_at"], unit["member"])
+        elif unit["unit"] == "files":
+            files = {entry[0]: ResultFile(*entry) for entry in unit["files"]}
+            self._files[unit["repo"]] = (unit["pushed_at"], unit["head"], files)
+        elif unit["unit"] == "score":
+            self.scores[unit["key"]] = unit["score"]
+
+    def _reset(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "w") as f:
+            f.write(json.dumps({"version": self.version}) + "\n")
+
+    def _append(self, unit):
+        line = json.dumps(unit) + "\n"
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line)
+
+    def members(self, name, pushed_at):
+        """Returns the journaled members of a repo, or None if they must be fetched."""
+        saved = self._members.get(name)
+        if saved is None or saved[0] != pushed_at:
+            return None
+        return saved[1]
+
+    def files(self, name, pushed_at):
+        """Returns the journaled `(head, files)` of a repo, or None if they must be listed."""
+        saved = self._files.get(name)
+        if saved is None or saved[0] != pushed_at:
+            return None
+        return saved[1], saved[2]
+
+    def record_members(self, repo):
+        self._append(
+            {
+                "unit": "members",
+                "repo": repo["name"],
+                "pushed_at": repo["pushed_at"],
+                "member": repo["member"],
+            }
+        )
+
+    def record_files(self, repo):
+        self._append(
+            {
+                "unit": "files",
+                "repo": repo["name"],
+                "pushed_at": repo["pushed_at"],
+                "head": repo.get("head"),
+                "files": [list(entry) for entry in repo["files"].values()],
+            }
+        )
+
+    def record_score(self, key, score):
+        self._append({"unit": "score", "key": key, "score": score})
+
+    def clear(self):
+        """Starts a fresh journal once a run has published."""
+        with self._lock:
+            self.scores, self._members, self._files = {}, {}, {}
+            self._reset()
+        self.resumed = False
@@ -1,19 +1,71 @@
 import argparse
-import base64
+import asyncio
 import importlib
 import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from io import StringIO
+from functools import partial
+from io import BytesIO
 from pathlib import Path
 
 import pandas as pd
 import yaml
 from dotenv import load_dotenv
-from github import Github, GithubException
+from github import Github, GithubException, UnknownObjectException
 from tqdm import tqdm
 
+import leaderboard_daemon
+from async_ingest import DEFAULT_API_URL, DEFAULT_CONCURRENCY, load_repos_async
+from blob_cache import DEFAULT_MAX_MB, BlobCache
+from cassette import Cassette
+from git_mirror import DEFAULT_GIT_URL, GitMirror
+from github_graphql import DEFAULT_GRAPHQL_URL, GraphQLClient, load_repos_graphql
+from github_transport import SERVER_ERROR_RETRY, Transport, install_transport
+from github_utils import (
+    DEFAULT_DISCOVERY_WORKERS,
+    DEFAULT_MIN_FILE_BYTES,
+    discover_repos,
+    find_results_files,
+    format_timestamp,
+    is_downloadable,
+    is_staff_repo,
+    list_assignment_repos,
+    list_repos_by_prefix,
+    raw_session,
+    repo_record,
+    stream_blob,
+)
+from hedging import (
+    DEFAULT_BODY_DEADLINE_SECONDS,
+    DEFAULT_DEADLINE_SECONDS,
+    DEFAULT_HEDGE_PERCENTILE,
+    DEFAULT_MAX_HEDGE_RATIO,
+    DEFAULT_MIN_SAMPLES,
+    HedgedRequests,
+)
+from http_cache import DEFAULT_MAX_MB as DEFAULT_HTTP_CACHE_MB
+from http_cache import ConditionalCache
+from pipeline import DEFAULT_QUEUE_SIZE, run_pipeline
+from rate_limit import DEFAULT_MAX_CONCURRENCY, RateLimitScheduler
+from roster_cache import DEFAULT_TTL_HOURS, RosterCache, load_classroom_roster
+from run_journal import RunJournal
+from score_cache import ScoreCache, hash_directory, hash_module_source
+from time_budget import DeferralQueue, TimeBudget, prioritize, take
+from watermarks import Watermarks
+
 SCRIPT_DIR = Path(__file__).resolve().parent
 
+# Errors of a results file's content, as opposed to failures to read it
+UNREADABLE_ERRORS = (
+    pd.errors.ParserError,
+    pd.errors.EmptyDataError,
+    UnicodeDecodeError,
+)
+
+# Scoring is mostly CPU-bound, so few threads are enough to keep up with downloads
+DEFAULT_SCORE_WORKERS = 2
+
 
 def get_assignment_utils(utils_module: str):
     """Factory function to import scoring and data utilities. These will be unique for each assignment.
@@ -37,10 +89,79 @@ def get_assignment_utils(utils_module: str):
     }
 
 
-def main(config_path="config.yaml"):
-    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    print(f"Starting leaderboard update... [Time: {current_time}]")
+def build_transport(
+    http_cache_config,
+    http_cache_dir,
+    rate_limit_config,
+    hedging_config,
+    pool_size,
+    cassette_config=None,
+):
+    """Builds the transport every GitHub request goes through.
+
+    Returns:
+        tuple: The `Transport` and its `RateLimitScheduler` (None if disabled).
+    """
+    layers = []
+    if http_cache_config.get("enabled", True):
+        max_mb = http_cache_config.get("max_mb", DEFAULT_HTTP_CACHE_MB)
+        layers.append(ConditionalCache(http_cache_dir, max_bytes=max_mb * 1024 * 1024))
+    scheduler = None
+    if rate_limit_config.get("enabled", True):
+        scheduler = RateLimitScheduler(
+            max_concurrency=rate_limit_config.get(
+                "max_concurrency", DEFAULT_MAX_CONCURRENCY
+            )
+        )
+        layers.append(scheduler)
+    # Innermost, so it times the network calls and not the queueing above
+    layers.append(
+        HedgedRequests(
+            deadline=hedging_config.get("deadline_seconds", DEFAULT_DEADLINE_SECONDS),
+            body_deadline=hedging_config.get(
+                "body_deadline_seconds", DEFAULT_BODY_DEADLINE_SECONDS
+            ),
+            hedge=hedging_config.get("enabled", False),
+            hedge_percentile=hedging_config.get(
+                "percentile", DEFAULT_HEDGE_PERCENTILE
+            ),
+            min_samples=hedging_config.get("min_samples", DEFAULT_MIN_SAMPLES),
+            max_ratio=hedging_config.get("max_ratio", DEFAULT_MAX_HEDGE_RATIO),
+        )
+    )
+    if cassette_config:
+        # Below everything else, standing in for the network on replays
+        layers.append(
+            Cassette(
+                SCRIPT_DIR / cassette_config["path"],
+                cassette_config.get("mode", "replay"),
+                latency=cassette_config.get("latency"),
+            )
+        )
+    transport = Transport(
+        layers,
+        pool_size=pool_size,
+        # The scheduler handles rate limits; only retry server errors below it
+        max_retries=SERVER_ERROR_RETRY
+        if scheduler is not None
+        else Github.default_retry,
+    )
+    return transport, scheduler
+
 
+def load_context(config_path, shared=None):
+    """Loads the config, authenticates with GitHub and warms up everything a run needs.
+
+    Inputs:
+        config_path: Path to the YAML configuration file.
+        shared (dict): Optional context of another assignment loaded in this
+            process. Its transport, GitHub client, leaderboard repo and blob
+            cache are reused when they point at the same place.
+
+    Returns:
+        dict: The run context: config values, GitHub clients, scoring utilities,
+            test data, caches and watermarks.
+    """
     # Load environment variables
     load_dotenv()
     GITHUB_USERNAME = os.getenv("GITHUB_USERNAME")
@@ -53,22 +174,84 @@ def main(config_path="config.yaml"):
     DRY_RUN = config["dry_run"]
     CLASS = config["github"]["organization"]
     LEADERBOARD_REPO_NAME = config["github"]["leaderboard_repo"]
-    REPO_ASSIGNMENT_PREFIX = config["github"]["assignment_prefix"]
-    LEADERBOARD_ASSIGNMENT_NAME = config["github"]["assignment_name"] + "-leaderboard"
+    ASSIGNMENT_NAME = config["github"]["assignment_name"]
     STAFF = set(config["staff"])
     TEST_DATA_DIR = Path(config["test_data"]["directory"])
     ASSIGNMENT_TEST_DATA_DIR = (
         TEST_DATA_DIR / config["test_data"]["assignment_test_data"]
     )
-    RESULTS_FILES = config["results_files"]
     UTILS_MODULE = config["utils_module"]
+    BLOB_CACHE_CONFIG = config.get("blob_cache", {})
+    BLOB_CACHE_DIR = SCRIPT_DIR / BLOB_CACHE_CONFIG.get("directory", ".cache/blobs")
+    BLOB_CACHE_MAX_MB = BLOB_CACHE_CONFIG.get("max_mb", DEFAULT_MAX_MB)
+    SCORE_CACHE_PATH = (
+        SCRIPT_DIR
+        / config.get("score_cache", {}).get("directory", ".cache/scores")
+        / f"{UTILS_MODULE}.json"
+    )
+    STATE_DIR = SCRIPT_DIR / config.get("state", {}).get("directory", ".cache/state")
+    WATERMARKS_PATH = STATE_DIR / f"{ASSIGNMENT_NAME}.json"
+    JOURNAL_PATH = STATE_DIR / f"{ASSIGNMENT_NAME}.journal"
+    DEFERRALS_PATH = STATE_DIR / f"{ASSIGNMENT_NAME}.deferred.json"
+    DISCOVERY_WORKERS = config["github"].get(
+        "discovery_workers", DEFAULT_DISCOVERY_WORKERS
+    )
+    API_URL = config["github"].get("api_url", DEFAULT_API_URL)
+    HTTP_CACHE_CONFIG = config.get("http_cache", {})
+    HTTP_CACHE_DIR = SCRIPT_DIR / HTTP_CACHE_CONFIG.get("directory", ".cache/http")
+    RATE_LIMIT_CONFIG = config.get("rate_limit", {})
+    INGEST = config.get("ingest", "pygithub")
+    PIPELINE_CONFIG = config.get("pipeline", {})
+    PIPELINE_WORKERS = {
+        "discover": DISCOVERY_WORKERS,
+        "list": DISCOVERY_WORKERS,
+        "download": DISCOVERY_WORKERS,
+        "score": DEFAULT_SCORE_WORKERS,
+        **PIPELINE_CONFIG.get("workers", {}),
+    }
+    MIRROR_DIR = SCRIPT_DIR / config.get("mirror", {}).get(
+        "directory", ".cache/mirrors"
+    )
+    ROSTER_CONFIG = config.get("roster", {})
+    ROSTER_PATH = (
+        SCRIPT_DIR
+        / ROSTER_CONFIG.get("directory", ".cache/rosters")
+        / f"{ASSIGNMENT_NAME}.json"
+    )
+    MIN_FILE_BYTES = config.get("min_file_bytes", DEFAULT_MIN_FILE_BYTES)
+    MAX_FILE_MB = config.get("max_file_mb")
 
     # Load utilities based on config
     utils = get_assignment_utils(UTILS_MODULE)
 
-    compute_scores = utils["compute_scores"]
-    sort_scores = utils["sort_scores"]
-    load_test_data = utils["load_test_data"]
+    # Test data loads in the background while the repos are discovered
+    print("Loading test data...")
+    executor = ThreadPoolExecutor(max_workers=1)
+    test_data = executor.submit(
+        utils["load_test_data"], SCRIPT_DIR / ASSIGNMENT_TEST_DATA_DIR
+    )
+    executor.shutdown(wait=False)
+
+    score_cache = ScoreCache(
+        SCORE_CACHE_PATH,
+        hash_directory(SCRIPT_DIR / ASSIGNMENT_TEST_DATA_DIR),
+        hash_module_source(UTILS_MODULE),
+    )
+    journal = None
+    if config.get("journal", {}).get("enabled", True):
+        journal = RunJournal(JOURNAL_PATH, score_cache.version)
+        score_cache.restore(journal.scores)
+
+    roster = None
+    if ROSTER_CONFIG.get("enabled", True):
+        classroom_csv = ROSTER_CONFIG.get("classroom_csv")
+        roster = RosterCache(
+            ROSTER_PATH,
+            ttl=ROSTER_CONFIG.get("ttl_hours", DEFAULT_TTL_HOURS) * 3600,
+            classroom=load_classroom_roster(SCRIPT_DIR / classroom_csv, STAFF)
+            if classroom_csv
+            else None,
+        )
 
     # Auth with GitHub and load leaderboard repo
     if not GITHUB_USERNAME or not GITHUB_TOKEN:
@@ -79,114 +262,851 @@ def main(config_path="config.yaml"):
     print(f"Using GitHub username: {GITHUB_USERNAME}")
     print(f"DRY_RUN mode is {'enabled' if DRY_RUN else 'disabled'}")
 
-    git = Github(GITHUB_USERNAME, GITHUB_TOKEN)
-    org = git.get_organization(CLASS)
-    leaderboard_repo = org.get_repo(LEADERBOARD_REPO_NAME)
+    if (
+        shared is not None
+        and (shared["api_url"], shared["token"], shared["organization"])
+        == (API_URL, GITHUB_TOKEN, CLASS)
+    ):
+        # Another assignment of this process already connected to the org
+        transport, scheduler = shared["transport"], shared["scheduler"]
+        git, org = shared["git"], shared["org"]
+        session = shared["raw_session"]
+    else:
+        transport, scheduler = build_transport(
+            HTTP_CACHE_CONFIG,
+            HTTP_CACHE_DIR,
+            RATE_LIMIT_CONFIG,
+            config.get("hedging", {}),
+            DISCOVERY_WORKERS,
+            config.get("cassette"),
+        )
+        install_transport(transport)
+        git = Github(
+            GITHUB_USERNAME,
+            GITHUB_TOKEN,
+            base_url=API_URL,
+            per_page=100,
+            pool_size=DISCOVERY_WORKERS,
+        )
+        org = git.get_organization(CLASS)
+        session = raw_session(GITHUB_TOKEN, transport)
 
-    print("Loading test data...")
-    test_data = load_test_data(SCRIPT_DIR / ASSIGNMENT_TEST_DATA_DIR)
+    if shared is not None and shared["org"] is org and (
+        shared["leaderboard_repo"].name == LEADERBOARD_REPO_NAME
+    ):
+        leaderboard_repo = shared["leaderboard_repo"]
+    else:
+        leaderboard_repo = org.get_repo(LEADERBOARD_REPO_NAME)
+
+    if shared is not None and shared["blob_cache"].directory == BLOB_CACHE_DIR:
+        blob_cache = shared["blob_cache"]
+    else:
+        blob_cache = BlobCache(
+            BLOB_CACHE_DIR, max_bytes=BLOB_CACHE_MAX_MB * 1024 * 1024
+        )
+
+    return {
+        "config": config,
+        "dry_run": DRY_RUN,
+        "token": GITHUB_TOKEN,
+        "organization": CLASS,
+        "assignment_prefix": config["github"]["assignment_prefix"],
+        "leaderboard_dir": ASSIGNMENT_NAME + "-leaderboard",
+        "staff": STAFF,
+        "results_files": config["results_files"],
+        "min_file_bytes": MIN_FILE_BYTES,
+        "max_file_bytes": MAX_FILE_MB * 1024 * 1024 if MAX_FILE_MB else None,
+        "ingest": INGEST,
+        "graphql_url": config["github"].get("graphql_url", DEFAULT_GRAPHQL_URL),
+        "incremental": config.get("incremental", False),
+        "discovery_workers": DISCOVERY_WORKERS,
+        "api_url": API_URL,
+        "pipeline_workers": PIPELINE_WORKERS,
+        "pipeline_queue_size": PIPELINE_CONFIG.get("queue_size", DEFAULT_QUEUE_SIZE),
+        "async_concurrency": config.get("async", {}).get(
+            "concurrency", DEFAULT_CONCURRENCY
+        ),
+        "transport": transport,
+        "raw_session": session,
+        "scheduler": scheduler,
+        "git": git,
+        "org": org,
+        "leaderboard_repo": leaderboard_repo,
+        "compute_scores": utils["compute_scores"],
+        "sort_scores": utils["sort_scores"],
+        "test_data": test_data,
+        "blob_cache": blob_cache,
+        "score_cache": score_cache,
+        "journal": journal,
+        "roster": roster,
+        "watermarks": Watermarks(WATERMARKS_PATH, score_cache.version),
+        "deferrals": DeferralQueue(DEFERRALS_PATH),
+        "mirror": GitMirror(
+            MIRROR_DIR,
+            config["github"].get("git_url", DEFAULT_GIT_URL),
+            GITHUB_TOKEN,
+        )
+        if INGEST == "mirror"
+        else None,
+    }
+
+
+def list_repos(ctx, listed=None):
+    """Lists the assignment repos and the pipeline stages that complete their records.
+
+    With the `graphql` and `async` ingest modes, the records come back complete.
+    With `pygithub` and `mirror`, only the repo listing is fetched here; members
+    and results files are fetched by the returned stages as each repo flows
+    through the pipeline.
+
+    In incremental mode, repos whose watermark has not moved are not fetched;
+    their saved records are returned separately so their rows can be reused.
+
+    Inputs:
+        ctx (dict): The run context from `load_context`.
+        listed (list): Optional PyGithub repos of this assignment, already
+            listed for `pygithub` and `mirror` ingest (see `run_all`).
+
+    Returns:
+        tuple: The items to feed the pipeline, the stages turning them into repo
+            records with `files`, the carried-forward records and the names of
+            all assignment repos.
+    """
+    watermarks = ctx["watermarks"] if ctx["incremental"] else None
+    workers = ctx["pipeline_workers"]
+    stages = []
+
+    print(f"Loading Repos... [ingest: {ctx['ingest']}]")
+    if ctx["ingest"] == "graphql":
+        repos = load_repos_graphql(
+            GraphQLClient(
+                ctx["token"], url=ctx["graphql_url"], transport=ctx["transport"]
+            ),
+            ctx["organization"],
+            ctx["assignment_prefix"],
+            ctx["staff"],
+            ctx["results_files"],
+        )
+        repo_names = [repo["name"] for repo in repos]
+        if watermarks is not None:
+            repos = [
+                repo
+                for repo in repos
+                if watermarks.changed(repo["name"], repo["pushed_at"], repo["head"])
+            ]
+        for repo in repos:
+            repo["git"] = ctx["git"].get_repo(
+                f"{ctx['organization']}/{repo['name']}", lazy=True
+            )
+        pushed_at = lambda repo: repo["pushed_at"]
+    elif ctx["ingest"] == "async":
+        repos, repo_names = asyncio.run(
+            load_repos_async(
+                ctx["token"],
+                ctx["organization"],
+                ctx["assignment_prefix"],
+                ctx["staff"],
+                ctx["results_files"],
+                ctx["blob_cache"],
+                api_url=ctx["api_url"],
+                concurrency=ctx["async_concurrency"],
+                select=watermarks.changed if watermarks is not None else None,
+                scheduler=ctx["scheduler"],
+                min_file_bytes=ctx["min_file_bytes"],
+                max_file_bytes=ctx["max_file_bytes"],
+                roster=ctx["roster"],
+            )
+        )
+        for repo in repos:
+            repo["git"] = ctx["git"].get_repo(
+                f"{ctx['organization']}/{repo['name']}", lazy=True
+            )
+        pushed_at = lambda repo: repo["pushed_at"]
+    elif ctx["ingest"] in ("pygithub", "mirror"):
+        if listed is None:
+            listed = list_assignment_repos(
+                ctx["git"], ctx["organization"], ctx["assignment_prefix"]
+            )
+        repo_names = [repo.name for repo in listed]
+        if watermarks is not None:
+            listed = [
+                repo
+                for repo in listed
+                if watermarks.changed(repo.name, format_timestamp(repo.pushed_at))
+            ]
+        repos = [
+            repo for repo in listed if not is_staff_repo(repo.name, ctx["staff"])
+        ]
+        stages = [
+            ("discover", lambda repo: discover_repo(ctx, repo), workers["discover"]),
+            ("list", lambda repo: list_files(ctx, repo), workers["list"]),
+        ]
+        pushed_at = lambda repo: format_timestamp(repo.pushed_at)
+    else:
+        raise ValueError(f"Unknown ingest mode: {ctx['ingest']}")
+
+    carried = []
+    if watermarks is not None:
+        # Most recently pushed repos first, so fresh submissions are scored first
+        repos.sort(key=pushed_at, reverse=True)
+        processed = {repo.name if stages else repo["name"] for repo in repos}
+        carried = watermarks.carry_forward(
+            name
+            for name in repo_names
+            if name not in processed and name in watermarks.repos
+        )
+        print(f"Incremental run: {len(repos)} changed repos, {len(carried)} unchanged")
 
-    print("Loading Repos...")
-    repos = [
-        {
+    return repos, stages, carried, repo_names
+
+
+def discover_repo(ctx, repo):
+    """Pipeline stage building the record of a listed repo, with its members."""
+    journal = ctx["journal"]
+    pushed_at = format_timestamp(repo.pushed_at)
+    member = journal.members(repo.name, pushed_at) if journal is not None else None
+    if member is not None:
+        return {
             "git": repo,
             "name": repo.name,
-            "member": sorted(
-                [c.login for c in repo.get_collaborators() if c.login not in STAFF]
-            ),
+            "member": member,
+            "pushed_at": pushed_at,
         }
-        for repo in org.get_repos()
-        if repo.name.startswith(REPO_ASSIGNMENT_PREFIX)
-    ]
 
-    repos = [
-        repo for repo in repos if not any(staff in repo["name"] for staff in STAFF)
-    ]
+    record = repo_record(repo, ctx["staff"], ctx["roster"])
+    if journal is not None:
+        journal.record_members(record)
+    return record
 
-    # Extract results
-    for repo in tqdm(repos, desc="Finding files"):
-        try:
-            res_files = repo["git"].get_contents("results")
-        except Exception:
-            print(f"Issue: results folder not found for {repo['name']}")
-            res_files = []
-            continue
 
-        repo["files"] = {
-            result_file.name: result_file
-            for result_file in res_files
-            if any(result_file.name.endswith(suffix) for suffix in RESULTS_FILES)
-        }
+def list_files(ctx, repo):
+    """Pipeline stage listing the results files of a repo record."""
+    journal = ctx["journal"]
+    listed = journal.files(repo["name"], repo["pushed_at"]) if journal else None
+    if listed is not None:
+        repo["head"], repo["files"] = listed
+        return repo
 
-    # Download and compute scores
-    leaderboards = []
-    for repo in tqdm(repos, desc="Downloading files"):
-        repo["results"] = {}
-        # Add a placeholder for missing files
-        if not repo["files"]:
-            error_entry = {
-                "Member": ", ".join(repo["member"]) if repo["member"] else "Unknown",
-                "Method": "N/A",
-                "Score": -float("inf"),
-                "leaderboard": "default",
-                "Error": "Missing results files",
-            }
-            leaderboards.append([error_entry])
-            continue
+    if ctx["mirror"] is not None:
+        mirror_repo(ctx, repo)
+    else:
+        files = find_results_files(repo, ctx["results_files"])
+        if files is None:
+            # Scored as missing for now, but not recorded as done
+            repo["retry"] = True
+        repo["files"] = files or {}
+    if journal is not None and not repo.get("retry"):
+        journal.record_files(repo)
+    return repo
+
+
+def mirror_repo(ctx, repo):
+    """Syncs the local mirror of a repo record and lists its results files from it."""
+    repo["head"], files = ctx["mirror"].results_files(
+        ctx["organization"], repo["name"], ctx["results_files"]
+    )
+    if repo["head"] is None:
+        # The mirror could not be synced
+        repo["retry"] = True
+    elif files is None:
+        print(f"Issue: results folder not found for {repo['name']}")
+    repo["files"] = files or {}
+
+
+def load_repo(ctx, name):
+    """Fetches the record of a single assignment repo, with its members and results files.
 
-        # Find results and compute scores
-        for file_name, path in repo["files"].items():
-            content_encoded = repo["git"].get_git_blob(path.sha).content
-            content = base64.b64decode(content_encoded).decode("utf-8")
-            data = pd.read_csv(StringIO(content))
+    Inputs:
+        ctx (dict): The run context from `load_context`.
+        name (str): The repository name.
+
+    Returns:
+        dict: The repo record, or None if the repo belongs to staff.
+    """
+    if is_staff_repo(name, ctx["staff"]):
+        return None
+
+    return list_files(ctx, discover_repo(ctx, ctx["org"].get_repo(name)))
+
+
+def _blob_fetcher(ctx, repo):
+    return lambda sha: stream_blob(
+        ctx["raw_session"],
+        ctx["api_url"],
+        f"{ctx['organization']}/{repo['name']}",
+        sha,
+    )
+
+
+def open_results_file(ctx, repo, sha):
+    """Opens a results file from the mirror or the blob cache, downloading it if needed."""
+    if ctx["mirror"] is not None:
+        return ctx["mirror"].open_blob(ctx["organization"], repo["name"], sha)
+    # Usually already prefetched by `download_repo`
+    content = ctx["blob_cache"].open(sha)
+    if content is None:
+        content = ctx["blob_cache"].open_or_fetch(sha, _blob_fetcher(ctx, repo))
+    return content
+
+
+def download_repo(ctx, repo):
+    """Pipeline stage prefetching the results files that still need scoring."""
+    if ctx["mirror"] is not None:
+        return repo
+
+    score_cache = ctx["score_cache"]
+    for file_name, path in repo["files"].items():
+        if not score_cache.has(
+            score_cache.key(file_name, path.sha, repo["member"])
+        ) and is_downloadable(path, ctx["min_file_bytes"], ctx["max_file_bytes"]):
+            try:
+                ctx["blob_cache"].prefetch(path.sha, _blob_fetcher(ctx, repo))
+            except OSError as e:
+                # `score_repo` downloads it again, or marks the repo for retry
+                print(f"Issue: could not prefetch {file_name} for {repo['name']}: {e}")
+    return repo
+
+
+def read_results_file(ctx, repo, file_name, sha):
+    """Parses a results file, or returns None if it is not a readable CSV.
+
+    Raises:
+        OSError, RuntimeError: If the file could not be downloaded or read from
+            the mirror.
+    """
+    content = open_results_file(ctx, repo, sha)
+    try:
+        with content as f:
+            return pd.read_csv(f, encoding="utf-8")
+    except UNREADABLE_ERRORS as e:
+        print(f"Issue: could not read {file_name} for {repo['name']}: {e}")
+        return None
+
+
+def score_repo(ctx, repo):
+    """Downloads the results files of a repo and computes its leaderboard rows.
+
+    Files whose listed size is out of bounds (see `github_utils.is_downloadable`)
+    are not downloaded; they are scored as unreadable. Files that cannot be
+    downloaded are not scored, and the repo is marked for retry.
+
+    Inputs:
+        ctx (dict): The run context from `load_context`.
+        repo (dict): A repo record with `files`. Its rows are stored under `rows`.
+
+    Returns:
+        dict: The same repo record.
+    """
+    repo["results"] = {}
+    repo["rows"] = []
+    # Add a placeholder for missing files
+    if not repo["files"]:
+        error_entry = {
+            "Member": ", ".join(repo["member"]) if repo["member"] else "Unknown",
+            "Method": "N/A",
+            "Score": -float("inf"),
+            "leaderboard": "default",
+            "Error": "Missing results files",
+        }
+        repo["rows"].append(error_entry)
+        return repo
+
+    # Find results and compute scores
+    score_cache = ctx["score_cache"]
+    for file_name, path in repo["files"].items():
+        score_key = score_cache.key(file_name, path.sha, repo["member"])
+        if score_key in score_cache:
+            score = score_cache[score_key]
+        elif not is_downloadable(
+            path, ctx["min_file_bytes"], ctx["max_file_bytes"]
+        ):
+            print(
+                f"Issue: skipping {file_name} for {repo['name']} ({path.size} bytes)"
+            )
+            repo["results"][file_name] = None
+            score = ctx["compute_scores"](
+                file_name, None, repo, ctx["test_data"].result()
+            )
+        else:
+            try:
+                data = read_results_file(ctx, repo, file_name, path.sha)
+            except (OSError, RuntimeError) as e:
+                # e.g. a failed download: not a property of the file, so not cached
+                print(
+                    f"Issue: could not load {file_name} for {repo['name']}, "
+                    f"retrying it next run: {e}"
+                )
+                repo["retry"] = True
+                continue
             repo["results"][file_name] = data
 
-            score = compute_scores(file_name, data, repo, test_data)
-            if score:
-                leaderboards.append(score)
-    flat_leaderboards = [item for sublist in leaderboards for item in sublist]
-    sorted_leaderboards = sort_scores(pd.DataFrame(flat_leaderboards))
+            score = ctx["compute_scores"](
+                file_name, data, repo, ctx["test_data"].result()
+            )
+            score_cache[score_key] = score
+            if ctx["journal"] is not None:
+                ctx["journal"].record_score(score_key, score)
+        if score:
+            repo["rows"].extend(score)
+    return repo
+
+
+def publish_leaderboards(ctx, repos, boards=None):
+    """Builds the leaderboards from the rows of all repos and commits them.
+
+    Inputs:
+        ctx (dict): The run context from `load_context`.
+        repos (list): Repo records with `rows`.
+        boards (set): Only publish these leaderboards. Publishes all if None.
+    """
+    flat_leaderboards = [row for repo in repos for row in repo["rows"]]
+    if not flat_leaderboards:
+        # e.g. a time-budgeted first run that deferred every repo
+        print("No leaderboard rows yet, nothing to publish")
+        return
+    sorted_leaderboards = ctx["sort_scores"](pd.DataFrame(flat_leaderboards))
 
     print("Updating leaderboards...")
     for name, board in sorted_leaderboards.groupby("leaderboard"):
-        # Take the worst score for each member
-        board["Score"] = board["Score"].fillna(-float("inf"))  # Fill NaN with -inf
-        board = board.loc[board.groupby(["Member", "Method"])["Score"].idxmin()]
+        if boards is not None and name not in boards:
+            continue
 
         del board["leaderboard"]
-        csv_content = board.to_csv(index=False)
-        csv_name = name + ".csv"
+        write_board(ctx, name, worst_scores(board))
 
-        if DRY_RUN:
-            Path("dry_run").mkdir(exist_ok=True)
-            with open(f"dry_run/{csv_name}", "w") as f:
-                f.write(csv_content)
-        else:
-            try:
-                leaderboard_file = leaderboard_repo.get_contents(
-                    LEADERBOARD_ASSIGNMENT_NAME + "/" + csv_name
-                )
-                leaderboard_repo.update_file(
-                    leaderboard_file.path,
-                    "Leaderboard Update",
+
+def worst_scores(board):
+    """Keeps the worst score of each member and method of a sorted board."""
+    board["Score"] = board["Score"].fillna(-float("inf"))  # Fill NaN with -inf
+    return board.loc[board.groupby(["Member", "Method"])["Score"].idxmin()]
+
+
+def write_board(ctx, name, board):
+    """Commits a leaderboard CSV to the leaderboard repo, or writes it locally on dry runs."""
+    csv_content = board.to_csv(index=False)
+    csv_name = name + ".csv"
+    leaderboard_repo = ctx["leaderboard_repo"]
+
+    if ctx["dry_run"]:
+        # Same layout as the leaderboard repo, so assignments do not collide
+        dry_run_dir = Path("dry_run") / ctx["leaderboard_dir"]
+        dry_run_dir.mkdir(parents=True, exist_ok=True)
+        with open(dry_run_dir / csv_name, "w") as f:
+            f.write(csv_content)
+    else:
+        try:
+            leaderboard_file = leaderboard_repo.get_contents(
+                ctx["leaderboard_dir"] + "/" + csv_name
+            )
+            leaderboard_repo.update_file(
+                leaderboard_file.path,
+                "Leaderboard Update",
+                csv_content,
+                leaderboard_file.sha,
+            )
+            print(f"Updated existing file: {csv_name}")
+
+        except GithubException as e:
+            # Check if the exception is a 404 (file not found)
+            if e.status == 404:
+                leaderboard_repo.create_file(
+                    ctx["leaderboard_dir"] + "/" + csv_name,
+                    "Create leaderboard",
                     csv_content,
-                    leaderboard_file.sha,
                 )
-                print(f"Updated existing file: {csv_name}")
-
-            except GithubException as e:
-                # Check if the exception is a 404 (file not found)
-                if e.status == 404:
-                    leaderboard_repo.create_file(
-                        LEADERBOARD_ASSIGNMENT_NAME + "/" + csv_name,
-                        "Create leaderboard",
-                        csv_content,
-                    )
-                    print(f"Created new file: {csv_name}")
-                else:
-                    raise
+                print(f"Created new file: {csv_name}")
+            else:
+                raise
+
+
+def published_boards(ctx):
+    """Reads the currently published leaderboards of an assignment.
+
+    On dry runs, these are the boards of the last dry run.
+
+    Returns:
+        dict: Maps board names to their DataFrames.
+    """
+    boards = {}
+    if ctx["dry_run"]:
+        for path in (Path("dry_run") / ctx["leaderboard_dir"]).glob("*.csv"):
+            boards[path.stem] = pd.read_csv(path)
+        return boards
+
+    try:
+        contents = ctx["leaderboard_repo"].get_contents(ctx["leaderboard_dir"])
+    except GithubException as e:
+        if e.status == 404:
+            return boards
+        raise
+    for content in contents:
+        if content.name.endswith(".csv"):
+            boards[content.name[: -len(".csv")]] = pd.read_csv(
+                BytesIO(content.decoded_content)
+            )
+    return boards
+
+
+def _describe(item):
+    """Returns the `(name, pushed_at, head)` of a PyGithub repo or a repo record."""
+    if isinstance(item, dict):
+        return item["name"], item["pushed_at"], item.get("head")
+    return item.name, format_timestamp(item.pushed_at), None
+
+
+def score_assignment(ctx, listed=None, budget=None):
+    """Lists, downloads and scores the repos of one assignment.
+
+    Each repo flows through the discover, list, download and score stages as
+    soon as its previous stage is done with it. Completed units are journaled,
+    so an interrupted run resumes where it stopped.
+
+    Repos are taken on in priority order (see `time_budget.prioritize`). With a
+    `budget`, whose clock starts once the repos are listed, no new repo is
+    started once it is exhausted, except the most urgent one; the repos left
+    over keep their previous rows and are deferred to the next run.
+
+    Inputs:
+        ctx (dict): The run context from `load_context`.
+        listed (list): Optional pre-listed PyGithub repos, see `list_repos`.
+        budget (TimeBudget): Optional time budget of the run.
+
+    Returns:
+        tuple: The scored repo records, the carried-forward records and the
+            names of all assignment repos.
+    """
+    if ctx["journal"] is not None and ctx["journal"].resumed:
+        print("Resuming the interrupted previous run from its journal...")
+    items, stages, carried, repo_names = list_repos(ctx, listed)
+    deferrals = ctx["deferrals"]
+    if deferrals.previous:
+        print(f"Draining {len(deferrals.previous)} repos deferred by the last run")
+    items = prioritize(items, _describe, ctx["watermarks"], deferrals)
+
+    workers = ctx["pipeline_workers"]
+    stages += [
+        ("download", lambda repo: download_repo(ctx, repo), workers["download"]),
+        ("score", lambda repo: score_repo(ctx, repo), workers["score"]),
+    ]
+    if budget is not None:
+        budget.start()
+        # The most urgent repo is started even if the budget is already spent
+        urgent = _describe(items[0])[0] if items else None
+        items = take(items, _describe, budget, deferrals)
+        name, first, first_workers = stages[0]
+
+        def first_stage(item, first=first):
+            # Items already queued when the budget ran out are not started either
+            if budget.exhausted() and _describe(item)[0] != urgent:
+                deferrals.defer(_describe(item)[0])
+                return None
+            return first(item)
+
+        stages[0] = (name, first_stage, first_workers)
+
+    repos = run_pipeline(
+        items, stages, queue_size=ctx["pipeline_queue_size"], desc="Scoring repos"
+    )
+    if deferrals.deferred:
+        print(
+            f"Time budget exhausted: {len(deferrals.deferred)} repos deferred "
+            "to the next run"
+        )
+        watermarks = ctx["watermarks"]
+        carried += watermarks.carry_forward(
+            name for name in deferrals.deferred if name in watermarks.repos
+        )
+    # Keep the listing order, so the boards do not depend on completion order
+    position = {name: index for index, name in enumerate(repo_names)}
+    repos.sort(key=lambda repo: position[repo["name"]])
+
+    print(ctx["blob_cache"].summary())
+    print(ctx["score_cache"].summary())
+    ctx["score_cache"].save()
+    if ctx["roster"] is not None:
+        print(ctx["roster"].summary())
+        ctx["roster"].save()
+    return repos, carried, repo_names
+
+
+def publish_assignment(ctx, repos, carried, repo_names):
+    """Publishes the leaderboards of a scored assignment and saves its state.
+
+    Repos whose files could not be listed keep their previous rows, if any, and
+    their watermarks are invalidated, so the next run processes them again.
+    """
+    watermarks = ctx["watermarks"]
+    for repo in repos:
+        if repo.get("retry") and repo["name"] in watermarks.repos:
+            repo["rows"] = watermarks.repos[repo["name"]]["rows"]
+    publish_leaderboards(ctx, repos + carried)
+
+    for repo in repos:
+        if repo.get("retry"):
+            watermarks.invalidate(repo["name"])
+        else:
+            watermarks.update(repo)
+    with watermarks.locked():
+        watermarks.save(repo_names)
+    ctx["deferrals"].save()
+    if ctx["journal"] is not None:
+        ctx["journal"].clear()
+
+
+def run(ctx):
+    """Runs a full leaderboard update with an already loaded context.
+
+    The leaderboards are only published once every repo is done.
+    """
+    publish_assignment(ctx, *score_assignment(ctx))
+    for summary in ctx["transport"].summary():
+        print(summary)
+
+
+def run_all(ctxs, time_budget=None):
+    """Runs the leaderboard updates of several assignments in one process.
+
+    Assignments connected to the same org with `pygithub` or `mirror` ingest
+    share a single org listing, partitioned by `assignment_prefix`. Every
+    assignment is scored before any leaderboard is published.
+
+    Inputs:
+        ctxs (list): Run contexts from `load_context`, sharing their transport.
+        time_budget (float): Optional seconds after which no new repo is
+            started; the assignments share the budget.
+
+    Returns:
+        int: The number of repos processed (the changed ones in incremental mode).
+    """
+    budget = TimeBudget(time_budget) if time_budget else None
+    listings = [None] * len(ctxs)
+    groups = {}
+    for index, ctx in enumerate(ctxs):
+        if ctx["ingest"] in ("pygithub", "mirror"):
+            groups.setdefault((id(ctx["git"]), ctx["organization"]), []).append(index)
+    for indices in groups.values():
+        if len(indices) < 2:
+            continue
+        ctx = ctxs[indices[0]]
+        print(f"Listing repos of {len(indices)} assignments at once...")
+        by_prefix = list_repos_by_prefix(
+            ctx["git"],
+            ctx["organization"],
+            {ctxs[index]["assignment_prefix"] for index in indices},
+        )
+        for index in indices:
+            listings[index] = by_prefix[ctxs[index]["assignment_prefix"]]
+
+    results = []
+    for ctx, listed in zip(ctxs, listings):
+        print(f"Scoring {ctx['leaderboard_dir']}...")
+        results.append(score_assignment(ctx, listed, budget))
+    for ctx, result in zip(ctxs, results):
+        publish_assignment(ctx, *result)
+
+    transports = {id(ctx["transport"]): ctx["transport"] for ctx in ctxs}
+    for transport in transports.values():
+        for summary in transport.summary():
+            print(summary)
+    return sum(len(repos) for repos, _, _ in results)
+
+
+def refresh_repo(ctx, name):
+    """Rescores a single repo and republishes the leaderboards its rows appear on.
+
+    The rows of all other repos come from the saved watermarks, so a full run
+    must have completed before. They are read again from disk, under the
+    watermarks lock, so rows saved by a full run since are not overwritten.
+
+    The journal of an interrupted full run is left alone: the refresh neither
+    reuses its units nor adds any.
+
+    Inputs:
+        ctx (dict): The run context from `load_context`.
+        name (str): The repository name.
+    """
+    ctx = {**ctx, "journal": None}
+    repo = load_repo(ctx, name)
+    if repo is None:
+        return
+    if repo.get("retry"):
+        print(f"Issue: not refreshing {name}, its files could not be listed")
+        return
+    score_repo(ctx, repo)
+    ctx["score_cache"].save()
+    if ctx["roster"] is not None:
+        ctx["roster"].save()
+    if repo.get("retry"):
+        print(f"Issue: not refreshing {name}, its files could not be downloaded")
+        return
+
+    watermarks = ctx["watermarks"]
+    with watermarks.locked():
+        # A full run may have saved newer rows since these were loaded
+        watermarks.reload()
+        previous = watermarks.repos.get(name, {}).get("rows", [])
+        boards = {row["leaderboard"] for row in previous + repo["rows"]}
+        watermarks.update(repo)
+
+        publish_leaderboards(ctx, watermarks.carry_forward(watermarks.repos), boards)
+        watermarks.save(watermarks.repos)
+
+
+def member_repos(ctx, login):
+    """Returns the names of the assignment repos a student is a member of.
+
+    The saved watermarks are checked first, then the repo named after the
+    login; only if neither matches are the members of every repo looked up.
+    """
+    names = [
+        name
+        for name, saved in ctx["watermarks"].repos.items()
+        if login in saved["member"]
+    ]
+    if names:
+        return names
+
+    listed = list_assignment_repos(
+        ctx["git"], ctx["organization"], ctx["assignment_prefix"]
+    )
+    for repo in listed:
+        if repo.name == ctx["assignment_prefix"] + login:
+            return [repo.name]
+
+    print(f"Looking up the members of every repo to find {login}...")
+    return [
+        repo["name"]
+        for repo in discover_repos(
+            listed,
+            ctx["staff"],
+            max_workers=ctx["discovery_workers"],
+            roster=ctx["roster"],
+        )
+        if login in repo["member"]
+    ]
+
+
+def _member_labels(member):
+    # Rows name each member on their own (A1, A2) or all of them joined (A3)
+    return set(member) | {", ".join(member), " ".join(member)} if member else set()
+
+
+def regrade_repo(ctx, name):
+    """Rescores a single repo and patches its rows into the published leaderboards.
+
+    Only the rows of the repo's members are replaced on each board; all other
+    rows are kept as published, and the worst score per member and method
+    still wins. Unlike `refresh_repo`, no saved state of a previous run is
+    needed.
+
+    The members are always fetched anew, bypassing the roster cache and the
+    journal, since a regrade often follows a change of collaborators.
+
+    Inputs:
+        ctx (dict): The run context from `load_context`.
+        name (str): The repository name.
+
+    Returns:
+        bool: True if the repo was regraded.
+    """
+    ctx = {**ctx, "journal": None}
+    if ctx["roster"] is not None:
+        ctx["roster"].invalidate(name)
+    try:
+        repo = load_repo(ctx, name)
+    except UnknownObjectException:
+        print(f"Issue: {name} not found in {ctx['organization']}")
+        return False
+    if repo is None:
+        print(f"Issue: {name} belongs to staff, not regrading it")
+        return False
+    if repo.get("retry"):
+        print(f"Issue: not regrading {name}, its files could not be listed")
+        return False
+    score_repo(ctx, repo)
+    ctx["score_cache"].save()
+    if ctx["roster"] is not None:
+        ctx["roster"].save()
+    if repo.get("retry"):
+        print(f"Issue: not regrading {name}, its files could not be downloaded")
+        return False
+
+    watermarks = ctx["watermarks"]
+    previous = watermarks.repos.get(name, {}).get("member", [])
+    labels = _member_labels(repo["member"]) | _member_labels(previous)
+    rows = pd.DataFrame(repo["rows"], columns=None if repo["rows"] else ["leaderboard"])
+    boards = published_boards(ctx)
+
+    for board_name in sorted(set(boards) | set(rows["leaderboard"])):
+        board = boards.get(board_name)
+        kept = [board[~board["Member"].isin(labels)]] if board is not None else []
+        new = rows[rows["leaderboard"] == board_name].drop(columns="leaderboard")
+        if board is not None and len(kept[0]) == len(board) and new.empty:
+            continue
+        combined = pd.concat(kept + [new], ignore_index=True)
+        print(f"Patching {board_name}: {len(new)} rows of {name}")
+        write_board(ctx, board_name, worst_scores(ctx["sort_scores"](combined)))
+
+    with watermarks.locked():
+        watermarks.reload()
+        watermarks.update(repo)
+        watermarks.save(watermarks.repos)
+    return True
+
+
+def regrade(ctxs, repo=None, member=None):
+    """Regrades one repo, or every repo of a student, in each matching assignment.
+
+    Returns:
+        bool: True if at least one repo was found and every one was regraded.
+    """
+    found = regraded = 0
+    for ctx in ctxs:
+        if repo is not None:
+            names = [repo] if repo.startswith(ctx["assignment_prefix"]) else []
+        else:
+            names = member_repos(ctx, member)
+        found += len(names)
+        for name in names:
+            print(f"Regrading {name}...")
+            regraded += regrade_repo(ctx, name)
+    for transport in {id(ctx["transport"]): ctx["transport"] for ctx in ctxs}.values():
+        for summary in transport.summary():
+            print(summary)
+
+    if not found:
+        target = repo if repo is not None else f"repos of {member}"
+        prefixes = ", ".join(ctx["assignment_prefix"] for ctx in ctxs)
+        print(f"Issue: no {target} in the assignments ({prefixes})")
+    return found > 0 and regraded == found
+
+
+def main(
+    config_paths=("config.yaml",),
+    daemon=False,
+    time_budget=None,
+    repo=None,
+    member=None,
+):
+    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"Starting leaderboard update... [Time: {current_time}]")
+
+    if isinstance(config_paths, (str, Path)):
+        config_paths = [config_paths]
+    ctxs = []
+    for config_path in config_paths:
+        ctxs.append(load_context(config_path, shared=ctxs[0] if ctxs else None))
+
+    if repo is not None or member is not None:
+        if not regrade(ctxs, repo=repo, member=member):
+            return 1
+    elif daemon:
+        leaderboard_daemon.serve(ctxs, partial(run_all, time_budget=time_budget))
+    else:
+        run_all(ctxs, time_budget=time_budget)
 
     print("Done!")
+    return 0
 
 
 if __name__ == "__main__":
@@ -194,8 +1114,41 @@ if __name__ == "__main__":
     parser.add_argument(
         "--config",
         type=str,
+        nargs="+",
         required=True,
-        help="Path to the YAML configuration file.",
+        help="Path to the YAML configuration file. Pass several to update "
+        "several assignments in one run.",
+    )
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Keep running and refresh the leaderboards on an adaptive schedule.",
+    )
+    parser.add_argument(
+        "--time-budget",
+        type=float,
+        help="Seconds after which no new repo is started. The leaderboards are "
+        "published with what was scored, and the remaining repos go first next run.",
+    )
+    regrade_target = parser.add_mutually_exclusive_group()
+    regrade_target.add_argument(
+        "--repo",
+        type=str,
+        help="Only rescore this repo and patch its rows into the published "
+        "leaderboards.",
+    )
+    regrade_target.add_argument(
+        "--member",
+        type=str,
+        help="Only rescore the repos of this GitHub login, like --repo.",
     )
     args = parser.parse_args()
-    main(args.config)
+    sys.exit(
+        main(
+            args.config,
+            daemon=args.daemon,
+            time_budget=args.time_budget,
+            repo=args.repo,
+            member=args.member,
+        )
+    )
@@ -11,4 +11,16 @@ else
     exit 1
 fi
 
-exec $CONDA_EXEC run -n $CONDA_ENV python "$SCRIPT_DIR/$LEADERBOARD_SCRIPT" --config "$SCRIPT_DIR/$CONFIG_FILE"
\ No newline at end of file
+# CONFIG_FILE may list several configs separated by spaces; they run in one process
+CONFIG_PATHS=()
+for CONFIG in $CONFIG_FILE; do
+    CONFIG_PATHS+=("$SCRIPT_DIR/$CONFIG")
+done
+
+# TIME_BUDGET (seconds) keeps a run within the cron interval
+EXTRA_ARGS=()
+if [ -n "$TIME_BUDGET" ]; then
+    EXTRA_ARGS+=(--time-budget "$TIME_BUDGET")
+fi
+
+exec $CONDA_EXEC run -n $CONDA_ENV python "$SCRIPT_DIR/$LEADERBOARD_SCRIPT" --config "${CONFIG_PATHS[@]}" "${EXTRA_ARGS[@]}"
\ No newline at end of file
@@ -0,0 +1,228 @@
+"""Runs the leaderboard updates of several courses side by side, sharing fairly.
+
+Each tenant (a course) has its own configs, GitHub credentials and weight, and
+runs in its own process. The machine's worker slots are split between tenants
+by weight, and tenants using the same token split its rate limit by weight, so
+a huge course cannot starve a small one:
+
+    python run_tenants.py --tenants tenants.yaml
+
+with a tenants file like
+
+    max_workers: 16
+    tenants:
+      - name: data-37712
+        configs: [config_a1.yaml, config_a2.yaml]
+        token_env: DATA_37712_GITHUB_TOKEN
+      - name: data-12345
+        configs: [data_12345.yaml]
+        weight: 2
+
+`username_env` / `token_env` name the environment variables holding the
+tenant's credentials (default `GITHUB_USERNAME` / `GITHUB_TOKEN`).
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import yaml
+from dotenv import load_dotenv
+
+from run_leaderboard import load_context, run_all
+
+DEFAULT_MAX_WORKERS = 16
+
+
+def apportion(weights, total):
+    """Splits `total` slots by weight into whole numbers that sum to `total`.
+
+    Every key gets its floor of the exact quota, and the slots left over go to
+    the largest remainders. Keys whose quota rounds down to nothing still get
+    one slot, taken from the largest allocations, as long as `total` allows.
+
+    Inputs:
+        weights (dict): Maps keys to positive weights.
+        total (int): The number of slots to split.
+
+    Returns:
+        dict: Maps the keys to their slots.
+    """
+    weight_sum = sum(weights.values())
+    quotas = {key: total * weight / weight_sum for key, weight in weights.items()}
+    slots = {key: int(quota) for key, quota in quotas.items()}
+    by_remainder = sorted(quotas, key=lambda key: slots[key] - quotas[key])
+    for key in by_remainder[: total - sum(slots.values())]:
+        slots[key] += 1
+    for key in weights:
+        if slots[key] == 0:
+            largest = max(slots, key=slots.get)
+            if slots[largest] < 2:
+                # Fewer slots than keys: every key still needs one
+                slots[key] = 1
+                continue
+            slots[largest] -= 1
+            slots[key] = 1
+    return slots
+
+
+def plan_shares(tenants, max_workers=DEFAULT_MAX_WORKERS):
+    """Splits the worker slots and each token's rate limit between tenants by weight.
+
+    Inputs:
+        tenants (list): Tenant dicts with `name`, `token` and optional `weight`.
+        max_workers (int): Worker slots of the whole machine.
+
+    Returns:
+        dict: Maps tenant names to `(slots, share)`, where `share` is the
+            fraction of its token's rate limit. The slots add up to
+            `max_workers`, unless there are more tenants than slots, in which
+            case every tenant gets one.
+    """
+    weight = lambda tenant: tenant.get("weight", 1)
+    token_totals = {}
+    for tenant in tenants:
+        token = tenant["token"]
+        token_totals[token] = token_totals.get(token, 0) + weight(tenant)
+    weights = {tenant["name"]: weight(tenant) for tenant in tenants}
+    slots = apportion(weights, max_workers)
+    return {
+        tenant["name"]: (
+            slots[tenant["name"]],
+            weight(tenant) / token_totals[tenant["token"]],
+        )
+        for tenant in tenants
+    }
+
+
+def split_slots(workers, slots):
+    """Caps the pipeline stages of a tenant so their threads add up to `slots`.
+
+    The stages run at the same time, so each one gets a part of the slots in
+    proportion to its configured workers (at least one thread per stage).
+
+    Inputs:
+        workers (dict): Maps the pipeline stages to their configured workers.
+        slots (int): The tenant's worker slots.
+
+    Returns:
+        dict: Maps the stages to their capped workers.
+    """
+    if sum(workers.values()) <= slots:
+        return dict(workers)
+    return apportion(workers, slots)
+
+
+def run_tenant(name, config_paths, username, token, slots, share, time_budget=None):
+    """Runs the update of one tenant within its slots and rate limit share.
+
+    Runs in a process of its own, so tenants keep separate transports and caches.
+
+    Returns:
+        dict: The tenant's usage: requests sent, waits for its share, throttled
+            requests, repos processed and wall time.
+    """
+    # Credentials are read from the environment by `load_context`
+    os.environ["GITHUB_USERNAME"], os.environ["GITHUB_TOKEN"] = username, token
+
+    started = time.monotonic()
+    ctxs = []
+    for config_path in config_paths:
+        ctxs.append(load_context(config_path, shared=ctxs[0] if ctxs else None))
+
+    schedulers = {
+        id(ctx["scheduler"]): ctx["scheduler"]
+        for ctx in ctxs
+        if ctx["scheduler"] is not None
+    }
+    for scheduler in schedulers.values():
+        scheduler.share = share
+        scheduler.max_concurrency = min(scheduler.max_concurrency, slots)
+        scheduler.limit = min(scheduler.limit, slots)
+    for ctx in ctxs:
+        # The assignments are scored one after the other, so each may use all slots
+        ctx["pipeline_workers"] = split_slots(ctx["pipeline_workers"], slots)
+        ctx["discovery_workers"] = min(ctx["discovery_workers"], slots)
+        ctx["async_concurrency"] = min(ctx["async_concurrency"], slots)
+
+    processed = run_all(ctxs, time_budget=time_budget)
+    return {
+        "name": name,
+        "requests": sum(s.requests for s in schedulers.values()),
+        "share_waits": sum(s.share_waits for s in schedulers.values()),
+        "throttled": sum(s.throttled for s in schedulers.values()),
+        "repos": processed,
+        "seconds": time.monotonic() - started,
+    }
+
+
+def main(tenants_path, time_budget=None):
+    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"Starting multi-tenant leaderboard update... [Time: {current_time}]")
+
+    load_dotenv()
+    with open(tenants_path, "r") as tenants_file:
+        config = yaml.safe_load(tenants_file)
+
+    tenants = []
+    for tenant in config["tenants"]:
+        username = os.getenv(tenant.get("username_env", "GITHUB_USERNAME"))
+        token = os.getenv(tenant.get("token_env", "GITHUB_TOKEN"))
+        if not username or not token:
+            raise ValueError(f"GitHub credentials of tenant {tenant['name']} not set.")
+        tenants.append({**tenant, "username": username, "token": token})
+    shares = plan_shares(tenants, config.get("max_workers", DEFAULT_MAX_WORKERS))
+
+    usage = []
+    # Spawned, so no tenant inherits another one's transport or threads
+    with ProcessPoolExecutor(
+        max_workers=len(tenants), mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        futures = {
+            tenant["name"]: executor.submit(
+                run_tenant,
+                tenant["name"],
+                tenant["configs"],
+                tenant["username"],
+                tenant["token"],
+                *shares[tenant["name"]],
+                time_budget,
+            )
+            for tenant in tenants
+        }
+        for name, future in futures.items():
+            try:
+                usage.append(future.result())
+            except Exception as e:
+                print(f"Issue: tenant {name} failed: {e}")
+
+    print("Tenant usage:")
+    for tenant in usage:
+        slots, share = shares[tenant["name"]]
+        print(
+            f"  {tenant['name']}: {tenant['requests']} requests "
+            f"({share:.0%} share of its token, {tenant['share_waits']} waits, "
+            f"{tenant['throttled']} throttled), {slots} worker slots, "
+            f"{tenant['repos']} repos in {tenant['seconds']:.0f}s"
+        )
+    print("Done!")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run multi-tenant leaderboard update")
+    parser.add_argument(
+        "--tenants",
+        type=str,
+        required=True,
+        help="Path to the YAML file listing the tenants and their configs.",
+    )
+    parser.add_argument(
+        "--time-budget",
+        type=float,
+        help="Seconds after which no tenant starts a new repo.",
+    )
+    args = parser.parse_args()
+    main(args.tenants, time_budget=args.time_budget)
@@ -0,0 +1,97 @@
+import hashlib
+import importlib.util
+import json
+import threading
+from pathlib import Path
+
+
+def hash_directory(directory):
+    """Returns a SHA-256 over the relative paths and contents of every file in a directory."""
+    directory = Path(directory)
+    digest = hashlib.sha256()
+    for path in sorted(p for p in directory.rglob("*") if p.is_file()):
+        digest.update(str(path.relative_to(directory)).encode("utf-8"))
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def hash_module_source(module_name):
+    """Returns a SHA-256 of the source file of an importable module."""
+    origin = importlib.util.find_spec(module_name).origin
+    return hashlib.sha256(Path(origin).read_bytes()).hexdigest()
+
+
+class ScoreCache:
+    """Persistent memo of `compute_scores` results.
+
+    An entry is keyed by the results file name, its git blob SHA and the repo
+    members, combined with a hash of the held-out test data and a hash of the
+    scoring module's source. Changing either the test data or the scorer
+    therefore invalidates every entry. Failed scores (None scores with an error
+    comment, or a None result) are cached like any other result.
+
+    Inputs:
+        path (Path): JSON file the cache is loaded from and saved to.
+        test_data_hash (str): See `hash_directory`.
+        scorer_hash (str): See `hash_module_source`.
+    """
+
+    def __init__(self, path, test_data_hash, scorer_hash):
+        self.path = Path(path)
+        self.version = hashlib.sha256(
+            f"{test_data_hash}:{scorer_hash}".encode("utf-8")
+        ).hexdigest()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = {}
+
+        try:
+            with open(self.path, "r") as f:
+                saved = json.load(f)
+            if saved.get("version") == self.version:
+                self._entries = saved["entries"]
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    def key(self, file_name, sha, members):
+        """Returns the cache key of a results file."""
+        payload = json.dumps([file_name, sha, list(members)])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def __contains__(self, key):
+        with self._lock:
+            found = key in self._entries
+            if found:
+                self.hits += 1
+            return found
+
+    def restore(self, entries):
+        """Adds previously computed entries, e.g. from an interrupted run's journal."""
+        with self._lock:
+            self._entries.update(entries)
+
+    def has(self, key):
+        """Returns True if `key` is cached, without counting it as a hit."""
+        with self._lock:
+            return key in self._entries
+
+    def __getitem__(self, key):
+        return self._entries[key]
+
+    def __setitem__(self, key, score):
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = score
+
+    def save(self):
+        """Writes the cache back to disk."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"version": self.version, "entries": self._entries}, f)
+        tmp_path.replace(self.path)
+
+    def summary(self):
+        """Returns a one-line description of this run's cache usage."""
+        return f"Score cache: {self.hits} hits, {self.misses} files scored"
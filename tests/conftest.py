@@ -0,0 +1,61 @@
+from types import SimpleNamespace
+
+import pytest
+import yaml
+
+from benchmarks.fake_github import FakeOrg, serve
+from benchmarks.scale_benchmark import CONFIGS, write_config
+from benchmarks.synthetic_org import Assignment1, generate_org
+
+ORG = "UChi-CI"
+
+
+@pytest.fixture
+def fake_org(tmp_path):
+    """An empty fake org; add repos with `add_repo` before serving it."""
+    return FakeOrg(ORG, tmp_path / "blobs")
+
+
+@pytest.fixture
+def serve_org():
+    """Serves a `FakeOrg` on a free local port, with `fake_github.serve` options."""
+    servers = []
+
+    def start(org, **kwargs):
+        servers.append(serve(org, **kwargs))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def served_assignment(tmp_path, serve_org, monkeypatch):
+    """A small synthetic A1 org, served, with a config pointing the runner at it.
+
+    Returns a factory taking the number of repos and `write_config` overrides,
+    which returns `(config_path, org, server)`.
+    """
+    monkeypatch.setenv("GITHUB_USERNAME", "ta-bench")
+    monkeypatch.setenv("GITHUB_TOKEN", "token")
+
+    def start(repos=3, **config):
+        assignment = Assignment1(scale=0.02)
+        with open(CONFIGS[assignment.assignment], "r") as config_file:
+            prefix = yaml.safe_load(config_file)["github"]["assignment_prefix"]
+        org = generate_org(
+            assignment, repos, prefix, tmp_path / "blobs", broken_share=0
+        )
+        server = serve_org(org)
+        options = SimpleNamespace(ingest=config.pop("ingest", "pygithub"))
+        config_path = write_config(assignment, tmp_path, server.url, options)
+        if config:
+            with open(config_path, "r") as config_file:
+                merged = {**yaml.safe_load(config_file), **config}
+            with open(config_path, "w") as config_file:
+                yaml.safe_dump(merged, config_file)
+        return config_path, org, server
+
+    return start
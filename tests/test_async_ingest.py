@@ -0,0 +1,77 @@
+import asyncio
+
+from github import Auth, Github
+
+from async_ingest import load_repos_async
+from benchmarks.fake_github import blob_sha
+from blob_cache import BlobCache
+from github_utils import find_results_files
+from rate_limit import RateLimitScheduler
+
+PREFIX = "assignment-1-"
+
+
+def test_blobs_are_streamed_into_the_cache(tmp_path, fake_org, serve_org):
+    big = b"id,label\n" + b"12345,1\n" * 200_000
+    fake_org.add_repo(PREFIX + "alice", ["alice"], {"results/a.csv": big})
+    fake_org.add_repo(PREFIX + "bob", ["bob"], {"results/a.csv": big + b"9,0\n"})
+    server = serve_org(fake_org, error_rate=0.2, seed=3)
+    blob_cache = BlobCache(tmp_path / "blobs")
+
+    repos, names = asyncio.run(
+        load_repos_async(
+            "token",
+            fake_org.name,
+            PREFIX,
+            set(),
+            [".csv"],
+            blob_cache,
+            api_url=server.url,
+            scheduler=RateLimitScheduler(),
+        )
+    )
+    assert sorted(names) == [PREFIX + "alice", PREFIX + "bob"]
+    for repo in repos:
+        entry = repo["files"]["a.csv"]
+        assert blob_cache.get(entry.sha) == fake_org.blob(entry.sha)
+    assert not list((tmp_path / "blobs").glob("*/*.tmp"))
+
+
+def test_failed_repos_are_retried_like_the_pygithub_ingest(
+    tmp_path, fake_org, serve_org
+):
+    data = b"id,label\n" + b"1,1\n" * 100
+    lost = b"id,label\n" + b"2,0\n" * 100
+    fake_org.add_repo(PREFIX + "alice", ["alice"], {"results/a.csv": data})
+    fake_org.add_repo(PREFIX + "bob", ["bob"], {"README.md": b"# bob\n"})
+    fake_org.add_repo(PREFIX + "carol", ["carol"], {})
+    fake_org.add_repo(PREFIX + "dave", ["dave"], {"results/a.csv": lost})
+    # The blob of dave's results file can no longer be downloaded
+    (fake_org.directory / blob_sha(lost)).unlink()
+    server = serve_org(fake_org)
+
+    repos, _ = asyncio.run(
+        load_repos_async(
+            "token",
+            fake_org.name,
+            PREFIX,
+            set(),
+            [".csv"],
+            BlobCache(tmp_path / "blobs"),
+            api_url=server.url,
+        )
+    )
+    repos = {repo["name"]: repo for repo in repos}
+    # An empty repo has no results files, like a repo without the folder
+    for name in ("alice", "bob", "carol"):
+        assert not repos[PREFIX + name].get("retry")
+    assert repos[PREFIX + "carol"]["files"] == {}
+    assert repos[PREFIX + "dave"]["retry"]
+    assert repos[PREFIX + "dave"]["member"] == ["dave"]
+    assert repos[PREFIX + "dave"]["files"] == {}
+
+    git = Github(auth=Auth.Token("token"), base_url=server.url)
+    for name in ("alice", "bob", "carol"):
+        record = {"git": git.get_repo(f"{fake_org.name}/{PREFIX}{name}")}
+        record["name"] = PREFIX + name
+        assert find_results_files(record, [".csv"]) == repos[PREFIX + name]["files"]
@@ -0,0 +1,55 @@
+import os
+import threading
+
+from blob_cache import BlobCache
+
+
+def fetcher(blobs, calls):
+    def fetch(sha):
+        calls.append(sha)
+        data = blobs[sha]
+        return (data[i : i + 1000] for i in range(0, len(data), 1000))
+
+    return fetch
+
+
+def test_blob_too_large_to_cache_is_streamed(tmp_path):
+    blobs = {"small": b"a" * 100, "huge": os.urandom(50_000)}
+    calls = []
+    cache = BlobCache(tmp_path, max_bytes=10_000)
+    fetch = fetcher(blobs, calls)
+    with cache.open_or_fetch("small", fetch) as f:
+        assert f.read() == blobs["small"]
+
+    with cache.open_or_fetch("huge", fetch) as f:
+        assert f.read() == blobs["huge"]
+    # Not stored, and the cached blobs were not evicted for it
+    assert "huge" not in cache and "small" in cache
+    assert not list(tmp_path.glob("*/*.tmp"))
+
+    cache.prefetch("huge", fetch)
+    assert calls == ["small", "huge"]
+    with cache.open_or_fetch("huge", fetch) as f:
+        assert f.read() == blobs["huge"]
+    assert calls == ["small", "huge", "huge"]
+
+
+def test_fetch_locks_are_released(tmp_path):
+    blobs = {f"sha-{i}": b"x" * i for i in range(50)}
+    calls = []
+    cache = BlobCache(tmp_path)
+    fetch = fetcher(blobs, calls)
+
+    def read_all():
+        for sha in blobs:
+            with cache.open_or_fetch(sha, fetch) as f:
+                assert f.read() == blobs[sha]
+
+    threads = [threading.Thread(target=read_all) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Each blob was downloaded once, and no lock is left behind
+    assert sorted(calls) == sorted(blobs)
+    assert cache._fetch_locks == {}
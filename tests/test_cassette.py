@@ -0,0 +1,58 @@
+import shutil
+from pathlib import Path
+
+import yaml
+
+from cassette import Cassette
+from http_cache import ConditionalCache
+from run_leaderboard import load_context, run_all
+
+
+def use_caches(config_path, directory, cassette, http_cache=None):
+    with open(config_path, "r") as config_file:
+        config = yaml.safe_load(config_file)
+    for name in ("blob_cache", "score_cache", "state", "roster"):
+        config[name] = {"directory": str(directory / name)}
+    config["http_cache"] = {"directory": str(http_cache or directory / "http")}
+    config["cassette"] = cassette
+    with open(config_path, "w") as config_file:
+        yaml.safe_dump(config, config_file)
+
+
+def update(config_path):
+    """Runs an update and returns its boards and its cassette and HTTP cache layers."""
+    ctx = load_context(config_path)
+    run_all([ctx])
+    # Dry runs write the boards below the working directory
+    directory = Path("dry_run") / ctx["leaderboard_dir"]
+    boards = {path.name: path.read_text() for path in directory.glob("*.csv")}
+    shutil.rmtree("dry_run")
+    layers = {type(layer): layer for layer in ctx["transport"].layers}
+    return boards, layers[Cassette], layers[ConditionalCache]
+
+
+def test_replay_matches_the_recorded_run(tmp_path, served_assignment, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path = str(tmp_path / "github.jsonl")
+    config_path, _, server = served_assignment(dry_run=True)
+    use_caches(config_path, tmp_path / "record", {"path": path, "mode": "record"})
+    recorded, cassette, _ = update(config_path)
+    assert recorded
+    assert cassette.requests > 0
+    server.shutdown()
+    server.server_close()
+
+    # Offline, with fresh caches: every request is in the cassette
+    replay = {"path": path, "mode": "replay"}
+    use_caches(config_path, tmp_path / "replay", replay)
+    replayed, cassette, http_cache = update(config_path)
+    assert replayed == recorded
+    assert cassette.misses == 0
+    assert http_cache.hits == 0
+
+    # With the HTTP cache warm, its conditional requests are answered with 304s
+    use_caches(config_path, tmp_path / "warm", replay, tmp_path / "replay" / "http")
+    replayed, cassette, http_cache = update(config_path)
+    assert replayed == recorded
+    assert cassette.misses == 0
+    assert http_cache.hits > 0
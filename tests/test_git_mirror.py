@@ -0,0 +1,55 @@
+import subprocess
+
+from git_mirror import GitMirror
+
+ORG = "UChi-CI"
+CONTENT = b"id,label\n" + b"0,1\n" * 100
+
+
+def git(*args, cwd):
+    subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True)
+
+
+def make_remote(tmp_path, name="assignment-1-alice"):
+    work = tmp_path / "work"
+    (work / "results").mkdir(parents=True)
+    (work / "results" / "mlp_predictions.csv").write_bytes(CONTENT)
+    git("init", "--quiet", "--initial-branch=main", cwd=work)
+    git("add", ".", cwd=work)
+    git("-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "x", cwd=work)
+    remote = tmp_path / "remote"
+    bare = remote / ORG / f"{name}.git"
+    bare.parent.mkdir(parents=True)
+    git("clone", "--quiet", "--bare", str(work), str(bare), cwd=tmp_path)
+    # Partial clones need the remote to serve filters and single blobs
+    git("config", "uploadpack.allowFilter", "true", cwd=bare)
+    git("config", "uploadpack.allowAnySHA1InWant", "true", cwd=bare)
+    return f"file://{remote}", name
+
+
+def test_results_files_are_fetched_with_their_sizes(tmp_path):
+    remote_url, name = make_remote(tmp_path)
+    mirror = GitMirror(tmp_path / "mirrors", remote_url)
+    head, files = mirror.results_files(ORG, name, [".csv"])
+    assert head is not None
+    assert files["mlp_predictions.csv"].size == len(CONTENT)
+    sha = files["mlp_predictions.csv"].sha
+    with mirror.open_blob(ORG, name, sha) as f:
+        assert f.read() == CONTENT
+
+
+def test_failed_blob_fetch_is_reported_for_the_repo(tmp_path, capsys):
+    remote_url, name = make_remote(tmp_path)
+    mirror = GitMirror(tmp_path / "mirrors", remote_url)
+    run = mirror._git
+
+    def failing_fetch(path, *args, input=None):
+        if "fetch.negotiationAlgorithm=noop" in args:
+            raise subprocess.CalledProcessError(128, "git", stderr=b"fatal: gone")
+        return run(path, *args, input=input)
+
+    mirror._git = failing_fetch
+    assert mirror.results_files(ORG, name, [".csv"]) == (None, None)
+    assert f"Issue: could not fetch the results files of {name}: fatal: gone" in (
+        capsys.readouterr().out
+    )
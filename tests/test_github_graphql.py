@@ -0,0 +1,47 @@
+from benchmarks.fake_github import GRAPHQL_PATH, blob_sha
+from github_graphql import GraphQLClient, load_repos_graphql
+from run_leaderboard import build_transport, load_context, run_all
+
+PREFIX = "assignment-1-"
+RESULTS = b"id,label\n" + b"0,1\n" * 100
+
+
+def test_search_and_collaborator_pagination(tmp_path, fake_org, serve_org):
+    team = [f"student-{i:03d}" for i in range(150)]
+    fake_org.add_repo(PREFIX + "team", team + ["ta"], {"results/a.csv": RESULTS})
+    for name in ("alice", "bob", "carol"):
+        fake_org.add_repo(
+            PREFIX + name,
+            [name, "ta"],
+            {"results/a.csv": RESULTS + name.encode(), "results/old/b.csv": RESULTS},
+        )
+    fake_org.add_repo(PREFIX + "dave", ["dave"], {"README.md": b"# dave"})
+    fake_org.add_repo("other-repo", ["erin"], {"results/a.csv": RESULTS})
+    server = serve_org(fake_org)
+    transport, _ = build_transport(
+        {"enabled": False}, tmp_path / "http", {}, {}, pool_size=4
+    )
+    client = GraphQLClient("token", server.url + GRAPHQL_PATH, transport=transport)
+
+    repos = load_repos_graphql(
+        client, fake_org.name, PREFIX, {"ta"}, [".csv"], page_size=2
+    )
+    by_name = {repo["name"]: repo for repo in repos}
+    students = ("team", "alice", "bob", "carol", "dave")
+    assert sorted(by_name) == sorted(PREFIX + name for name in students)
+    assert by_name[PREFIX + "team"]["member"] == team
+    assert by_name[PREFIX + "alice"]["member"] == ["alice"]
+    alice = by_name[PREFIX + "alice"]["files"]
+    assert list(alice) == ["a.csv"]
+    assert alice["a.csv"].sha == blob_sha(RESULTS + b"alice")
+    assert alice["a.csv"].size == len(RESULTS) + len("alice")
+    assert by_name[PREFIX + "dave"]["files"] == {}
+    # Three search pages of two repos, plus a second page of the team's collaborators
+    assert server.calls["graphql"] == 4
+
+
+def test_graphql_ingest_run(served_assignment):
+    config_path, org, server = served_assignment(ingest="graphql")
+    assert run_all([load_context(config_path)]) == len(org.repos)
+    assert server.calls["graphql"] >= 1
+    assert "assignment-1-leaderboard/leaderboard_newsgroups.csv" in org.written
@@ -0,0 +1,60 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from github_transport import Transport, mount
+from hedging import HedgedRequests
+
+
+class TricklingHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        chunks = 20
+        self.send_response(200)
+        self.send_header("Content-Length", str(chunks))
+        self.end_headers()
+        for _ in range(chunks):
+            self.wfile.write(b"x")
+            self.wfile.flush()
+            time.sleep(0.05)
+
+
+@pytest.fixture
+def trickling_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), TricklingHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/blob"
+    server.shutdown()
+    server.server_close()
+
+
+def session(layer):
+    return mount(requests.Session(), Transport([layer]))
+
+
+@pytest.mark.parametrize("hedge", [False, True])
+def test_streamed_body_is_bounded(trickling_url, hedge):
+    layer = HedgedRequests(body_deadline=0.3, hedge=hedge)
+    with session(layer).get(trickling_url, stream=True, timeout=5) as response:
+        with pytest.raises(requests.Timeout):
+            for _ in response.iter_content(1):
+                pass
+    assert layer.deadline_misses == 1
+
+
+def test_no_worker_thread_without_hedging(trickling_url, monkeypatch):
+    def start(*args):
+        raise AssertionError("a worker thread was started")
+
+    layer = HedgedRequests(body_deadline=5)
+    monkeypatch.setattr(layer, "_start", start)
+    assert session(layer).get(trickling_url, timeout=5).content == b"x" * 20
+    assert layer.deadline_misses == 0
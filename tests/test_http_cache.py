@@ -0,0 +1,30 @@
+from github_utils import raw_session
+from http_cache import ConditionalCache
+from github_transport import Transport
+
+
+def test_least_recently_used_responses_are_evicted(tmp_path, fake_org, serve_org):
+    for name in ("a", "b", "c"):
+        fake_org.add_repo(name, ["alice"], {"README.md": b"# readme\n"})
+    server = serve_org(fake_org)
+
+    def get(cache, name):
+        session = raw_session("token", Transport([cache]))
+        response = session.get(f"{server.url}/repos/UChi-CI/{name}")
+        assert response.status_code == 200
+
+    cache = ConditionalCache(tmp_path / "http")
+    get(cache, "a")
+    entry_size = cache._size
+    # Room for two entries
+    cache = ConditionalCache(tmp_path / "http", max_bytes=int(entry_size * 2.5))
+    get(cache, "b")
+    get(cache, "a")
+    assert cache.hits == 1
+    get(cache, "c")
+
+    assert len(list((tmp_path / "http").glob("*.json"))) == 2
+    assert cache._size <= cache.max_bytes
+    get(cache, "a")
+    get(cache, "b")
+    assert cache.hits == 2
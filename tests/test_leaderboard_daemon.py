@@ -0,0 +1,85 @@
+import threading
+from datetime import datetime, timedelta, timezone
+
+from leaderboard_daemon import LeaderboardDaemon, RefreshPolicy, parse_deadline
+
+NOW = datetime(2025, 2, 1, 12, tzinfo=timezone.utc)
+
+
+def test_interval_backs_off_and_speeds_up():
+    policy = RefreshPolicy(min_interval=60, max_interval=600)
+    assert [policy.next_interval(0, NOW) for _ in range(5)] == [120, 240, 480, 600, 600]
+    assert policy.next_interval(3, NOW) == 300
+    assert policy.next_interval(1, NOW) == 150
+    assert [policy.next_interval(1, NOW) for _ in range(2)] == [75, 60]
+
+
+def test_refreshes_run_fast_around_a_deadline():
+    deadline = NOW + timedelta(hours=2)
+    policy = RefreshPolicy(
+        [deadline], 60, 1800, window=timedelta(hours=1), grace=timedelta(hours=1)
+    )
+    for _ in range(5):
+        policy.next_interval(0, NOW)
+    # The long sleep ends when the window opens, an hour from now
+    assert policy.next_interval(0, NOW) == 1800
+    assert policy.next_interval(0, NOW + timedelta(minutes=50)) == 600
+    for minutes in (60, 120, 179):
+        assert policy.next_interval(0, NOW + timedelta(minutes=minutes)) == 60
+    assert policy.next_interval(0, NOW + timedelta(minutes=181)) == 1800
+
+
+def test_parse_deadline():
+    assert parse_deadline(None) is None
+    assert parse_deadline("2025-02-01T12:00:00+00:00") == NOW
+    assert parse_deadline(NOW) == NOW
+    assert parse_deadline("2025-02-01T12:00:00").tzinfo is not None
+
+
+class Policy:
+    def __init__(self):
+        self.changed = []
+
+    def next_interval(self, changed):
+        self.changed.append(changed)
+        return 60
+
+
+def test_triggers_during_a_refresh_are_coalesced():
+    started, release = threading.Event(), threading.Event()
+    refreshes = []
+
+    def refresh():
+        refreshes.append(len(refreshes))
+        if len(refreshes) == 1:
+            started.set()
+            release.wait(5)
+        elif len(refreshes) == 2:
+            daemon.stop()
+        return 2
+
+    policy = Policy()
+    daemon = LeaderboardDaemon(refresh, policy)
+    thread = threading.Thread(target=daemon.run_forever, daemon=True)
+    thread.start()
+    assert started.wait(5)
+    for _ in range(3):
+        daemon.trigger()
+    release.set()
+    thread.join(5)
+
+    assert not thread.is_alive()
+    assert refreshes == [0, 1]
+    assert policy.changed == [2, 2]
+
+
+def test_failed_refresh_counts_as_unchanged():
+    policy = Policy()
+
+    def refresh():
+        daemon.stop()
+        raise RuntimeError("GitHub is down")
+
+    daemon = LeaderboardDaemon(refresh, policy)
+    daemon.run_forever()
+    assert policy.changed == [0]
@@ -0,0 +1,61 @@
+import itertools
+import threading
+import time
+
+import pytest
+
+from pipeline import run_pipeline
+
+
+def finish(function, timeout=10):
+    """Runs `function()` in a thread and returns its outcome, failing if it hangs."""
+    outcome = {}
+
+    def target():
+        try:
+            outcome["result"] = function()
+        except Exception as e:
+            outcome["error"] = e
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "the pipeline hung"
+    return outcome
+
+
+def test_items_flow_through_every_stage():
+    stages = [
+        ("double", lambda item: item * 2, 2),
+        ("odd", lambda item: item if item % 4 else None, 3),
+    ]
+    results = run_pipeline(range(100), stages, queue_size=2)
+    assert sorted(results) == [item * 2 for item in range(100) if item % 2]
+
+
+def test_middle_stage_error_is_raised_without_hanging():
+    def fail(item):
+        if item == 3:
+            raise ValueError("bad item")
+        return item
+
+    def slow(item):
+        time.sleep(0.001)
+        return item
+
+    # An endless source and full queues: every upstream thread is blocked
+    # on a put when the middle stage fails
+    stages = [("first", slow, 2), ("middle", fail, 1), ("last", slow, 2)]
+    outcome = finish(lambda: run_pipeline(itertools.count(), stages, queue_size=1))
+    assert isinstance(outcome["error"], ValueError)
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_source_error_is_raised(workers):
+    def source():
+        yield from range(10)
+        raise KeyError("listing failed")
+
+    stages = [("identity", lambda item: item, workers)]
+    outcome = finish(lambda: run_pipeline(source(), stages, queue_size=1))
+    assert isinstance(outcome["error"], KeyError)
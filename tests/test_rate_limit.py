@@ -0,0 +1,73 @@
+import time
+from types import SimpleNamespace
+
+from rate_limit import RateLimitScheduler, request_resource
+
+
+def limit_headers(resource, limit, remaining, reset_in):
+    return {
+        "X-RateLimit-Resource": resource,
+        "X-RateLimit-Limit": str(limit),
+        "X-RateLimit-Remaining": str(remaining),
+        "X-RateLimit-Reset": str(int(time.time() + reset_in)),
+    }
+
+
+def send(scheduler, resource, headers):
+    assert scheduler.try_acquire(resource) == 0
+    return scheduler.release(200, headers, resource=resource)
+
+
+def test_request_resource():
+    assert request_resource("https://api.github.com/search/repositories") == "search"
+    assert request_resource("https://api.github.com/graphql") == "graphql"
+    assert request_resource("https://api.github.com/repos/o/r/git/blobs/1") == "core"
+
+
+def test_low_search_budget_does_not_pace_core_requests():
+    scheduler = RateLimitScheduler()
+    send(scheduler, "core", limit_headers("core", 5000, 4000, 3600))
+    send(scheduler, "search", limit_headers("search", 30, 3, 60))
+    send(scheduler, "search", limit_headers("search", 30, 2, 60))
+
+    assert scheduler.bucket("core").remaining == 4000
+    assert scheduler.bucket("search").remaining == 2
+    # Search requests are spaced out until the reset, core requests are not
+    assert scheduler.try_acquire("search") > 0
+    for _ in range(20):
+        send(scheduler, "core", limit_headers("core", 5000, 3999, 3600))
+
+
+def test_share_is_counted_per_resource():
+    scheduler = RateLimitScheduler(reserve=0, share=0.5)
+    for _ in range(5):
+        send(scheduler, "core", limit_headers("core", 10, 9, 3600))
+        # Search responses with an earlier reset must not restart the core window
+        send(scheduler, "search", limit_headers("search", 30, 29, 60))
+
+    assert scheduler.bucket("core").window_requests == 5
+    assert scheduler.try_acquire("core") > 0
+    assert scheduler.share_waits == 1
+    assert scheduler.try_acquire("search") == 0
+
+
+class Response:
+    def __init__(self, status_code, headers):
+        self.status_code = status_code
+        self.headers = headers
+        self.text = ""
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_rate_limited_responses_are_closed_before_retrying():
+    limited, ok = Response(429, {"Retry-After": "0"}), Response(200, {})
+    responses = [limited, ok]
+    request = SimpleNamespace(url="https://api.github.com/repos/o/r")
+    scheduler = RateLimitScheduler()
+
+    assert scheduler.send(request, lambda request: responses.pop(0)) is ok
+    assert limited.closed
+    assert not ok.closed
@@ -0,0 +1,46 @@
+from io import BytesIO
+
+import pandas as pd
+import pytest
+
+from run_leaderboard import load_context, main, regrade_repo, run_all
+from run_journal import RunJournal
+
+
+def published(org, name):
+    path = f"assignment-1-leaderboard/{name}.csv"
+    return pd.read_csv(BytesIO(org.written[path]))
+
+
+@pytest.fixture
+def graded(served_assignment):
+    config_path, org, server = served_assignment()
+    run_all([load_context(config_path)])
+    return config_path, org
+
+
+def test_regrade_picks_up_new_members(graded):
+    config_path, org = graded
+    name = next(iter(org.repos))
+    board = published(org, "leaderboard_newsgroups")
+    assert "new-partner" not in set(board["Member"])
+
+    org.repos[name]["members"].append("new-partner")
+    ctx = load_context(config_path)
+    assert regrade_repo(ctx, name)
+
+    board = published(org, "leaderboard_newsgroups")
+    assert "new-partner" in set(board["Member"])
+    assert "new-partner" in ctx["roster"].get(name)
+    # The regrade leaves no units behind for the next full run to resume
+    assert not RunJournal(ctx["journal"].path, ctx["score_cache"].version).resumed
+
+
+@pytest.mark.parametrize(
+    "repo",
+    ["data-37712-win25-assignment-1-nobody", "data-37712-win25-assignment-2-alice"],
+)
+def test_unknown_repo_fails_the_regrade(graded, repo, capsys):
+    config_path, _ = graded
+    assert main([config_path], repo=repo) == 1
+    assert "Issue: " in capsys.readouterr().out
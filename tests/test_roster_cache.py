@@ -0,0 +1,59 @@
+import pytest
+
+import roster_cache
+from roster_cache import RosterCache, load_classroom_roster
+
+
+def test_members_expire_after_the_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(roster_cache.time, "time", lambda: now[0])
+    path = tmp_path / "roster.json"
+    roster = RosterCache(path, ttl=60)
+    assert roster.get("repo") is None
+    roster.put("repo", ["alice"])
+    roster.save()
+
+    now[0] += 59
+    reloaded = RosterCache(path, ttl=60)
+    assert reloaded.get("repo") == ["alice"]
+    now[0] += 2
+    assert reloaded.get("repo") is None
+    assert (reloaded.hits, reloaded.misses) == (1, 1)
+
+
+def test_classroom_roster_takes_precedence_until_invalidated(tmp_path):
+    roster = RosterCache(tmp_path / "roster.json", classroom={"repo": ["bob"]})
+    roster.put("repo", ["alice"])
+    roster.put("other", ["carol"])
+    assert roster.get("repo") == ["bob"]
+
+    roster.invalidate("repo")
+    assert roster.get("repo") is None
+    assert roster.get("other") == ["carol"]
+    roster.put("repo", ["alice", "bob"])
+    assert roster.get("repo") == ["alice", "bob"]
+
+
+def test_load_classroom_roster(tmp_path):
+    path = tmp_path / "classroom.csv"
+    path.write_text(
+        "identifier,github_username,student_repository_name\n"
+        "1,bob,team-repo\n"
+        "2,alice,team-repo\n"
+        "3,ta-bench,team-repo\n"
+        "4,carol,solo-repo\n"
+        "5,dave,\n"
+        "6,,empty-repo\n"
+    )
+    assert load_classroom_roster(path, {"ta-bench"}) == {
+        "team-repo": ["alice", "bob"],
+        "solo-repo": ["carol"],
+        "empty-repo": [],
+    }
+
+
+def test_classroom_roster_without_the_columns_is_rejected(tmp_path):
+    path = tmp_path / "classroom.csv"
+    path.write_text("identifier,github_username\n1,alice\n")
+    with pytest.raises(ValueError, match="student_repository_name"):
+        load_classroom_roster(path)
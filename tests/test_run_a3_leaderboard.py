@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+import yaml
+
+import run_a3_leaderboard
+from benchmarks.scale_benchmark import CONFIGS, a3_settings, write_config
+from benchmarks.synthetic_org import Assignment3, generate_org
+
+
+def test_unchanged_submissions_are_not_scored_again(tmp_path, serve_org, monkeypatch):
+    assignment = Assignment3(scale=0.02, dim=8)
+    with open(CONFIGS[assignment.assignment], "r") as config_file:
+        prefix = yaml.safe_load(config_file)["github"]["assignment_prefix"]
+    org = generate_org(assignment, 3, prefix, tmp_path / "blobs", broken_share=0)
+    server = serve_org(org)
+    options = SimpleNamespace(ingest="pygithub")
+    config_path = write_config(assignment, tmp_path, server.url, options)
+    for name, value in a3_settings(config_path).items():
+        monkeypatch.setattr(run_a3_leaderboard, name, value)
+    monkeypatch.setattr(run_a3_leaderboard, "GITHUB_TOKEN", ["ta-bench", "token"])
+
+    calls = []
+
+    def counted(function):
+        def call(*args):
+            calls.append(function.__name__)
+            return function(*args)
+
+        return call
+
+    for function in ("read_embedding", "get_similarity_scores"):
+        wrapped = counted(getattr(run_a3_leaderboard, function))
+        monkeypatch.setattr(run_a3_leaderboard, function, wrapped)
+
+    run_a3_leaderboard.main(None)
+    assert "get_similarity_scores" in calls
+    boards = dict(org.written)
+    assert boards
+
+    calls.clear()
+    downloads = server.calls["blobs"]
+    run_a3_leaderboard.main(None)
+    assert calls == []
+    assert server.calls["blobs"] == downloads
+    assert org.written == boards
@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+from run_journal import RunJournal
+from run_leaderboard import load_context, run_all
+
+
+class Interrupted(Exception):
+    pass
+
+
+def counting(compute_scores, interrupt_after=None):
+    """Wraps a scorer to count its calls, failing once `interrupt_after` were made."""
+    lock = threading.Lock()
+
+    def call(*args):
+        with lock:
+            if call.calls == interrupt_after:
+                raise Interrupted()
+            call.calls += 1
+        return compute_scores(*args)
+
+    call.calls = 0
+    return call
+
+
+def test_interrupted_run_resumes_from_its_journal(served_assignment):
+    # Without the roster cache, only the journal saves collaborator requests
+    config_path, org, server = served_assignment(roster={"enabled": False})
+    ctx = load_context(config_path)
+    ctx["compute_scores"] = counting(ctx["compute_scores"], interrupt_after=5)
+    with pytest.raises(Interrupted):
+        run_all([ctx])
+
+    ctx = load_context(config_path)
+    journal = ctx["journal"]
+    assert journal.resumed
+    assert len(journal.scores) == 5
+    journaled = {
+        kind: [
+            name
+            for name, repo in org.repos.items()
+            if getattr(journal, kind)(name, repo["pushed_at"]) is not None
+        ]
+        for kind in ("members", "files")
+    }
+    assert journaled["members"] and journaled["files"]
+
+    before = server.calls.copy()
+    ctx["compute_scores"] = counting(ctx["compute_scores"])
+    run_all([ctx])
+    results = [
+        path
+        for repo in org.repos.values()
+        for path in repo["files"]
+        if path.startswith("results/")
+    ]
+    assert ctx["compute_scores"].calls == len(results) - 5
+    calls = server.calls - before
+    assert calls["collaborators"] == len(org.repos) - len(journaled["members"])
+    assert calls["trees"] == len(org.repos) - len(journaled["files"])
+    # The published run starts a fresh journal
+    assert not RunJournal(journal.path, ctx["score_cache"].version).resumed
+
+
+def test_journal_of_another_version_is_discarded(tmp_path):
+    path = tmp_path / "run.journal"
+    journal = RunJournal(path, "v1")
+    journal.record_score("key", [{"Score": 0.5}])
+    journal.record_members(
+        {"name": "repo", "pushed_at": "2025-02-01T00:00:00Z", "member": ["alice"]}
+    )
+
+    assert RunJournal(path, "v1").scores == {"key": [{"Score": 0.5}]}
+    journal = RunJournal(path, "v2")
+    assert not journal.resumed
+    assert journal.members("repo", "2025-02-01T00:00:00Z") is None
+    assert not RunJournal(path, "v1").resumed
@@ -0,0 +1,36 @@
+from run_tenants import plan_shares, split_slots
+
+
+def tenant(name, weight=1, token="token"):
+    return {"name": name, "weight": weight, "token": token}
+
+
+def test_slots_add_up_to_max_workers():
+    tenants = [tenant("a"), tenant("b"), tenant("c")]
+    shares = plan_shares(tenants, max_workers=16)
+    assert sum(slots for slots, _ in shares.values()) == 16
+    assert sorted(slots for slots, _ in shares.values()) == [5, 5, 6]
+
+
+def test_small_tenants_get_a_slot_without_over_allocating():
+    tenants = [tenant("huge", weight=20), tenant("small"), tenant("tiny")]
+    shares = plan_shares(tenants, max_workers=8)
+    assert sum(slots for slots, _ in shares.values()) == 8
+    assert shares["small"][0] == shares["tiny"][0] == 1
+    assert shares["huge"][0] == 6
+
+
+def test_rate_limit_share_per_token():
+    tenants = [tenant("a", 3), tenant("b"), tenant("c", token="other")]
+    shares = plan_shares(tenants)
+    assert shares["a"][1] == 0.75
+    assert shares["b"][1] == 0.25
+    assert shares["c"][1] == 1.0
+
+
+def test_stages_share_the_tenant_slots():
+    workers = {"discover": 8, "list": 8, "download": 8, "score": 4}
+    capped = split_slots(workers, 6)
+    assert sum(capped.values()) == 6
+    assert all(threads >= 1 for threads in capped.values())
+    assert split_slots(workers, 64) == workers
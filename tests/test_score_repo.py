@@ -0,0 +1,23 @@
+from run_leaderboard import load_context, run_all
+
+
+def test_failed_downloads_are_not_cached(served_assignment):
+    config_path, org, _ = served_assignment(repos=2)
+    name = next(iter(org.repos))
+    sha, _ = org.repos[name]["files"]["results/mlp_newsgroups_test_predictions.csv"]
+    blob = org.directory / sha
+    data = blob.read_bytes()
+    blob.unlink()
+
+    ctx = load_context(config_path)
+    run_all([ctx])
+    member = [login for login in org.repos[name]["members"] if login != "ta-bench"]
+    key = ctx["score_cache"].key("mlp_newsgroups_test_predictions.csv", sha, member)
+    assert key not in ctx["score_cache"]
+    assert ctx["watermarks"].changed(name, org.repos[name]["pushed_at"])
+
+    blob.write_bytes(data)
+    ctx = load_context(config_path)
+    run_all([ctx])
+    assert key in ctx["score_cache"]
+    assert not ctx["watermarks"].changed(name, org.repos[name]["pushed_at"])
@@ -0,0 +1,56 @@
+import time
+
+from time_budget import DeferralQueue, TimeBudget, prioritize, take
+from watermarks import Watermarks
+
+
+def describe(item):
+    return item
+
+
+def test_clock_starts_after_listing():
+    budget = TimeBudget(0.05)
+    time.sleep(0.1)  # A slow listing
+    assert not budget.exhausted()
+    budget.start()
+    assert not budget.exhausted()
+    time.sleep(0.1)
+    assert budget.exhausted()
+
+
+def test_spent_budget_still_scores_the_oldest_deferred_repo(tmp_path):
+    deferrals = DeferralQueue(tmp_path / "deferred.json")
+    deferrals.previous = ["repo-b", "repo-a"]
+    watermarks = Watermarks(tmp_path / "watermarks.json")
+    items = [
+        ("repo-a", "2025-02-02T00:00:00Z", None),
+        ("repo-b", "2025-02-01T00:00:00Z", None),
+        ("repo-c", "2025-02-03T00:00:00Z", None),
+    ]
+    budget = TimeBudget(0)
+    budget.start()
+
+    items = prioritize(items, describe, watermarks, deferrals)
+    taken = list(take(items, describe, budget, deferrals))
+    assert [name for name, _, _ in taken] == ["repo-b"]
+    assert deferrals.deferred == ["repo-a", "repo-c"]
+
+
+def test_runs_drain_the_deferred_repos(tmp_path):
+    path = tmp_path / "deferred.json"
+    names = [f"repo-{i}" for i in range(3)]
+    items = [(name, "2025-02-01T00:00:00Z", None) for name in names]
+    watermarks = Watermarks(tmp_path / "watermarks.json")
+    scored = []
+    for _ in names:
+        deferrals = DeferralQueue(path)
+        budget = TimeBudget(0)
+        budget.start()
+        ordered = prioritize(items, describe, watermarks, deferrals)
+        taken = list(take(ordered, describe, budget, deferrals))
+        scored += [name for name, _, _ in taken]
+        watermarks.repos.update(
+            {name: {"pushed_at": "2025-02-01T00:00:00Z"} for name in scored}
+        )
+        deferrals.save()
+    assert sorted(scored) == names
@@ -0,0 +1,21 @@
+from benchmarks.fake_github import blob_sha
+from github_utils import raw_session, stream_blob
+from run_leaderboard import build_transport
+
+
+def test_server_errors_are_retried_below_the_scheduler(tmp_path, fake_org, serve_org):
+    files = {f"results/{i}.csv": b"id,label\n%d,1\n" % i for i in range(10)}
+    fake_org.add_repo("repo", ["alice"], files)
+    server = serve_org(fake_org, error_rate=0.3, seed=1)
+    transport, scheduler = build_transport(
+        {"enabled": False}, tmp_path / "http", {}, {}, pool_size=4
+    )
+    session = raw_session("token", transport)
+
+    for data in files.values():
+        blob = b"".join(
+            stream_blob(session, server.url, "UChi-CI/repo", blob_sha(data))
+        )
+        assert blob == data
+    assert server.calls["blobs"] > len(files)
+    assert scheduler.throttled == 0
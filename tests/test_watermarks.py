@@ -0,0 +1,78 @@
+from types import SimpleNamespace
+
+from github import GithubException
+
+from github_utils import find_results_files
+from watermarks import Watermarks
+
+ROWS = [{"Member": "alice", "Score": 0.9, "leaderboard": "default"}]
+
+
+def record(name="repo", pushed_at="2025-02-01T00:00:00Z"):
+    return {"name": name, "pushed_at": pushed_at, "member": ["alice"], "rows": ROWS}
+
+
+def test_rows_are_carried_forward_with_the_same_version(tmp_path):
+    path = tmp_path / "watermarks.json"
+    watermarks = Watermarks(path, "v1")
+    watermarks.update(record())
+    watermarks.save(["repo"])
+
+    reloaded = Watermarks(path, "v1")
+    assert not reloaded.changed("repo", "2025-02-01T00:00:00Z")
+    assert reloaded.carry_forward(["repo"])[0]["rows"] == ROWS
+
+
+def test_new_scorer_or_test_data_invalidates_the_rows(tmp_path):
+    path = tmp_path / "watermarks.json"
+    watermarks = Watermarks(path, "v1")
+    watermarks.update(record())
+    watermarks.save(["repo"])
+
+    reloaded = Watermarks(path, "v2")
+    assert reloaded.repos == {}
+    assert reloaded.changed("repo", "2025-02-01T00:00:00Z")
+
+
+def test_invalidated_repo_is_processed_again_but_keeps_its_rows(tmp_path):
+    path = tmp_path / "watermarks.json"
+    watermarks = Watermarks(path, "v1")
+    watermarks.update(record())
+    watermarks.invalidate("repo")
+    watermarks.save(["repo"])
+
+    reloaded = Watermarks(path, "v1")
+    assert reloaded.changed("repo", "2025-02-01T00:00:00Z")
+    assert reloaded.repos["repo"]["rows"] == ROWS
+
+
+class FailingRepo:
+    default_branch = "main"
+
+    def __init__(self, status):
+        self.status = status
+
+    def get_git_tree(self, sha, recursive=False):
+        raise GithubException(self.status, {"message": "failed"}, None)
+
+
+def test_listing_failure_is_not_reported_as_a_missing_folder():
+    failed = {"name": "repo", "git": FailingRepo(502)}
+    assert find_results_files(failed, [".csv"]) is None
+    empty = {"name": "repo", "git": FailingRepo(409)}
+    assert find_results_files(empty, [".csv"]) == {}
+
+
+def test_listing_finds_the_results_files():
+    tree = SimpleNamespace(
+        truncated=False,
+        tree=[
+            SimpleNamespace(path="results", type="tree", sha="t", size=None),
+            SimpleNamespace(path="results/a.csv", type="blob", sha="s", size=200),
+        ],
+    )
+    git_repo = SimpleNamespace(
+        default_branch="main", get_git_tree=lambda sha, recursive: tree
+    )
+    files = find_results_files({"name": "repo", "git": git_repo}, [".csv"])
+    assert list(files) == ["a.csv"]
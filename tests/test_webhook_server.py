@@ -0,0 +1,101 @@
+import hashlib
+import hmac
+import json
+import time
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import pytest
+
+from run_journal import RunJournal
+from run_leaderboard import load_context, refresh_repo, run_all
+from watermarks import Watermarks
+from webhook_server import serve, verify_signature
+
+SECRET = "webhook-secret"
+
+
+def signature(body, secret=SECRET):
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def test_verify_signature():
+    body = b'{"zen": "Keep it logically awesome."}'
+    assert verify_signature(SECRET, body, signature(body))
+    assert not verify_signature(SECRET, body, signature(body, "other-secret"))
+    assert not verify_signature(SECRET, body + b" ", signature(body))
+    assert not verify_signature(SECRET, body, signature(body)[len("sha256=") :])
+    assert not verify_signature(SECRET, body, None)
+
+
+def deliver(server, event, payload, sign=True):
+    body = json.dumps(payload).encode()
+    headers = {"X-GitHub-Event": event, "Content-Type": "application/json"}
+    if sign:
+        headers["X-Hub-Signature-256"] = signature(body)
+    url = f"http://{server.server_address[0]}:{server.server_address[1]}/"
+    try:
+        with urlopen(Request(url, body, headers, method="POST")) as response:
+            return response.status
+    except HTTPError as e:
+        return e.code
+
+
+@pytest.fixture
+def webhook(served_assignment):
+    config_path, org, _ = served_assignment()
+    ctx = load_context(config_path)
+    run_all([ctx])
+    server = serve(ctx, SECRET, port=0, debounce=0.01)
+    yield ctx, org, server
+    server.shutdown()
+    server.server_close()
+
+
+def test_unsigned_deliveries_are_rejected(webhook):
+    _, org, server = webhook
+    name = next(iter(org.repos))
+    payload = {"repository": {"name": name, "default_branch": "main"}}
+    assert deliver(server, "member", payload, sign=False) == 401
+    assert deliver(server, "ping", {}) == 200
+
+
+def test_member_event_refreshes_the_rows(webhook):
+    ctx, org, server = webhook
+    name = next(iter(org.repos))
+    org.repos[name]["members"].append("new-partner")
+    payload = {"repository": {"name": name, "default_branch": "main"}}
+    assert deliver(server, "member", payload) == 202
+
+    deadline = time.monotonic() + 10
+    while "new-partner" not in ctx["watermarks"].repos[name]["member"]:
+        assert time.monotonic() < deadline, "the repo was not refreshed"
+        time.sleep(0.05)
+    # Refreshes leave no units behind for the next full run to resume
+    assert not RunJournal(ctx["journal"].path, ctx["score_cache"].version).resumed
+
+
+def test_malformed_payloads_are_rejected(webhook):
+    _, _, server = webhook
+    assert deliver(server, "push", ["not", "an", "object"]) == 400
+    assert deliver(server, "push", {"repository": {}}) == 400
+
+
+def test_refresh_keeps_rows_saved_by_a_later_full_run(webhook):
+    ctx, org, _ = webhook
+    name, other = list(org.repos)[:2]
+    # A cron run saves new rows for another repo after the server started
+    saved = Watermarks(ctx["watermarks"].path, ctx["score_cache"].version)
+    rows = saved.repos[other]["rows"]
+    rows[0] = {**rows[0], "Score": 0.123}
+    saved.update({"name": other, **saved.repos[other], "rows": rows})
+    with saved.locked():
+        saved.save(saved.repos)
+
+    refresh_repo(ctx, name)
+
+    reloaded = Watermarks(ctx["watermarks"].path, ctx["score_cache"].version)
+    assert reloaded.repos[other]["rows"][0]["Score"] == 0.123
+    board = rows[0]["leaderboard"]
+    published = org.written[f"assignment-1-leaderboard/{board}.csv"]
+    assert b"0.123" in published
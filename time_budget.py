@@ -0,0 +1,124 @@
+import json
+import threading
+import time
+from pathlib import Path
+
+# Work classes, in the order they are taken on
+DEFERRED, PUSHED, UNSCORED, RECHECK = range(4)
+
+
+class TimeBudget:
+    """Wall-clock budget of a run, started once the first repos are listed.
+
+    Listing the repos does not count, so a slow listing cannot use up the whole
+    budget before any repo is scored.
+
+    Inputs:
+        seconds (float): How long the run may take on new work.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.started = None
+
+    def start(self):
+        """Starts the clock, unless it is already running."""
+        if self.started is None:
+            self.started = time.monotonic()
+
+    def remaining(self):
+        if self.started is None:
+            return self.seconds
+        return max(0.0, self.seconds - (time.monotonic() - self.started))
+
+    def exhausted(self):
+        return self.remaining() == 0
+
+
+class DeferralQueue:
+    """Repos a time-budgeted run had no time left for, saved for the next run.
+
+    The names deferred by the previous run are loaded into `previous`; the next
+    run takes them on before any other repo.
+
+    Inputs:
+        path (Path): JSON file the queue is loaded from and saved to.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.deferred = []
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, "r") as f:
+                self.previous = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.previous = []
+
+    def defer(self, name):
+        with self._lock:
+            self.deferred.append(name)
+
+    def save(self):
+        """Writes this run's deferred repos to disk, replacing the previous queue."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with self._lock:
+            with open(tmp_path, "w") as f:
+                json.dump(self.deferred, f)
+            tmp_path.replace(self.path)
+            self.previous, self.deferred = self.deferred, []
+
+
+def prioritize(items, describe, watermarks, deferrals):
+    """Orders repos by how urgently they need scoring.
+
+    Repos deferred by the previous run come first, in the order they were
+    deferred, so the longest-waiting repo is always next. Then come repos pushed
+    since they were last scored, then repos never scored, then unchanged repos
+    that are only rechecked, the most recently pushed repo first in each class.
+
+    Inputs:
+        items (list): The repos to order.
+        describe: Callable returning the `(name, pushed_at, head)` of an item.
+        watermarks (Watermarks): The watermarks of the last successful run.
+        deferrals (DeferralQueue): The repos the previous run deferred.
+
+    Returns:
+        list: The items, most urgent first.
+    """
+    previous = {name: index for index, name in enumerate(deferrals.previous)}
+
+    def work_class(item):
+        name, pushed_at, head = describe(item)
+        if name in previous:
+            return DEFERRED, previous[name]
+        if name not in watermarks.repos:
+            return UNSCORED, 0
+        if watermarks.changed(name, pushed_at, head):
+            return PUSHED, 0
+        return RECHECK, 0
+
+    # Two stable sorts: newest push first, then by work class
+    items = sorted(items, key=lambda item: describe(item)[1], reverse=True)
+    return sorted(items, key=work_class)
+
+
+def take(items, describe, budget, deferrals):
+    """Yields items until the budget runs out, then defers the rest.
+
+    The first (most urgent) item is always yielded, so every run makes progress
+    on the deferred repos, however little budget is left.
+
+    Inputs:
+        items (list): The prioritized repos.
+        describe: Callable returning the `(name, pushed_at, head)` of an item.
+        budget (TimeBudget): The run's time budget.
+        deferrals (DeferralQueue): Where the repos left over are recorded.
+    """
+    for index, item in enumerate(items):
+        if index > 0 and budget.exhausted():
+            for rest in items[index:]:
+                deferrals.defer(describe(rest)[0])
+            return
+        yield item
@@ -0,0 +1,93 @@
+import fcntl
+import json
+from contextlib import contextmanager
+from pathlib import Path
+
+
+class Watermarks:
+    """Per-repo watermarks of the last successful run, used for incremental runs.
+
+    For every processed repo this stores its `pushed_at` time, its default-branch
+    head (when the ingest mode provides it), its members and the leaderboard rows
+    it produced. A repo whose watermark has not moved since can skip discovery,
+    download and scoring, and its previous rows are carried forward.
+
+    The rows depend on the test data and the scorer, so the watermarks are saved
+    with the score cache version and discarded when it changed: every repo is
+    then rescored.
+
+    Full runs and the webhook server may save the same watermarks, so saves
+    should happen under `locked`; long-lived processes `reload` first.
+
+    Inputs:
+        path (Path): JSON file the watermarks are loaded from and saved to.
+        version (str): The `ScoreCache.version` the rows were computed with.
+    """
+
+    def __init__(self, path, version=None):
+        self.path = Path(path)
+        self.version = version
+        self.reload()
+
+    def reload(self):
+        """Replaces the watermarks in memory by the ones saved on disk."""
+        self.repos = {}
+        try:
+            with open(self.path, "r") as f:
+                saved = json.load(f)
+            if saved.get("version") == self.version:
+                self.repos = saved["repos"]
+            else:
+                print("Test data or scorer changed: every repo is rescored")
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    def changed(self, name, pushed_at, head=None):
+        """Returns True if the repo is new or was pushed since its watermark was saved."""
+        previous = self.repos.get(name)
+        if previous is None:
+            return True
+        if head is not None and previous.get("head") is not None:
+            return head != previous["head"]
+        return pushed_at != previous["pushed_at"]
+
+    def carry_forward(self, names):
+        """Returns the saved records of the given repos, with their `member` and `rows`."""
+        return [{"name": name, **self.repos[name]} for name in names]
+
+    def update(self, repo):
+        """Records the watermark and rows of a processed repo record."""
+        self.repos[repo["name"]] = {
+            "pushed_at": repo["pushed_at"],
+            "head": repo.get("head"),
+            "member": repo["member"],
+            "rows": repo["rows"],
+        }
+
+    def invalidate(self, name):
+        """Forgets the watermark of a repo, so the next run fetches it again.
+
+        Its rows are kept, to be carried forward until it is processed.
+        """
+        if name in self.repos:
+            self.repos[name] = {**self.repos[name], "pushed_at": None, "head": None}
+
+    @contextmanager
+    def locked(self):
+        """Holds an exclusive lock on the saved watermarks, across processes."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_suffix(".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def save(self, names):
+        """Writes the watermarks of the given repos to disk, dropping all others."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w") as f:
+            repos = {name: self.repos[name] for name in names if name in self.repos}
+            json.dump({"version": self.version, "repos": repos}, f)
+        tmp_path.replace(self.path)
@@ -0,0 +1,190 @@
+"""Rescores a single student repo when GitHub sends a push or member event for it.
+
+Register a webhook on the organization (content type `application/json`, push
+and member events) pointing at this server, and put the webhook secret in `.env` as
+`GITHUB_WEBHOOK_SECRET`. Run it with the same config as `run_leaderboard.py`:
+
+    python webhook_server.py --config config_a1.yaml --port 8080
+"""
+
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import queue
+import threading
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dotenv import load_dotenv
+
+from run_leaderboard import load_context, refresh_repo, run
+
+DEFAULT_DEBOUNCE_SECONDS = 30
+
+
+def verify_signature(secret, body, signature):
+    """Checks the `X-Hub-Signature-256` header of a webhook delivery.
+
+    Inputs:
+        secret (str): The webhook secret.
+        body (bytes): The raw request body.
+        signature (str): The header value, e.g. `sha256=<hex digest>`.
+
+    Returns:
+        bool: True if the signature matches the body.
+    """
+    if not signature or not signature.startswith("sha256="):
+        return False
+    expected = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature[len("sha256=") :])
+
+
+class Debouncer:
+    """Delays a callback per key until no new trigger arrived for `delay` seconds.
+
+    A burst of pushes to the same repo therefore results in a single rescore.
+    """
+
+    def __init__(self, delay, callback):
+        self.delay = delay
+        self.callback = callback
+        self._timers = {}
+        self._lock = threading.Lock()
+
+    def trigger(self, key):
+        with self._lock:
+            if key in self._timers:
+                self._timers[key].cancel()
+            timer = threading.Timer(self.delay, self._fire, args=(key,))
+            timer.daemon = True
+            self._timers[key] = timer
+            timer.start()
+
+    def _fire(self, key):
+        with self._lock:
+            self._timers.pop(key, None)
+        self.callback(key)
+
+
+def rescore_worker(ctx, repo_queue):
+    """Rescores queued repos one at a time, so publishes never overlap."""
+    while True:
+        name = repo_queue.get()
+        try:
+            print(f"Rescoring {name}...")
+            refresh_repo(ctx, name)
+            print(f"Rescored {name}")
+        except Exception:
+            traceback.print_exc()
+        finally:
+            repo_queue.task_done()
+
+
+def make_handler(ctx, secret, debouncer):
+    """Builds the request handler class for the webhook server."""
+
+    class WebhookHandler(BaseHTTPRequestHandler):
+        def _reply(self, status, message):
+            body = message.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if not verify_signature(
+                secret, body, self.headers.get("X-Hub-Signature-256")
+            ):
+                return self._reply(401, "Invalid signature")
+
+            event = self.headers.get("X-GitHub-Event")
+            if event == "ping":
+                return self._reply(200, "pong")
+            if event not in ("push", "member"):
+                return self._reply(204, "")
+
+            try:
+                payload = json.loads(body)
+                repository = payload["repository"]
+                name = repository["name"]
+                default_branch = repository["default_branch"]
+            except (ValueError, KeyError, TypeError):
+                return self._reply(400, "Malformed payload")
+            if not name.startswith(ctx["assignment_prefix"]):
+                return self._reply(204, "")
+            if event == "member":
+                # A collaborator was added or removed: the rows need new members
+                if ctx["roster"] is not None:
+                    ctx["roster"].invalidate(name)
+            elif payload.get("ref") != f"refs/heads/{default_branch}":
+                return self._reply(204, "")
+
+            debouncer.trigger(name)
+            return self._reply(202, f"Queued {name}")
+
+    return WebhookHandler
+
+
+def serve(ctx, secret, host="127.0.0.1", port=8080, debounce=DEFAULT_DEBOUNCE_SECONDS):
+    """Starts the webhook server in a background thread.
+
+    Inputs:
+        ctx (dict): The run context from `run_leaderboard.load_context`.
+        secret (str): The webhook secret used to verify payload signatures.
+        host (str): Interface to listen on.
+        port (int): Port to listen on. Use 0 to pick a free port.
+        debounce (float): Seconds without new pushes before a repo is rescored.
+
+    Returns:
+        ThreadingHTTPServer: The running server.
+    """
+    repo_queue = queue.Queue()
+    threading.Thread(target=rescore_worker, args=(ctx, repo_queue), daemon=True).start()
+    debouncer = Debouncer(debounce, repo_queue.put)
+
+    server = ThreadingHTTPServer((host, port), make_handler(ctx, secret, debouncer))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(config_path, host, port, debounce):
+    load_dotenv()
+    secret = os.getenv("GITHUB_WEBHOOK_SECRET")
+    if not secret:
+        raise ValueError("GITHUB_WEBHOOK_SECRET must be provided via .env.")
+
+    ctx = load_context(config_path)
+    if not ctx["watermarks"].repos:
+        print("No previous run found, running a full update first...")
+        run(ctx)
+
+    server = serve(ctx, secret, host=host, port=port, debounce=debounce)
+    print(f"Listening for push events on {host}:{server.server_port}...")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rescore repos on push events")
+    parser.add_argument(
+        "--config",
+        type=str,
+        required=True,
+        help="Path to the YAML configuration file.",
+    )
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--debounce",
+        type=float,
+        default=DEFAULT_DEBOUNCE_SECONDS,
+        help="Seconds without new pushes before a repo is rescored.",
+    )
+    args = parser.parse_args()
+    main(args.config, args.host, args.port, args.debounce)